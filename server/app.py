@@ -1,62 +1,110 @@
 from flask import Flask, jsonify, session, request
 from flask_cors import CORS
-from routes.auth_routes import auth_bp
-from routes.housing_routes import housing_bp
-from routes.user_routes import user_routes
-from routes.upload_routes import upload_routes  # Import missing routes
-from routes.chatbot_routes import chatbot_bp  # Import missing routes
-from routes.social_routes import social_blueprint
 
 import os
 from datetime import timedelta
 
-# Create necessary directories
-os.makedirs("uploads", exist_ok=True)
 
-app = Flask(__name__)
+def create_app():
+    """
+    Build the Flask app. Routes (and with them Firebase and the services)
+    are imported here, not at module level: job worker processes are
+    spawned and re-import this module, and they must not load the app.
+    """
+    from routes.auth_routes import auth_bp
+    from routes.housing_routes import housing_bp
+    from routes.user_routes import user_routes
+    from routes.upload_routes import upload_routes  # Import missing routes
+    from routes.chatbot_routes import chatbot_bp  # Import missing routes
+    from routes.social_routes import social_blueprint
+    from routes.diagnostics_routes import diagnostics_bp
+    from routes.job_routes import job_bp
+    from services.session_store import create_session_interface
 
-# Configure session
-app.secret_key = "your_secret_key_here"  # Change this to a secure random key in production
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_PERMANENT'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Session lasts for 7 days
+    # Create necessary directories
+    os.makedirs("uploads", exist_ok=True)
 
-# Enable CORS with session support
-# When using credentials, we can't use wildcard origins
-CORS(app, 
-     origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:3001", "http://127.0.0.1:3001"], 
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+    app = Flask(__name__)
 
-# Handle OPTIONS requests for CORS preflight
-@app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
-@app.route('/<path:path>', methods=['OPTIONS'])
-def handle_options(path):
-    return '', 200
+    # Configure session
+    app.secret_key = "your_secret_key_here"  # Change this to a secure random key in production
+    app.config['SESSION_TYPE'] = os.getenv('SESSION_TYPE', 'filesystem')  # memory, filesystem or redis
+    app.config['SESSION_FILE_DIR'] = os.getenv('SESSION_FILE_DIR', 'flask_session')
+    app.config['SESSION_REDIS_URL'] = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['SESSION_PERMANENT'] = True
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Session lasts for 7 days
 
-# Register authentication routes
-app.register_blueprint(auth_bp, url_prefix="/api/auth")  # 🔹 Added "/api/auth"
+    # Keep session data server-side; the cookie only carries the session id
+    app.session_interface = create_session_interface(app.config)
 
-# Register user routes
-app.register_blueprint(user_routes, url_prefix="/api/user")
+    # Enable CORS with session support
+    # When using credentials, we can't use wildcard origins
+    CORS(app, 
+         origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:3001", "http://127.0.0.1:3001"], 
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization", "X-Chunk-SHA256"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
-# Register file upload routes
-app.register_blueprint(upload_routes, url_prefix="/api")  # 🔹 Added "/api"
+    # Handle OPTIONS requests for CORS preflight
+    @app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
+    @app.route('/<path:path>', methods=['OPTIONS'])
+    def handle_options(path):
+        return '', 200
 
-# Register housing routes
-app.register_blueprint(housing_bp, url_prefix="/api/housing")
+    # Register authentication routes
+    app.register_blueprint(auth_bp, url_prefix="/api/auth")  # 🔹 Added "/api/auth"
 
-# Register chatbot routes
-app.register_blueprint(chatbot_bp, url_prefix="/api/chatbot")
+    # Register user routes
+    app.register_blueprint(user_routes, url_prefix="/api/user")
 
-# Register Blueprints
-app.register_blueprint(social_blueprint, url_prefix="/social")
+    # Register file upload routes
+    app.register_blueprint(upload_routes, url_prefix="/api")  # 🔹 Added "/api"
 
+    # Register housing routes
+    app.register_blueprint(housing_bp, url_prefix="/api/housing")
 
-@app.route("/", methods=["GET"])
-def health_check():
-    return jsonify({"message": "API is working!"}), 200
+    # Register chatbot routes
+    app.register_blueprint(chatbot_bp, url_prefix="/api/chatbot")
+
+    # Register Blueprints
+    app.register_blueprint(social_blueprint, url_prefix="/social")
+
+    # Register diagnostics routes
+    app.register_blueprint(diagnostics_bp, url_prefix="/api/diagnostics")
+
+    # Register background job routes
+    app.register_blueprint(job_bp, url_prefix="/api/jobs")
+
+    @app.route("/", methods=["GET"])
+    def health_check():
+        return jsonify({"message": "API is working!"}), 200
+
+    return app
+
+
+def start_background_services():
+    """
+    Resolve the Gemini model and start the background job dispatcher.
+    Call once in the process that serves requests (a WSGI server can call
+    it from its worker start hook); jobs queued before a restart resume
+    once it runs.
+    """
+    from services.job_queue import job_queue
+    from services.model_registry import model_registry
+
+    model_registry.warm()
+    job_queue.start()
+
+
+# Spawned job workers import this module as __mp_main__ and only need the
+# job handlers
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", debug=True, port=3000)
\ No newline at end of file
+    # With debug=True the reloader runs this file twice: in a watcher process
+    # and in the child that serves requests (WERKZEUG_RUN_MAIN set). Only the
+    # child starts background work
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+    app.run(host="0.0.0.0", debug=True, port=3000)
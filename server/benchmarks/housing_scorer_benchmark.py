@@ -0,0 +1,85 @@
+"""
+Local scoring of housing candidates (services/housing_scorer.py) at
+catalogue sizes well beyond the bundled knowledge base.
+
+    python benchmarks/housing_scorer_benchmark.py --sizes 47 1000 5000 20000
+
+Synthetic neighbourhoods are scattered over a 60 x 60 km area with random
+rent bands, amenities, lifestyle tags and scores; each query ranks all of
+them for a random work location and preference set.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.housing_scorer import HousingScorer  # noqa: E402
+from services.neighborhood_store import CATEGORIES, SCORE_FIELDS, NeighborhoodStore  # noqa: E402
+from services.preferences import BUDGET_RANGES, LIFESTYLE_BITS  # noqa: E402
+
+AMENITIES = ['parking', 'publicTransport', 'parks', 'schools', 'groceryStores', 'gym']
+LIFESTYLE = ['nightlife', 'quiet', 'familyFriendly', 'shopping', 'greenSpaces', 'cultural',
+             'fineDining', 'activeLifestyle', 'affordability', 'community']
+
+
+def synthetic_records(count, rng):
+    records = []
+    for i in range(count):
+        base = rng.uniform(4000, 30000)
+        records.append({
+            'name': f'Area {i}',
+            'city': 'Pune',
+            'state': 'Maharashtra',
+            'lat': 18.52 + rng.uniform(-0.27, 0.27),
+            'lng': 73.85 + rng.uniform(-0.28, 0.28),
+            'rent': {category: [int(base * (1 + 0.4 * j)), int(base * (1.3 + 0.4 * j))]
+                     for j, category in enumerate(CATEGORIES)},
+            'amenities': rng.sample(AMENITIES, rng.randint(1, len(AMENITIES))),
+            'lifestyle': rng.sample(LIFESTYLE, rng.randint(1, 4)),
+            'scores': {field: rng.randint(3, 10) for field in SCORE_FIELDS},
+        })
+    return records
+
+
+def queries(count, rng):
+    for _ in range(count):
+        category = rng.choice(CATEGORIES)
+        modes = rng.sample(['walking', 'bicycling', 'transit', 'driving'], rng.randint(1, 3))
+        yield {
+            'lat': 18.52 + rng.uniform(-0.2, 0.2),
+            'lng': 73.85 + rng.uniform(-0.2, 0.2),
+            'budget': (category, *BUDGET_RANGES[category]),
+            'travel_distances': {mode: rng.choice([5, 10, 15, 20, 30]) for mode in modes},
+            'must_haves': rng.sample(AMENITIES, rng.randint(0, 4)),
+            'lifestyle_mask': NeighborhoodStore.mask(LIFESTYLE_BITS, rng.sample(LIFESTYLE, rng.randint(0, 4))),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[47, 1000, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'candidates':>10}  {'p50 ms':>8}  {'p95 ms':>8}  {'max ms':>8}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        scorer = HousingScorer(NeighborhoodStore(records=synthetic_records(size, rng)))
+        timings = []
+        for query in queries(args.queries, rng):
+            started = time.perf_counter()
+            scorer.rank(query['lat'], query['lng'], query['budget'], query['travel_distances'],
+                        query['must_haves'], query['lifestyle_mask'])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95)]
+        print(f"{size:>10}  {statistics.median(timings):8.3f}  {p95:8.3f}  {timings[-1]:8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Realtime Database round trips per login: the old read-then-write upsert
+vs. record_login (controllers/auth_controller.py).
+
+Run against the Firebase emulator so nothing touches the real database:
+
+    firebase emulators:start --only database
+    FIREBASE_DATABASE_EMULATOR_HOST=127.0.0.1:9000 \\
+    FIREBASE_DATABASE_URL='http://127.0.0.1:9000?ns=codebits3-default-rtdb' \\
+        python benchmarks/login_round_trips.py --users 20 --logins 5
+
+Every HTTP request the Admin SDK makes is counted by wrapping its client.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firebase_admin import db  # noqa: E402
+
+requests_made = Counter()
+_request = db._Client.request
+
+
+def _counting_request(self, method, url, **kwargs):
+    requests_made[method.upper()] += 1
+    return _request(self, method, url, **kwargs)
+
+
+db._Client.request = _counting_request
+
+from config.firebase import get_firebase_db_ref  # noqa: E402
+from controllers.auth_controller import record_login  # noqa: E402
+from services.db_writer import db_writer  # noqa: E402
+
+
+def legacy_login(uid, profile):
+    """The verify_token upsert as it was: read the whole user node, then write."""
+    users_ref = get_firebase_db_ref().child('users').child(uid)
+    if not users_ref.get():
+        users_ref.set({
+            "email": profile.get("email"),
+            "name": profile.get("name", ""),
+            "picture": profile.get("picture", ""),
+            "created_at": {".sv": "timestamp"},
+        })
+    else:
+        users_ref.update({"last_login": {".sv": "timestamp"}})
+
+
+def run(label, login, users, logins):
+    get_firebase_db_ref().child('users').delete()
+    requests_made.clear()
+    started = time.perf_counter()
+    for _ in range(logins):
+        for index in range(users):
+            uid = f"bench-user-{index}"
+            login(uid, {"email": f"{uid}@example.com", "name": uid, "picture": ""})
+            # Flush per login so write-behind batching doesn't flatter the count
+            db_writer.flush()
+    elapsed = time.perf_counter() - started
+    total = sum(requests_made.values())
+    methods = ', '.join(f"{method} {count}" for method, count in sorted(requests_made.items()))
+    print(f"{label:>14}: {total / (users * logins):5.2f} round trips/login "
+          f"({methods}), {elapsed * 1000 / (users * logins):6.1f} ms/login")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--logins', type=int, default=5, help='logins per user')
+    args = parser.parse_args()
+
+    if not os.getenv('FIREBASE_DATABASE_EMULATOR_HOST'):
+        sys.exit("Set FIREBASE_DATABASE_EMULATOR_HOST to run against the database emulator")
+
+    run('read-then-write', legacy_login, args.users, args.logins)
+    run('record_login', record_login, args.users, args.logins)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Preference handling and prompt construction for housing requests: the
+dict-based normalization that used to run for the cache key, the
+shortlist and the prompt separately vs. parsing once into a Preferences
+(services/preferences.py).
+
+    python benchmarks/prompt_construction_benchmark.py --repeat 20000
+
+Requests mix the shapes clients send: prioritized or plain must-haves,
+lifestyle names, numeric lifestyle codes and dicts, one or several
+enabled travel modes.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.housing_controller import generate_housing_prompt, housing_cache_key  # noqa: E402
+from services.neighborhood_store import neighborhood_store  # noqa: E402
+from services.preferences import parse_preferences  # noqa: E402
+from services.response_cache import make_cache_key  # noqa: E402
+
+REQUESTS = [
+    {
+        'userCategory': 'comfort',
+        'userCategoryDescription': 'Values convenience',
+        'commute': {
+            'workAddress': 'Hinjewadi Phase 1, Pune',
+            'travelMode': 'driving',
+            'coordinates': {'lat': 18.5912, 'lng': 73.7389},
+            'travelModes': {
+                'walking': {'enabled': False, 'distance': 5},
+                'bicycling': {'enabled': False, 'distance': 10},
+                'transit': {'enabled': True, 'distance': 15},
+                'driving': {'enabled': True, 'distance': 20},
+            },
+        },
+        'lifestylePreferences': ['quiet', 'familyFriendly', 'greenSpaces'],
+        'prioritizedMustHaves': [{'name': 'gym', 'priority': 2}, {'name': 'parks', 'priority': 1},
+                                 {'name': 'schools', 'priority': 3}],
+    },
+    {
+        'userCategory': 'budget',
+        'commute': {'workAddress': 'Kharadi, Pune', 'travelMode': 'transit'},
+        'lifestylePreferences': ['17', '3', '23', '6'],
+        'mustHaves': {'publicTransport': True, 'groceryStores': True, 'parking': False},
+    },
+    {
+        'userCategory': 'luxury',
+        'commute': {
+            'workAddress': 'Koregaon Park',
+            'travelMode': 'walking',
+            'travelModes': {'walking': {'enabled': True, 'distance': 4}},
+        },
+        'lifestylePreferences': {'nightlife': True, 'fineDining': True, 'quiet': False},
+    },
+]
+
+
+def legacy_normalize(user_data):
+    """normalize_housing_preferences as it was before Preferences (lookup tables inline)."""
+    budget_ranges = {'budget': (5000, 8000), 'moderate': (8000, 12000), 'comfort': (12000, 18000),
+                     'premium': (18000, 24000), 'luxury': (24000, 50000)}
+    category = user_data['userCategory'] if user_data['userCategory'] in budget_ranges else 'moderate'
+    low, high = budget_ranges[category]
+    prioritized = bool(user_data.get('prioritizedMustHaves'))
+    must_haves = []
+    must_have_names = []
+    if prioritized:
+        for item in user_data['prioritizedMustHaves']:
+            must_haves.append(f"{item['name']} (Priority: {item['priority']})")
+        must_have_names = [item['name'] for item in sorted(user_data['prioritizedMustHaves'],
+                                                           key=lambda item: item['priority'])]
+    elif isinstance(user_data.get('mustHaves'), dict):
+        must_haves = must_have_names = [key for key, value in user_data['mustHaves'].items() if value]
+    commute = user_data.get('commute', {})
+    travel_mode = commute.get('travelMode', 'driving')
+    if 'travelModes' in commute and travel_mode in commute['travelModes']:
+        max_distance = commute['travelModes'][travel_mode].get('distance', 10)
+    else:
+        max_distance = {'walking': 5, 'bicycling': 10, 'transit': 15, 'driving': 20}.get(travel_mode, 10)
+    lifestyle_prefs = []
+    prefs = user_data.get('lifestylePreferences')
+    if isinstance(prefs, list):
+        options = [
+            'accessibility', 'activeLifestyle', 'affordability', 'amenities', 'artsAndMusic', 'casual',
+            'casualDining', 'cleanliness', 'community', 'convenient', 'cultural', 'entertainment',
+            'familyFriendly', 'fineDining', 'greenSpaces', 'healthy', 'internationalCuisine', 'nightlife',
+            'outdoorActivities', 'quiet', 'quietness', 'relaxing', 'safety', 'shopping', 'socialGatherings',
+        ]
+        if all(isinstance(pref, str) and pref.isdigit() for pref in prefs):
+            lifestyle_prefs = [options[int(i)] if int(i) < len(options) else f"preference_{i}" for i in prefs]
+        else:
+            lifestyle_prefs = prefs
+    elif isinstance(prefs, dict):
+        lifestyle_prefs = [key for key, value in prefs.items() if value]
+    return {
+        'budget_range': f'₹{low} - ₹{high}', 'budget': (category, low, high),
+        'user_category': user_data['userCategory'],
+        'user_category_description': user_data.get('userCategoryDescription', ''),
+        'work_address': commute.get('workAddress', 'Not specified'), 'travel_mode': travel_mode,
+        'max_distance': max_distance, 'lifestyle_prefs': lifestyle_prefs, 'must_haves': must_haves,
+        'must_have_names': must_have_names, 'prioritized_must_haves': prioritized,
+    }
+
+
+def legacy_request(user_data):
+    """Preference work per request before: normalized for the key, the shortlist and the prompt."""
+    normalized = legacy_normalize(user_data)
+    key = make_cache_key({
+        'budget_range': normalized['budget_range'],
+        'user_category': str(normalized['user_category']).strip().lower(),
+        'work_address': ' '.join(str(normalized['work_address']).lower().replace(',', ' ').split()),
+        'travel_mode': str(normalized['travel_mode']).lower(),
+        'max_distance': round(float(normalized['max_distance'])),
+        'lifestyle_prefs': sorted({str(pref) for pref in normalized['lifestyle_prefs']}),
+        'must_haves': sorted(normalized['must_haves']),
+        'prioritized_must_haves': normalized['prioritized_must_haves'],
+    })
+    legacy_normalize(user_data)
+    legacy_normalize(user_data)
+    return key
+
+
+def typed_request(user_data):
+    """Preference work per request now: one parse, reused for the key, shortlist and prompt."""
+    return housing_cache_key(parse_preferences(user_data))
+
+
+def shortlist(preferences):
+    location = neighborhood_store.locate(preferences.work_address)
+    if location is None:
+        return None
+    indices, distances, _, applied = neighborhood_store.candidates(
+        location[0], location[1], preferences.max_distance, budget_range=preferences.budget, limit=8)
+    return [{'record': neighborhood_store.record(i), 'distance_km': round(distance, 1),
+             'rent': neighborhood_store.record(i)['rent'][preferences.budget_category], 'must_haves_met': applied}
+            for i, distance in zip(indices.tolist(), distances.tolist())]
+
+
+def throughput(func, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    elapsed = time.perf_counter() - started
+    return repeat * len(items) / elapsed, elapsed / (repeat * len(items)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    parsed = [parse_preferences(request) for request in REQUESTS]
+    shortlists = [(preferences, shortlist(preferences)) for preferences in parsed]
+    cases = [
+        ('normalize (legacy dicts)', legacy_normalize, REQUESTS),
+        ('parse_preferences', parse_preferences, REQUESTS),
+        ('per request, legacy', legacy_request, REQUESTS),
+        ('per request, typed', typed_request, REQUESTS),
+        ('prompt, open-ended', lambda preferences: generate_housing_prompt(preferences), parsed),
+        ('prompt, shortlist', lambda item: generate_housing_prompt(item[0], shortlist=item[1]), shortlists),
+    ]
+    print(f"{'':>26}  {'per second':>12}  {'us each':>8}")
+    for label, func, items in cases:
+        per_second, micros = throughput(func, items, args.repeat)
+        print(f"{label:>26}  {per_second:12,.0f}  {micros:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
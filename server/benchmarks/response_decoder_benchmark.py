@@ -0,0 +1,154 @@
+"""
+Recommendation parsing: the original fence strip / json.loads / regex
+cleanup / regex scraping chain vs. the typed decoder with single-pass
+repair (services/response_decoder.py).
+
+    python benchmarks/response_decoder_benchmark.py --repeat 2000
+
+The corpus is the defects seen in real model output applied to a
+well-formed response: markdown fences, leading prose, comments, trailing
+commas, a wrapping object, and truncation at many points. A parse counts
+as full if every complete neighbourhood came back with all its fields,
+simplified if only scraped names/cities/descriptions did.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.response_decoder import (  # noqa: E402
+    ResponseDecodeError, neighborhood_decoder, scrape_neighborhoods
+)
+
+NEIGHBORHOODS = [
+    {
+        "name": name,
+        "city": "Pune",
+        "state": "Maharashtra",
+        "averageRent": rent,
+        "safetyScore": 8,
+        "walkabilityScore": 7,
+        "image": "URL_placeholder",
+        "description": f"{name} is a well connected residential area with parks and markets nearby.",
+        "amenities": ["Gym", "Supermarket", "Hospital"],
+        "commuteDetails": {"distance": "6 km", "time": "25 mins", "travelMode": "driving"},
+        "matchingFactors": ["Within budget", "Short commute"],
+        "nearbyHighlights": ["Metro station", "Shopping mall"],
+    }
+    for name, rent in (("Baner", "₹25,000/month"), ("Aundh", "₹28,000/month"),
+                       ("Kothrud", "₹22,000/month"), ("Viman Nagar", "₹30,000/month"))
+]
+
+
+def corpus():
+    clean = json.dumps(NEIGHBORHOODS, indent=4, ensure_ascii=False)
+    trailing = re.sub(r'(["\]}\d])(\n\s*[\]}])', r'\1,\2', clean)
+    commented = clean.replace('"safetyScore": 8,', '"safetyScore": 8, // out of 10') \
+                     .replace('"image": "URL_placeholder",', '/* no image yet */ "image": "URL_placeholder",')
+    combined = trailing.replace('"safetyScore": 8,', '"safetyScore": 8, // out of 10')
+    cases = [
+        ('clean', clean, 4),
+        ('fenced', f"```json\n{clean}\n```", 4),
+        ('fenced with prose', f"Here are my recommendations:\n```json\n{clean}\n```\nLet me know!", 4),
+        ('comments', commented, 4),
+        ('trailing commas', trailing, 4),
+        ('fenced, comments, trailing commas', f"```json\n{combined}\n```", 4),
+        ('wrapped in an object', json.dumps({"neighborhoods": NEIGHBORHOODS}, ensure_ascii=False), 4),
+    ]
+    # Output cut off by the token limit at points throughout the document
+    item_ends = [match.end() for match in re.finditer(r'\n    \}', clean)]
+    for fraction in (0.3, 0.45, 0.6, 0.7, 0.8, 0.9, 0.97):
+        cut = int(len(clean) * fraction)
+        complete = sum(1 for end in item_ends if end <= cut)
+        cases.append((f'truncated at {fraction:.0%}', f"```json\n{clean[:cut]}", complete))
+    return cases
+
+
+def legacy_parse(recommendations):
+    """parse_recommendations as it was before the typed decoder (prints removed)."""
+    if recommendations.startswith("```json"):
+        recommendations = recommendations[7:].strip()
+    if recommendations.endswith("```"):
+        recommendations = recommendations[:-3].strip()
+    try:
+        return json.loads(recommendations), False
+    except json.JSONDecodeError:
+        pass
+    try:
+        cleaned_json = re.sub(r'//.*?(\n|$)', '\n', recommendations)
+        cleaned_json = re.sub(r'/\*.*?\*/', '', cleaned_json, flags=re.DOTALL)
+        return json.loads(cleaned_json), False
+    except Exception:
+        pass
+    names = re.findall(r'"name":\s*"([^"]+)"', recommendations)
+    cities = re.findall(r'"city":\s*"([^"]+)"', recommendations)
+    descriptions = re.findall(r'"description":\s*"([^"]+)"', recommendations)
+    simplified = [
+        {"name": names[i], "city": cities[i],
+         "description": descriptions[i] if i < len(descriptions) else "No description available"}
+        for i in range(min(len(names), len(cities)))
+    ]
+    if simplified:
+        return simplified, True
+    raise ValueError("unparseable")
+
+
+def typed_parse(recommendations):
+    """parse_recommendations as it is now."""
+    try:
+        return neighborhood_decoder.decode(recommendations), False
+    except ResponseDecodeError:
+        pass
+    simplified = scrape_neighborhoods(recommendations)
+    if simplified:
+        return simplified, True
+    raise ValueError("unparseable")
+
+
+def outcome(parse, text, complete):
+    try:
+        result, simplified = parse(text)
+    except ValueError:
+        return 'failed'
+    if simplified:
+        return 'simplified'
+    if isinstance(result, list) and result == NEIGHBORHOODS[:complete]:
+        return 'full'
+    return 'wrong'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = corpus()
+    print(f"{'case':>36}  {'legacy':>10}  {'typed':>10}")
+    totals = {'legacy': {}, 'typed': {}}
+    for label, text, complete in cases:
+        results = {}
+        for name, parse in (('legacy', legacy_parse), ('typed', typed_parse)):
+            results[name] = outcome(parse, text, complete)
+            totals[name][results[name]] = totals[name].get(results[name], 0) + 1
+        print(f"{label:>36}  {results['legacy']:>10}  {results['typed']:>10}")
+
+    print()
+    for name, parse in (('legacy', legacy_parse), ('typed', typed_parse)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, text, _ in cases:
+                try:
+                    parse(text)
+                except ValueError:
+                    pass
+        per_decode = (time.perf_counter() - started) / (args.repeat * len(cases)) * 1e6
+        full = totals[name].get('full', 0)
+        print(f"{name:>8}: {full}/{len(cases)} full, {per_decode:8.1f} us per response  {totals[name]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Session lookups per backend, and cookie size vs. Flask's signed cookie.
+
+    python benchmarks/session_store_benchmark.py --requests 2000
+    python benchmarks/session_store_benchmark.py --redis-url redis://localhost:6379/15
+
+Each backend serves the same three routes through a Flask test client:
+one that reads the session, one that writes it, and one that never
+touches it (lazy loading means that one never reads the backend). Redis
+is skipped when nothing answers at --redis-url.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session  # noqa: E402
+from services.session_store import create_session_interface  # noqa: E402
+
+USER = {
+    "uid": "x7Gk2hQpR4ZsV9mWc1LbN8tYe3Ad",
+    "email": "someone@example.com",
+    "name": "Someone Example",
+    "picture": "https://lh3.googleusercontent.com/a/ACg8ocJ" + "x" * 90 + "=s96-c",
+}
+
+
+def make_app(config):
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+    app.config.update(config)
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
+    if config.get('SESSION_TYPE'):
+        app.session_interface = create_session_interface(app.config)
+
+    @app.route('/login')
+    def login():
+        session['user'] = USER
+        session['chat_id'] = 'f' * 32
+        return 'ok'
+
+    @app.route('/read')
+    def read():
+        return session.get('user', {}).get('uid', '')
+
+    @app.route('/write')
+    def write():
+        session['chat_id'] = os.urandom(16).hex()
+        return 'ok'
+
+    @app.route('/untouched')
+    def untouched():
+        return 'ok'
+
+    return app
+
+
+def cookie_bytes(client):
+    cookie = client.get_cookie('session')
+    return len(f"session={cookie.value}") if cookie else 0
+
+
+def run(label, config, requests):
+    app = make_app(config)
+    client = app.test_client()
+    client.get('/login')
+    row = [f"{label:>14}", f"{cookie_bytes(client):>10}"]
+    for route in ('/read', '/write', '/untouched'):
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get(route)
+        row.append(f"{(time.perf_counter() - started) * 1e6 / requests:>12.1f}")
+    print(' '.join(row))
+
+
+def redis_available(url):
+    try:
+        import redis
+        redis.Redis.from_url(url, socket_connect_timeout=0.5).ping()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    args = parser.parse_args()
+
+    print(f"{'backend':>14} {'cookie B':>10} {'read us':>12} {'write us':>12} {'untouched us':>12}")
+    run('signed cookie', {}, args.requests)
+    run('memory', {'SESSION_TYPE': 'memory'}, args.requests)
+    with tempfile.TemporaryDirectory() as tmp:
+        run('filesystem', {'SESSION_TYPE': 'filesystem', 'SESSION_FILE_DIR': tmp}, args.requests)
+    if redis_available(args.redis_url):
+        run('redis', {'SESSION_TYPE': 'redis', 'SESSION_REDIS_URL': args.redis_url}, args.requests)
+    else:
+        print(f"{'redis':>14} skipped, nothing listening at {args.redis_url}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Timeline analytics: the original per-segment keyword loop vs. the
+columnar NumPy engine (services/timeline_analytics.py).
+
+    python benchmarks/timeline_analytics_benchmark.py --segments 1000000
+
+Segments are drawn from a pool of prebuilt dicts so both implementations
+iterate the same objects without the timeline itself dominating memory.
+Note the legacy loop only fills activity counts; the engine additionally
+computes hourly weekday/weekend patterns, top areas and daily counts.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.timeline_analytics import TimelineAnalyzer  # noqa: E402
+
+PLACE_TYPES = ['shopping_mall', 'restaurant', 'cafe', 'movie_theater', 'park',
+               'gym', 'office', 'home', 'grocery_store', 'sports_complex']
+
+
+def legacy_analyze(segments):
+    """The analyze_timeline_data loop as it was before the columnar engine."""
+    analysis = {
+        'common_activities': defaultdict(int),
+        'activity_preferences': {'shopping': 0, 'dining': 0, 'entertainment': 0, 'outdoor': 0, 'fitness': 0},
+    }
+    for segment in segments:
+        if 'placeVisit' in segment:
+            place = segment['placeVisit']
+            location = place.get('location', {})
+            place_type = location.get('type', '')
+            analysis['common_activities'][place_type] += 1
+            if any(keyword in place_type.lower() for keyword in ['shop', 'store', 'mall']):
+                analysis['activity_preferences']['shopping'] += 1
+            elif any(keyword in place_type.lower() for keyword in ['restaurant', 'cafe', 'food']):
+                analysis['activity_preferences']['dining'] += 1
+            elif any(keyword in place_type.lower() for keyword in ['movie', 'theatre', 'entertainment']):
+                analysis['activity_preferences']['entertainment'] += 1
+            elif any(keyword in place_type.lower() for keyword in ['park', 'garden', 'outdoor']):
+                analysis['activity_preferences']['outdoor'] += 1
+            elif any(keyword in place_type.lower() for keyword in ['gym', 'fitness', 'sport']):
+                analysis['activity_preferences']['fitness'] += 1
+    return analysis
+
+
+def segment_pool(size=20000, seed=7):
+    rng = random.Random(seed)
+    start = 1_600_000_000_000
+    pool = []
+    for index in range(size):
+        begin = start + rng.randint(0, 365 * 86400) * 1000
+        pool.append({'placeVisit': {
+            'location': {
+                'latitudeE7': 185000000 + rng.randint(-500000, 500000),
+                'longitudeE7': 738000000 + rng.randint(-500000, 500000),
+                'name': f'Place {rng.randint(0, 3000)}',
+                'type': rng.choice(PLACE_TYPES),
+            },
+            'duration': {
+                'startTimestampMs': str(begin),
+                'endTimestampMs': str(begin + rng.randint(5, 240) * 60000),
+            },
+        }})
+    return pool
+
+
+def segments(pool, count):
+    for index in range(count):
+        yield pool[index % len(pool)]
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>28}: {elapsed:7.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--segments', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    pool = segment_pool()
+    print(f"{args.segments} segments")
+    timed('iteration only', lambda: sum(1 for _ in segments(pool, args.segments)))
+    legacy, _ = timed('legacy keyword loop', legacy_analyze, segments(pool, args.segments))
+
+    analyzer = TimelineAnalyzer()
+    timed('engine: load columns', analyzer.extend, segments(pool, args.segments))
+    engine, _ = timed('engine: batch aggregates', analyzer.result)
+
+    assert engine['activity_preferences'] == legacy['activity_preferences']
+    assert engine['common_activities'] == dict(legacy['common_activities'])
+    print("activity counts match")
+
+
+if __name__ == '__main__':
+    main()
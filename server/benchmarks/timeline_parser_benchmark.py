@@ -0,0 +1,109 @@
+"""
+Peak memory of timeline analysis: json.load vs. the streaming parser.
+
+Writes synthetic Google Timeline exports of increasing size, then analyzes
+each one in a fresh subprocess per mode and reports the child's peak RSS.
+
+    python benchmarks/timeline_parser_benchmark.py --sizes 50,150,300
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLACE_TYPES = ['shopping_mall', 'restaurant', 'cafe', 'movie_theater', 'park', 'gym', 'office', 'home']
+
+
+def write_timeline(path, size_mb):
+    """Write a synthetic export of roughly size_mb megabytes, segment by segment."""
+    target = size_mb * 1024 * 1024
+    rng = random.Random(size_mb)
+    start = 1_600_000_000_000
+    with open(path, 'w') as f:
+        f.write('{"timelineObjects": [')
+        written = 0
+        index = 0
+        while written < target:
+            if index % 3 == 2:
+                segment = {'activitySegment': {
+                    'distance': rng.randint(100, 20000),
+                    'activityType': 'IN_PASSENGER_VEHICLE',
+                    'duration': {'startTimestampMs': str(start + index * 600000)},
+                }}
+            else:
+                segment = {'placeVisit': {
+                    'location': {
+                        'latitudeE7': 185000000 + rng.randint(-500000, 500000),
+                        'longitudeE7': 738000000 + rng.randint(-500000, 500000),
+                        'placeId': f'place-{rng.randint(0, 5000)}',
+                        'name': f'Place {rng.randint(0, 5000)}',
+                        'address': 'Some Street, Pune, Maharashtra, India',
+                        'type': rng.choice(PLACE_TYPES),
+                    },
+                    'duration': {
+                        'startTimestampMs': str(start + index * 600000),
+                        'endTimestampMs': str(start + index * 600000 + 1800000),
+                    },
+                }}
+            chunk = ('' if index == 0 else ',') + json.dumps(segment)
+            f.write(chunk)
+            written += len(chunk)
+            index += 1
+        f.write(']}')
+    return index
+
+
+def run_child(mode, path):
+    sys.path.insert(0, SERVER_DIR)
+    from services.location_service import analyze_timeline_data, analyze_timeline_file
+
+    started = time.perf_counter()
+    if mode == 'json_load':
+        with open(path) as f:
+            result = analyze_timeline_data(json.load(f))
+    else:
+        result = analyze_timeline_file(path)
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    visits = sum(result['common_activities'].values())
+    print(json.dumps({'seconds': round(elapsed, 2), 'peak_rss_mb': round(peak_mb, 1), 'visits': visits}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='50,150,300', help='comma-separated file sizes in MB')
+    parser.add_argument('--modes', default='json_load,stream')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'size':>8} {'segments':>10} {'mode':>10} {'seconds':>8} {'peak RSS':>10}")
+        for size_mb in [int(size) for size in args.sizes.split(',')]:
+            path = os.path.join(tmp, f'timeline_{size_mb}.json')
+            segments = write_timeline(path, size_mb)
+            for mode in args.modes.split(','):
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, path],
+                    capture_output=True, text=True, check=True,
+                ).stdout.strip().splitlines()[-1]
+                result = json.loads(output)
+                print(f"{size_mb:>6}MB {segments:>10} {mode:>10} {result['seconds']:>8} "
+                      f"{result['peak_rss_mb']:>8}MB")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 import firebase_admin
 from firebase_admin import credentials, auth, db
+from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,16 +31,102 @@ except Exception as e:
     print(f"Does file exist? {os.path.exists(cred_path)}")
     raise
 
+# Verified tokens are remembered until they expire, keyed by a hash of the token
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+# How often the Google signing certificates are re-fetched in the background (seconds)
+CERT_REFRESH_SECONDS = int(os.getenv('FIREBASE_CERT_REFRESH_SECONDS', 3600))
+
+# Latency histogram bucket upper bounds (milliseconds)
+LATENCY_BUCKETS_MS = (0.1, 1, 5, 25, 100, 250, 1000, float('inf'))
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_stats = {
+    'hits': 0,
+    'misses': 0,
+    'cert_refreshes': 0,
+    'cert_refresh_errors': 0,
+}
+_latency_histograms = {
+    'cache_hit': [0] * len(LATENCY_BUCKETS_MS),
+    'verify': [0] * len(LATENCY_BUCKETS_MS),
+}
+
+def _record_latency(kind, started):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    histogram = _latency_histograms[kind]
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            histogram[index] += 1
+            break
+
 def verify_firebase_token(id_token):
     """
     Verify Firebase ID Token and return user data.
+    Tokens that verified before are served from memory until their `exp`.
     """
+    started = time.perf_counter()
+    token_hash = hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+    with _token_cache_lock:
+        cached = _token_cache.get(token_hash)
+        if cached is not None:
+            claims, expires_at = cached
+            if time.time() < expires_at:
+                _token_cache.move_to_end(token_hash)
+                _token_stats['hits'] += 1
+                _record_latency('cache_hit', started)
+                return dict(claims)
+            del _token_cache[token_hash]
+        _token_stats['misses'] += 1
+
     try:
         decoded_token = auth.verify_id_token(id_token)
-        return decoded_token  # Returns user info like uid, email, name, etc.
     except Exception as e:
         print(f"Error verifying token: {e}")
         return None
+    finally:
+        with _token_cache_lock:
+            _record_latency('verify', started)
+
+    with _token_cache_lock:
+        _token_cache[token_hash] = (decoded_token, decoded_token.get('exp', 0))
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return dict(decoded_token)  # Returns user info like uid, email, name, etc.
+
+def _refresh_signing_certs():
+    """
+    Keep the Google token signing certificates in firebase_admin's HTTP
+    cache so no verification waits for a certificate download.
+    """
+    while True:
+        try:
+            # firebase_admin has no public hook for this; warm the cache of
+            # the request object its token verifier fetches certificates with
+            verifier = auth._get_client(None)._token_verifier
+            verifier.request(ID_TOKEN_CERT_URI, 'GET')
+            with _token_cache_lock:
+                _token_stats['cert_refreshes'] += 1
+        except Exception as e:
+            print(f"Error prefetching Firebase signing certificates: {e}")
+            with _token_cache_lock:
+                _token_stats['cert_refresh_errors'] += 1
+        time.sleep(CERT_REFRESH_SECONDS)
+
+threading.Thread(target=_refresh_signing_certs, daemon=True).start()
+
+def token_cache_stats():
+    with _token_cache_lock:
+        lookups = _token_stats['hits'] + _token_stats['misses']
+        return {
+            **_token_stats,
+            'entries': len(_token_cache),
+            'max_entries': TOKEN_CACHE_SIZE,
+            'hit_ratio': round(_token_stats['hits'] / lookups, 3) if lookups else None,
+            'latency_ms_buckets': [str(bound) for bound in LATENCY_BUCKETS_MS],
+            'latency_histograms': {kind: list(counts) for kind, counts in _latency_histograms.items()},
+        }
 
 def get_firebase_db_ref():
     """
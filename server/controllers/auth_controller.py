@@ -1,7 +1,47 @@
 from flask import request, jsonify, session
 from config.firebase import verify_firebase_token, get_firebase_db_ref
+from services.db_writer import db_writer
+from collections import OrderedDict
+import threading
 import traceback
 
+# Users whose created_at is known to be set, so logins skip the sentinel check
+KNOWN_USERS_LIMIT = 100000
+_known_users = OrderedDict()
+_known_users_lock = threading.Lock()
+
+def _ensure_created_at(uid):
+    # Transaction on the single created_at leaf: only written if missing
+    get_firebase_db_ref().child(f"users/{uid}/created_at").transaction(
+        lambda current: current if current is not None else {".sv": "timestamp"}
+    )
+    with _known_users_lock:
+        _known_users[uid] = True
+        while len(_known_users) > KNOWN_USERS_LIMIT:
+            _known_users.popitem(last=False)
+
+def record_login(uid, profile):
+    """
+    Upsert the user record without reading it first.
+
+    Profile fields and last_login are queued as one multi-path update. The
+    first login of a user seen by this process also queues a transaction
+    on the small created_at leaf.
+    """
+    prefix = f"users/{uid}"
+    db_writer.update({
+        f"{prefix}/email": profile.get("email"),
+        f"{prefix}/name": profile.get("name", ""),
+        f"{prefix}/picture": profile.get("picture", ""),
+        f"{prefix}/last_login": {".sv": "timestamp"},
+    })
+
+    with _known_users_lock:
+        if uid in _known_users:
+            _known_users.move_to_end(uid)
+            return
+    db_writer.submit(f"created_at {uid}", _ensure_created_at, uid)
+
 def verify_token():
     """
     Verify the Firebase ID token sent from the frontend.
@@ -31,28 +71,9 @@ def verify_token():
             "picture": user_data.get("picture", ""),
         }
         
-        # Store user in Firebase Realtime Database
-        try:
-            db_ref = get_firebase_db_ref()
-            users_ref = db_ref.child('users').child(user_data["uid"])
-            
-            # Check if user exists, if not create a new user record
-            if not users_ref.get():
-                users_ref.set({
-                    "email": user_data.get("email"),
-                    "name": user_data.get("name", ""),
-                    "picture": user_data.get("picture", ""),
-                    "created_at": {".sv": "timestamp"},
-                })
-            else:
-                # Update last login time
-                users_ref.update({
-                    "last_login": {".sv": "timestamp"},
-                })
-        except Exception as e:
-            print(f"Error storing user in database: {e}")
-            # Continue even if database storage fails
-            traceback.print_exc()
+        # Store user in Firebase Realtime Database in the background so the
+        # login response doesn't wait on it
+        record_login(user_data["uid"], session["user"])
 
         return jsonify({
             "message": "Token verified successfully",
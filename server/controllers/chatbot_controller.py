@@ -1,35 +1,35 @@
-import base64
-import os
-from flask import Flask, jsonify, request
-from flask_cors import CORS
+import json
+import threading
+import uuid
+from flask import Response, jsonify, request, session, stream_with_context
 import google.generativeai as genai
+from google.generativeai.protos import Content, Part
+from services.context_cache import ContextCache
+from services.conversation_store import ConversationStore, SUMMARY_TOKEN_BUDGET
+from services.llm_gateway import llm_gateway
+from services.prompt_compiler import prompt_compiler
 
+MODEL_NAME = "gemini-2.0-pro-exp-02-05"
 
-def chatbot_controller():
-    try:
-        data = request.json
-        user_input = data.get("message", "")
+GENERATION_CONFIG = genai.GenerationConfig(
+    temperature=1,
+    top_p=0.95,
+    top_k=64,
+    max_output_tokens=8192
+)
 
-        if not user_input:
-            return jsonify({"error": "Message is required"}), 400
 
-        # Initialize the client with API key
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
-            return jsonify({"error": "API key not found in environment variables"}), 500
-            
-        client = genai.Client(api_key=api_key)
-
-        model = "gemini-2.0-pro-exp-02-05"
-        
-        # Define conversation contents
-        contents = [
-            Content(
-                role="user",
-                parts=[
-                    Part.from_text(
-                        text=
-                    """These are some of the sample prompts along with their sample responses :
+# Few-shot preamble sent ahead of every conversation. Built once at import
+# and kept as a tuple so no request can mutate the shared prefix. It is sent
+# in full, unbudgeted: it is context-cached (see preamble_cache below), so
+# trimming it would save little and change the chatbot's answers.
+PREAMBLE = (
+    Content(
+        role="user",
+        parts=[
+            Part(
+                text=
+            """These are some of the sample prompts along with their sample responses :
 1. General Facilities Inquiry
 Prompt:
 \"Provide detailed information about essential facilities available in [location]. Include hospitals, schools, supermarkets, public transport options, and safety ratings.\"
@@ -738,13 +738,13 @@ Example Response:
 [City A] – Dog parks, pet-friendly restaurants.
 [City B] – Affordable pet care & grooming.
 [City C] – Easy to find pet-friendly apartments.\"*"""
-                    ),
-                ],
             ),
-            Content(
-                role="model",
-                parts=[
-                    Part.from_text(text="""Okay, I'm ready to be your relocate.io smart relocation assistant!  I understand the types of queries you've provided and the kind of detailed, structured responses expected. I'll use the examples as a template for answering future prompts.  I will focus on providing information that is:
+        ],
+    ),
+    Content(
+        role="model",
+        parts=[
+            Part(text="""Okay, I'm ready to be your relocate.io smart relocation assistant!  I understand the types of queries you've provided and the kind of detailed, structured responses expected. I'll use the examples as a template for answering future prompts.  I will focus on providing information that is:
 
                     *   **Comprehensive:** Covering multiple aspects of the query.
                     *   **Structured:** Using bullet points, lists, and clear headings for readability.
@@ -769,33 +769,218 @@ Example Response:
 
                     The more information you give me, the better I can tailor my recommendations. Let's get started! Ask me anything.
                     """),
-                ],
-            ),
-            Content(
-                role="user",
-                parts=[
-                    Part.from_text(text=user_input),
-                ],
-            ),
-        ]
-        
+        ],
+    ),
+)
+
+
+SUMMARY_TEMPLATE = """
+Update the summary of a conversation between a user and a relocation assistant.
+Keep the user's location, budget, preferences and open questions.
+Answer in at most {words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{transcript}
+"""
+
+
+# Provider-side cache of PREAMBLE so turns only upload the new message
+preamble_cache = ContextCache(MODEL_NAME, PREAMBLE, display_name="relocation-chatbot-preamble")
+
+# Running input-token totals, to show what context caching saves
+token_usage = {
+    "turns": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "output_tokens": 0,
+}
+_token_usage_lock = threading.Lock()
+
+
+def _user_message(user_input):
+    return Content(role="user", parts=[Part(text=user_input)])
+
+
+def _summarize_turns(previous_summary, turns):
+    """Fold old chat turns into the running summary with a small model."""
+    prompt = prompt_compiler.compile("chatbot-summary", SUMMARY_TEMPLATE, required={
+        "words": SUMMARY_TOKEN_BUDGET * 3 // 4,
+        "summary": previous_summary or "(none)",
+        "transcript": [f"{role}: {text}" for role, text in turns],
+    })
+    return llm_gateway.generate(prompt, rate_key="chatbot-summary").text
+
+
+# Server-side chat histories keyed by the session's conversation id
+conversations = ConversationStore(summarizer=_summarize_turns)
+
+
+def _conversation_id(reset=False):
+    """Return this session's conversation id, starting a new one on reset."""
+    if reset or "chat_id" not in session:
+        if "chat_id" in session:
+            conversations.reset(session["chat_id"])
+        session["chat_id"] = uuid.uuid4().hex
+    return session["chat_id"]
+
+
+def _history_contents(conversation_id):
+    """Summary and recent turns to send between the preamble and the new message."""
+    summary, turns = conversations.snapshot(conversation_id)
+    contents = []
+    if summary:
+        contents.append(_user_message(f"Summary of our conversation so far:\n{summary}"))
+        contents.append(Content(role="model", parts=[Part(text="Understood, I'll keep that in mind.")]))
+    for role, text in turns:
+        contents.append(Content(role=role, parts=[Part(text=text)]))
+    return contents
+
+
+def _get_api_key():
+    return llm_gateway.api_key()
+
+
+def _start_reply_stream(user_input, history=()):
+    """Start a streamed Gemini generation for the user's message."""
+    llm_gateway.configure()
+    model, prefix = preamble_cache.model_for(GENERATION_CONFIG)
+    return llm_gateway.stream(
+        [*prefix, *history, _user_message(user_input)],
+        model=model,
+        rate_key="chatbot"
+    )
+
+
+def _chunk_text(chunk):
+    # Chunks without text parts (e.g. a bare finish reason) raise on .text
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def _usage(response):
+    """Per-turn token counts; also added to the running totals."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    turn = {
+        "prompt_tokens": usage.prompt_token_count,
+        "cached_tokens": usage.cached_content_token_count,
+        "uncached_input_tokens": usage.prompt_token_count - usage.cached_content_token_count,
+        "output_tokens": usage.candidates_token_count,
+        "total_tokens": usage.total_token_count,
+    }
+    with _token_usage_lock:
+        token_usage["turns"] += 1
+        token_usage["prompt_tokens"] += turn["prompt_tokens"]
+        token_usage["cached_tokens"] += turn["cached_tokens"]
+        token_usage["output_tokens"] += turn["output_tokens"]
+    return turn
+
+
+def token_usage_stats():
+    with _token_usage_lock:
+        stats = dict(token_usage)
+    stats["uncached_input_tokens"] = stats["prompt_tokens"] - stats["cached_tokens"]
+    stats["context_cache"] = preamble_cache.stats()
+    return stats
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def chatbot_controller():
+    try:
+        data = request.json
+        user_input = data.get("message", "")
+
+        if not user_input:
+            return jsonify({"error": "Message is required"}), 400
+
+        # Initialize the client with API key
+        api_key = _get_api_key()
+        if not api_key:
+            return jsonify({"error": "API key not found in environment variables"}), 500
+
+        conversation_id = _conversation_id(reset=bool(data.get("reset")))
+
         # Stream the response
         response = ""
-        for chunk in client.generate_content(
-            model=model,
-            contents=contents,
-            generation_config=GenerateContentConfig(
-                temperature=1,
-                top_p=0.95,
-                top_k=64,
-                max_output_tokens=8192
-            ),
-            stream=True
-        ):
-            if chunk.text:
-                response += chunk.text
+        stream = _start_reply_stream(user_input, _history_contents(conversation_id))
+        for chunk in stream:
+            response += _chunk_text(chunk)
+
+        conversations.append(conversation_id, user_input, response)
 
-        return jsonify({"response": response}), 200
+        return jsonify({"response": response, "usage": _usage(stream)}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+def chatbot_stream_controller():
+    """
+    Stream the chatbot reply as Server-Sent Events.
+
+    Emits `chunk` events as Gemini produces text and a final `done` event
+    carrying token counts. The WSGI server pulls from the generator only as
+    fast as it can write to the client, so a slow client slows the upstream
+    reads, and a disconnect closes the generator and stops reading the upstream
+    stream. Accepts a JSON body on POST or `?message=` on GET (EventSource);
+    pass `reset` to start a new conversation.
+    """
+    if request.method == "GET":
+        data = request.args
+    else:
+        data = request.get_json(silent=True) or {}
+    user_input = data.get("message", "")
+
+    if not user_input:
+        return jsonify({"error": "Message is required"}), 400
+
+    api_key = _get_api_key()
+    if not api_key:
+        return jsonify({"error": "API key not found in environment variables"}), 500
+
+    # Resolve the session before streaming; the cookie is sent with the headers
+    conversation_id = _conversation_id(reset=data.get("reset") in (True, "1", "true"))
+    history = _history_contents(conversation_id)
+
+    def events():
+        # Flush headers right away; the upstream call blocks until its first chunk
+        yield ": stream opened\n\n"
+        response = None
+        finished = False
+        reply = []
+        try:
+            response = _start_reply_stream(user_input, history)
+            for chunk in response:
+                text = _chunk_text(chunk)
+                if text:
+                    reply.append(text)
+                    yield _sse("chunk", {"text": text})
+            finished = True
+            conversations.append(conversation_id, user_input, "".join(reply))
+            yield _sse("done", {"usage": _usage(response)})
+        except GeneratorExit:
+            print("Chat stream closed by client")
+            raise
+        except Exception as e:
+            finished = True
+            print(f"Error in chat stream: {e}")
+            yield _sse("error", {"error": str(e)})
+        finally:
+            if response is not None and not finished:
+                # Stop pulling from the upstream stream and free its slot
+                response.close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,42 @@
+from flask import current_app, jsonify
+from config.firebase import token_cache_stats
+from services.blob_store import blob_store
+from services.db_writer import db_writer
+from services.housing_scorer import housing_scorer
+from services.job_queue import job_queue
+from services.llm_gateway import llm_gateway
+from services.location_service import commute_matrix
+from services.model_registry import model_registry
+from services.neighborhood_store import neighborhood_store
+from services.preferences_cache import preferences_cache
+from services.prompt_compiler import prompt_compiler
+from services.response_decoder import decoder_stats
+from controllers.housing_controller import housing_cache, timeline_analysis_cache, housing_pipeline_stats
+from controllers.chatbot_controller import token_usage_stats, conversations
+from controllers.social_controller import events_feed
+
+def get_diagnostics():
+    """
+    Report the state of the server's process-wide caches.
+    """
+    return jsonify({
+        "gemini_model": model_registry.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "housing_cache": housing_cache.stats(),
+        "timeline_analysis_cache": timeline_analysis_cache.stats(),
+        "housing_pipeline": housing_pipeline_stats(),
+        "llm_responses": decoder_stats(),
+        "prompts": prompt_compiler.stats(),
+        "commute_matrix": commute_matrix.stats(),
+        "neighborhoods": neighborhood_store.stats(),
+        "housing_scorer": housing_scorer.stats(),
+        "firebase_tokens": token_cache_stats(),
+        "db_writer": db_writer.stats(),
+        "preferences_cache": preferences_cache.stats(),
+        "upload_store": blob_store.stats(),
+        "jobs": job_queue.stats(),
+        "sessions": current_app.session_interface.stats(),
+        "chatbot_tokens": token_usage_stats(),
+        "chat_conversations": conversations.stats(),
+        "social_events": events_feed.stats(),
+    }), 200
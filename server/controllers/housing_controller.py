@@ -1,79 +1,231 @@
-from flask import request, jsonify
+from flask import request, jsonify, session
+import hashlib
 import json
 import os
+import re
+import threading
 import traceback
-import google.generativeai as genai
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from services.blob_store import blob_store
+from services.housing_scorer import MODE_SPEED_KMH, ROAD_DETOUR, housing_scorer
+from services.job_queue import job_queue
+from services.llm_gateway import llm_gateway
+from services.location_service import geocode_address
+from services.model_registry import model_registry
+from services.neighborhood_store import neighborhood_store
+from services.preferences import PreferencesError, parse_preferences
+from services.prompt_compiler import Section, prompt_compiler
+from services.response_cache import ResponseCache, make_cache_key
+from services.response_decoder import (
+    ResponseDecodeError, neighborhood_decoder, personality_decoder, ranking_decoder, scrape_neighborhoods
+)
+from services.timeline_digest import digest_timeline_text
 
-# If you need location services, uncomment and fix the import below
-# from services.location_services import get_commute_time, analyze_timeline_data
+# Bump when the prompt changes so cached recommendations are not reused
+HOUSING_PROMPT_VERSION = 4
+
+# Set generation config to ensure proper JSON formatting
+JSON_GENERATION_CONFIG = {
+    "temperature": 0.2,  # Lower temperature for more deterministic output
+    "top_p": 0.8,
+    "top_k": 40,
+    "response_mime_type": "application/json",  # Request JSON response
+}
+
+# Parsed recommendations keyed by normalized preferences
+housing_cache = ResponseCache(
+    max_entries=int(os.getenv('HOUSING_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('HOUSING_CACHE_TTL', 6 * 3600)),
+    disk_dir=os.getenv('HOUSING_CACHE_DIR') or None,
+)
+
+# Personality analyses keyed by the hash of the uploaded timeline
+timeline_analysis_cache = ResponseCache(
+    max_entries=int(os.getenv('TIMELINE_ANALYSIS_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('TIMELINE_ANALYSIS_CACHE_TTL', 24 * 3600)),
+    disk_dir=os.getenv('TIMELINE_ANALYSIS_CACHE_DIR') or None,
+)
+
+# Run timeline analysis concurrently with a baseline recommendation
+TIMELINE_PIPELINE = os.getenv('TIMELINE_PIPELINE', '1') != '0'
+
+# How long to wait for a timeline analysis before answering with the baseline (seconds)
+TIMELINE_ANALYSIS_DEADLINE = float(os.getenv('TIMELINE_ANALYSIS_DEADLINE', 2.0))
+
+# Orchestrates pipelined requests; generations themselves run on the LLM gateway
+_pipeline_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='housing-pipeline')
+
+_pipeline_stats_lock = threading.Lock()
+pipeline_stats = {
+    'enriched_inline': 0,
+    'baseline_returned': 0,
+    'enriched_later': 0,
+    'grounded': 0,
+    'open_ended': 0,
+    'fast': 0,
+    'fast_fallback': 0,
+}
+
+
+def _count(stat):
+    """Increment a pipeline counter; request threads update them concurrently."""
+    with _pipeline_stats_lock:
+        pipeline_stats[stat] += 1
+
+
+def housing_pipeline_stats():
+    with _pipeline_stats_lock:
+        return dict(pipeline_stats)
+
+# Neighbourhoods from the knowledge base offered to the model to rank
+SHORTLIST_SIZE = int(os.getenv('NEIGHBORHOOD_SHORTLIST_SIZE', 8))
+
+# Recommendations returned from a shortlist; if the model ranks fewer than
+# MIN_RECOMMENDATIONS usable names, the rest come from the shortlist order
+RECOMMENDATIONS = 5
+MIN_RECOMMENDATIONS = 3
+
+# How long to wait for the model's recommendations before answering with
+# the local scorer instead (seconds)
+HOUSING_LLM_TIMEOUT = float(os.getenv('HOUSING_LLM_TIMEOUT', 20))
+
+# Input budget for recommendation prompts (estimated tokens)
+HOUSING_PROMPT_TOKENS = int(os.getenv('HOUSING_PROMPT_TOKENS', 2500))
+
+_CAMEL_CASE_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+# Prompt templates, rendered by services.prompt_compiler
+PERSONALITY_TEMPLATE = """
+Analyze this summary of a user's Google Timeline data to understand their personality and preferences.
+Shares are percentages; time_of_day splits visits by local part of day; commute_corridors are the
+most travelled routes with their usual mode, distance and duration.
+
+Timeline Summary:
+{timeline_digest}
+
+Please provide insights about:
+1. Movement patterns (active/sedentary)
+2. Preferred areas of the city
+3. Lifestyle preferences (nightlife, shopping, outdoor activities, etc.)
+4. Common activities and interests
+5. Commute patterns
+
+Return the analysis in JSON format:
+{{
+    "personality_traits": [],
+    "area_preferences": [],
+    "lifestyle_indicators": [],
+    "activity_patterns": [],
+    "commute_insights": []
+}}
+"""
+
+RANKING_TEMPLATE = """
+As a housing recommendation expert, choose the neighborhoods from the candidate list below that best suit this user. Return the response in JSON format.
+
+User Profile:
+- Budget Range: {budget_range} per month
+- User Category: {user_category} ({user_category_description})
+- Work Address: {work_address}
+- Travel Mode: {travel_mode}
+{lifestyle_section}
+{must_haves_section}
+
+{timeline_section}
+
+Candidate Neighborhoods (all within budget and travel distance):
+{shortlist}
+
+Rank the {count} best candidates, best first, using only names from the list. Return in this JSON format:
+[
+    {{
+        "name": "Candidate Name",
+        "description": "Why this neighborhood suits the user...",
+        "matchingFactors": ["factor1", "factor2", ...],
+        "nearbyHighlights": ["highlight1", "highlight2", ...]
+    }},
+    ...
+]
+
+IMPORTANT: Do not include any comments in the JSON. The response must be valid JSON that can be parsed directly.
+"""
+
+RECOMMENDATION_TEMPLATE = """
+As a housing recommendation expert, analyze the following requirements and suggest suitable housing locations around their work address according to their preferences. Return the response in JSON format.
+
+User Profile:
+- Budget Range: {budget_range} per month
+- User Category: {user_category} ({user_category_description})
+- Work Address: {work_address}
+- Travel Mode: {travel_mode}
+- Maximum Travel Distance: {max_distance:g} km
+{lifestyle_section}
+{must_haves_section}
+
+{timeline_section}
+
+Please recommend 3-5 specific neighborhoods that match these criteria. Return in this JSON format:
+[
+    {{
+        "name": "Neighborhood Name",
+        "city": "City Name",
+        "state": "State Name",
+        "averageRent": "₹X,XXX/month",
+        "safetyScore": 0-10,
+        "walkabilityScore": 0-10,
+        "image": "URL_placeholder",
+        "description": "Detailed description...",
+        "amenities": ["amenity1", "amenity2", ...],
+        "commuteDetails": {{
+            "distance": "X km",
+            "time": "X mins",
+            "travelMode": "{travel_mode}"
+        }},
+        "matchingFactors": ["factor1", "factor2", ...],
+        "nearbyHighlights": ["highlight1", "highlight2", ...]
+    }},
+    ...
+]
+
+IMPORTANT: Do not include any comments in the JSON. The response must be valid JSON that can be parsed directly.
+"""
 
 def analyze_user_personality(timeline_text):
     """Analyze user's timeline text to understand their personality and preferences."""
-    prompt = f"""
-    Analyze this user's Google Timeline data to understand their personality and preferences:
-    
-    Timeline Data:
-    {timeline_text[:500]}  # Sending only the first 500 characters to avoid overflow.
-
-    Please provide insights about:
-    1. Movement patterns (active/sedentary)
-    2. Preferred areas of the city
-    3. Lifestyle preferences (nightlife, shopping, outdoor activities, etc.)
-    4. Common activities and interests
-    5. Commute patterns
-
-    Return the analysis in JSON format:
-    {{
-        "personality_traits": [],
-        "area_preferences": [],
-        "lifestyle_indicators": [],
-        "activity_patterns": [],
-        "commute_insights": []
-    }}
-    """
-    
     try:
+        timeline_digest = digest_timeline_text(timeline_text)
+    except Exception as e:
+        # Recommendations go ahead without the analysis, as for a failed generation
+        print(f"Error digesting timeline: {str(e)}")
+        print(traceback.format_exc())
+        return None
+    return analyze_timeline_digest(timeline_digest)
+
+def analyze_timeline_digest(timeline_digest):
+    """Personality analysis from a digest made by services.timeline_digest."""
+    try:
+        prompt = prompt_compiler.compile(
+            'housing-personality', PERSONALITY_TEMPLATE, required={'timeline_digest': timeline_digest}
+        )
+
         # Configure the Gemini API with your API key
         api_key = os.getenv('GOOGLE_AI_KEY')
         if not api_key:
             print("Warning: GOOGLE_AI_KEY environment variable not set")
             return None
             
-        genai.configure(api_key=api_key)
-        
-        # Get an available model
-        model_name = get_available_gemini_model()
-        
-        # Create the model
-        model = genai.GenerativeModel(model_name)
-        
-        # Set generation config to ensure proper JSON formatting
-        generation_config = {
-            "temperature": 0.2,  # Lower temperature for more deterministic output
-            "top_p": 0.8,
-            "top_k": 40,
-            "response_mime_type": "application/json",  # Request JSON response
-        }
-        
-        # Generate the content with the specified config
-        response = model.generate_content(
+        # Generate the content through the shared gateway
+        response = llm_gateway.generate(
             prompt,
-            generation_config=generation_config
+            generation_config=JSON_GENERATION_CONFIG,
+            rate_key='housing'
         )
         
         # Parse the response
         if hasattr(response, 'text'):
             try:
-                # Clean up the response if it contains markdown code blocks
-                response_text = response.text
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:].strip()
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3].strip()
-                    
-                return json.loads(response_text)
-            except json.JSONDecodeError as e:
+                return personality_decoder.decode(response.text)
+            except ResponseDecodeError as e:
                 print(f"Error parsing JSON response: {e}")
                 return None
         else:
@@ -85,170 +237,411 @@ def analyze_user_personality(timeline_text):
         print(traceback.format_exc())
         return None
 
-def generate_housing_prompt(user_data, timeline_analysis=None):
-    """Generate a prompt for Gemini API with enhanced user data."""
-    
-    # Get budget range based on user category
-    budget_ranges = {
-        'budget': '₹5000 - ₹8000',
-        'moderate': '₹8000 - ₹12000',
-        'comfort': '₹12000 - ₹18000',
-        'premium': '₹18000 - ₹24000',
-        'luxury': '₹24000 - ₹50000'
+def housing_cache_key(preferences, timeline_text=None, timeline_digest=None):
+    """
+    Build a content-addressed cache key for a housing request from the
+    preferences' canonical form (see Preferences.canonical). A timeline is
+    identified by its text or, for uploads, by the upload's SHA-256.
+    """
+    return make_cache_key({
+        'v': HOUSING_PROMPT_VERSION,
+        'preferences': preferences.canonical(),
+        'timeline': make_cache_key(timeline_text) if timeline_text else timeline_digest,
+    })
+
+def resolve_work_location(preferences, geocode=True):
+    """
+    (lat, lng) of the work address: sent by the client, a known
+    neighbourhood, or (if `geocode`) geocoded, which is a network call.
+    """
+    if preferences.work_location is not None:
+        return preferences.work_location
+    work_address = preferences.work_address
+    if work_address == 'Not specified':
+        return None
+    location = neighborhood_store.locate(work_address)
+    if location is None and geocode:
+        location = geocode_address(work_address)
+    return location
+
+def shortlist_neighborhoods(preferences):
+    """
+    Candidate neighbourhoods from the knowledge base: within the travel
+    distance of work, affordable and with the must-haves. Empty if the
+    work address can't be placed or is outside the covered area.
+    """
+    location = resolve_work_location(preferences)
+    if location is None:
+        return []
+    indices, distances, matches, applied = neighborhood_store.candidates(
+        location[0], location[1], preferences.max_distance / ROAD_DETOUR,
+        budget_range=preferences.budget,
+        must_haves=preferences.must_haves,
+        lifestyle_mask=preferences.lifestyle_mask,
+        limit=SHORTLIST_SIZE,
+    )
+    category = preferences.budget_category
+    shortlist = []
+    for i, distance, lifestyle_matches in zip(indices.tolist(), distances.tolist(), matches.tolist()):
+        record = neighborhood_store.record(i)
+        shortlist.append({
+            'record': record,
+            # Work inside the neighbourhood still means some commute
+            'distance_km': max(1.0, round(distance * ROAD_DETOUR, 1)),
+            'rent': record['rent'][category],
+            'lifestyle_matches': lifestyle_matches,
+            'must_haves_met': applied,
+        })
+    return shortlist
+
+def _label(tag):
+    """'groceryStores' -> 'Grocery stores'."""
+    return _CAMEL_CASE_BOUNDARY.sub(' ', tag).capitalize()
+
+def _shortlist_lines(shortlist):
+    lines = []
+    for candidate in shortlist:
+        record = candidate['record']
+        scores = record['scores']
+        low, high = candidate['rent']
+        lines.append(
+            f"- {record['name']}: {candidate['distance_km']} km from work, rent ₹{low}-₹{high}, "
+            f"amenities: {', '.join(record['amenities'])}; known for: {', '.join(record['lifestyle'])}; "
+            f"safety {scores['safety']}/10, walkability {scores['walkability']}/10, transit {scores['transit']}/10"
+        )
+    return lines
+
+def generate_housing_prompt(preferences, timeline_analysis=None, shortlist=None):
+    """
+    Generate a prompt for Gemini API with enhanced user data. With a
+    shortlist, the model only ranks and describes those neighbourhoods.
+    `preferences` is a Preferences (raw preference dicts are parsed).
+    """
+    preferences = parse_preferences(preferences)
+    travel_mode = preferences.travel_mode
+
+    if preferences.prioritized:
+        must_haves = ', '.join(
+            f"{name} (Priority: {priority})" for name, priority in zip(preferences.must_haves, preferences.priorities)
+        )
+        must_haves_section = f"- Prioritized Must-Have Amenities: {must_haves}"
+    else:
+        must_haves_section = f"- Must-Have Amenities: {', '.join(preferences.must_haves)}"
+
+    lifestyle_section = "- Lifestyle Preferences: None specified"
+    if preferences.lifestyle:
+        lifestyle_section = f"- Lifestyle Preferences: {', '.join(preferences.lifestyle)}"
+
+    required = {
+        'budget_range': preferences.budget_range,
+        'user_category': preferences.user_category,
+        'user_category_description': preferences.user_category_description,
+        'work_address': preferences.work_address,
+        'travel_mode': travel_mode,
+        'lifestyle_section': lifestyle_section,
+        'must_haves_section': must_haves_section,
     }
-    
-    budget_range = budget_ranges.get(user_data['userCategory'], '₹8000 - ₹12000')  # moderate as default
+    # Only the timeline analysis is trimmed if the prompt is over budget
+    optional = {'timeline_section': Section(timeline_analysis, 'Timeline Analysis:\n')}
+    if shortlist:
+        required['shortlist'] = _shortlist_lines(shortlist)
+        required['count'] = min(RECOMMENDATIONS, len(shortlist))
+        return prompt_compiler.compile(
+            'housing-recommendations', RANKING_TEMPLATE, required, optional, budget=HOUSING_PROMPT_TOKENS
+        )
+    required['max_distance'] = preferences.max_distance
+    return prompt_compiler.compile(
+        'housing-recommendations', RECOMMENDATION_TEMPLATE, required, optional, budget=HOUSING_PROMPT_TOKENS
+    )
+
+def get_available_gemini_model():
+    """Get an available Gemini model (resolved once and cached process-wide)."""
+    return model_registry.get_model_name()
+
+class RecommendationParseError(Exception):
+    """Raised when no recommendations could be recovered from the model output."""
+
+    def __init__(self, raw_response):
+        super().__init__('Failed to parse recommendations JSON')
+        self.raw_response = raw_response
 
-    # Format timeline analysis if available
-    timeline_section = ""
+def parse_recommendations(recommendations):
+    """
+    Parse the model's recommendations. Returns `(recommendations, simplified)`
+    where `simplified` is True if only names/cities/descriptions could be
+    scraped from malformed JSON.
+    """
+    try:
+        return neighborhood_decoder.decode(recommendations), False
+    except ResponseDecodeError as e:
+        print(f"Failed to parse recommendations JSON: {str(e)}")
+        print(f"Raw response: {recommendations}")
+
+    # As a last resort, scrape what fields we can
+    simplified_recommendations = scrape_neighborhoods(recommendations)
+    if simplified_recommendations:
+        return simplified_recommendations, True
+
+    raise RecommendationParseError(recommendations)
+
+def grounded_recommendation(candidate, ranked, travel_mode):
+    """A recommendation with facts from the knowledge base and wording from the model."""
+    record = candidate['record']
+    low, high = candidate['rent']
+    minutes = round(candidate['distance_km'] / MODE_SPEED_KMH.get(travel_mode, 20) * 60)
+    return {
+        'name': record['name'],
+        'city': record['city'],
+        'state': record['state'],
+        'averageRent': f"₹{low:,} - ₹{high:,}/month",
+        'safetyScore': record['scores']['safety'],
+        'walkabilityScore': record['scores']['walkability'],
+        'description': ranked.get('description') or f"{record['name']} is within your budget and commute range.",
+        'amenities': [_label(tag) for tag in record['amenities']],
+        'commuteDetails': {
+            'distance': f"{candidate['distance_km']} km",
+            'time': f"{minutes} mins",
+            'travelMode': travel_mode,
+        },
+        'matchingFactors': ranked.get('matchingFactors') or [_label(tag) for tag in candidate['must_haves_met']],
+        'nearbyHighlights': ranked.get('nearbyHighlights', []),
+        'coordinates': {'lat': record['lat'], 'lng': record['lng']},
+    }
+
+def parse_ranking(response_text, shortlist, travel_mode):
+    """
+    Turn the model's ranking of a shortlist into recommendations. Names not
+    on the shortlist are ignored, and short rankings are topped up from
+    the shortlist. Returns `(recommendations, simplified)`; if no ranking
+    could be read, the shortlist order is used and `simplified` is True.
+    """
+    by_name = {candidate['record']['name'].lower(): candidate for candidate in shortlist}
+    try:
+        ranked = ranking_decoder.decode(response_text)
+    except ResponseDecodeError as e:
+        print(f"Failed to parse neighborhood ranking: {str(e)}")
+        ranked = []
+
+    recommendations = []
+    for item in ranked:
+        candidate = by_name.pop(item['name'].strip().lower(), None)
+        if candidate is not None:
+            recommendations.append(grounded_recommendation(candidate, item, travel_mode))
+    if not recommendations:
+        return [grounded_recommendation(candidate, {}, travel_mode) for candidate in shortlist[:RECOMMENDATIONS]], True
+    for candidate in shortlist:
+        if len(recommendations) >= MIN_RECOMMENDATIONS:
+            break
+        if candidate['record']['name'].lower() in by_name:
+            recommendations.append(grounded_recommendation(candidate, {}, travel_mode))
+    return recommendations[:RECOMMENDATIONS], False
+
+def fast_recommendations(preferences):
+    """
+    Recommendations ranked by the local scorer, without the model or any
+    other network call. None if the work address can't be placed locally
+    (no coordinates from the client and no known neighbourhood matches it);
+    empty if nothing is in reach.
+    """
+    location = resolve_work_location(preferences, geocode=False)
+    if location is None:
+        return None
+    must_haves = preferences.must_haves
+    lifestyle = set(preferences.lifestyle)
+    indices, scores, distances, modes = housing_scorer.rank(
+        location[0], location[1],
+        budget=preferences.budget,
+        travel_distances=preferences.travel_distances,
+        must_haves=must_haves,
+        lifestyle_mask=preferences.lifestyle_mask,
+        limit=RECOMMENDATIONS,
+    )
+    category = preferences.budget_category
+    recommendations = []
+    for i, score, distance, mode in zip(indices.tolist(), scores.tolist(), distances.tolist(), modes):
+        record = neighborhood_store.record(i)
+        candidate = {
+            'record': record,
+            'distance_km': max(1.0, round(distance, 1)),
+            'rent': record['rent'][category],
+            'must_haves_met': [tag for tag in must_haves if tag in record['amenities']]
+                              + [tag for tag in record['lifestyle'] if tag in lifestyle],
+        }
+        recommendation = grounded_recommendation(candidate, {}, mode)
+        recommendation['matchScore'] = round(100 * score)
+        recommendations.append(recommendation)
+    return recommendations
+
+def fast_response(preferences, timeline_analysis=None, note=None):
+    """Response payload from fast_recommendations, or None if it can't answer."""
+    recommendations = fast_recommendations(preferences)
+    if not recommendations:
+        return None
+    response_data = {
+        'success': True,
+        'mode': 'fast',
+        'recommendations': recommendations,
+    }
     if timeline_analysis:
-        timeline_section = f"Timeline Analysis:\n{json.dumps(timeline_analysis, indent=2)}"
-    
-    # Format prioritized must-haves if available
-    must_haves_section = ""
-    if 'prioritizedMustHaves' in user_data and user_data['prioritizedMustHaves']:
-        must_haves = []
-        for item in user_data['prioritizedMustHaves']:
-            must_haves.append(f"{item['name']} (Priority: {item['priority']})")
-        must_haves_section = f"- Prioritized Must-Have Amenities: {', '.join(must_haves)}"
-    else:
-        # Fallback to old format if prioritizedMustHaves is not available
-        must_haves = []
-        if 'mustHaves' in user_data and isinstance(user_data['mustHaves'], dict):
-            must_haves = [key for key, value in user_data['mustHaves'].items() if value]
-        must_haves_section = f"- Must-Have Amenities: {', '.join(must_haves)}"
-
-    # Get commute details
-    commute_details = user_data.get('commute', {})
-    work_address = commute_details.get('workAddress', 'Not specified')
-    travel_mode = commute_details.get('travelMode', 'driving')
-    
-    # Calculate max distance based on the selected travel mode
-    max_distance = None
-    if 'travelModes' in commute_details and travel_mode in commute_details['travelModes']:
-        max_distance = commute_details['travelModes'][travel_mode].get('distance', 10)
+        response_data['timelineAnalysis'] = timeline_analysis
+    if note:
+        response_data['note'] = note
+    return response_data
+
+def generate_recommendations(preferences, timeline_analysis=None):
+    """
+    Ask Gemini for recommendations and build the response payload. If the
+    model doesn't answer within HOUSING_LLM_TIMEOUT, the local scorer's
+    ranking is returned instead (when it has one).
+    """
+    shortlist = shortlist_neighborhoods(preferences)
+    _count('grounded' if shortlist else 'open_ended')
+
+    # Generate prompt for Gemini
+    prompt = generate_housing_prompt(preferences, timeline_analysis, shortlist)
+
+    # Get recommendations from Gemini through the shared gateway
+    try:
+        response = llm_gateway.generate(
+            prompt,
+            generation_config=JSON_GENERATION_CONFIG,
+            rate_key='housing',
+            timeout=HOUSING_LLM_TIMEOUT
+        )
+    except TimeoutError:
+        print(f"Gemini did not answer within {HOUSING_LLM_TIMEOUT}s, using the local scorer")
+        response_data = fast_response(
+            preferences, timeline_analysis,
+            note='Ranked locally because the recommendation service timed out'
+        )
+        if response_data is None:
+            raise
+        _count('fast_fallback')
+        return response_data
+
+    if not response or not hasattr(response, 'text'):
+        raise RuntimeError('Failed to get response from Gemini API')
+
+    if shortlist:
+        recommendations, simplified = parse_ranking(response.text, shortlist, preferences.travel_mode)
     else:
-        # Default values by travel mode if not specified
-        default_distances = {
-            'walking': 5,
-            'bicycling': 10,
-            'transit': 15,
-            'driving': 20
-        }
-        max_distance = default_distances.get(travel_mode, 10)
-
-    # Get lifestyle preferences
-    lifestyle_prefs = []
-    if 'lifestylePreferences' in user_data:
-        if isinstance(user_data['lifestylePreferences'], list):
-            # Map numeric indices to actual lifestyle names if needed
-            lifestyle_options = [
-                'accessibility', 'activeLifestyle', 'affordability', 'amenities', 
-                'artsAndMusic', 'casual', 'casualDining', 'cleanliness', 
-                'community', 'convenient', 'cultural', 'entertainment', 
-                'familyFriendly', 'fineDining', 'greenSpaces', 'healthy', 
-                'internationalCuisine', 'nightlife', 'outdoorActivities', 
-                'quiet', 'quietness', 'relaxing', 'safety', 'shopping', 
-                'socialGatherings'
-            ]
-            
-            # Check if the preferences are numeric indices
-            if all(isinstance(pref, str) and pref.isdigit() for pref in user_data['lifestylePreferences']):
-                # Convert numeric indices to lifestyle names
-                lifestyle_prefs = [
-                    lifestyle_options[int(idx)] if int(idx) < len(lifestyle_options) else f"preference_{idx}"
-                    for idx in user_data['lifestylePreferences']
-                ]
-            else:
-                # Use the preferences as they are
-                lifestyle_prefs = user_data['lifestylePreferences']
-        elif isinstance(user_data['lifestylePreferences'], dict):
-            lifestyle_prefs = [key for key, value in user_data['lifestylePreferences'].items() if value]
-    # Check for legacy 'lifestyle' key
-    elif 'lifestyle' in user_data and isinstance(user_data['lifestyle'], dict):
-        lifestyle_prefs = [key for key, value in user_data['lifestyle'].items() if value]
-    
-    # Format lifestyle preferences for display
-    lifestyle_section = "- Lifestyle Preferences: None specified"
-    if lifestyle_prefs:
-        lifestyle_section = f"- Lifestyle Preferences: {', '.join(lifestyle_prefs)}"
-
-    prompt = f"""
-    As a housing recommendation expert, analyze the following requirements and suggest suitable housing locations around their work address according to their preferences. Return the response in JSON format.
-
-    User Profile:
-    - Budget Range: {budget_range} per month
-    - User Category: {user_data['userCategory']} ({user_data.get('userCategoryDescription', '')})
-    - Work Address: {work_address}
-    - Travel Mode: {travel_mode}
-    - Maximum Travel Distance: {max_distance} km
-    {lifestyle_section}
-    {must_haves_section}
-
-    {timeline_section}
-    
-    Please recommend 3-5 specific neighborhoods that match these criteria. Return in this JSON format:
-    [
-        {{
-            "name": "Neighborhood Name",
-            "city": "City Name",
-            "state": "State Name",
-            "averageRent": "₹X,XXX/month",
-            "safetyScore": 0-10,
-            "walkabilityScore": 0-10,
-            "image": "URL_placeholder",
-            "description": "Detailed description...",
-            "amenities": ["amenity1", "amenity2", ...],
-            "commuteDetails": {{
-                "distance": "X km",
-                "time": "X mins",
-                "travelMode": "{travel_mode}"
-            }},
-            "matchingFactors": ["factor1", "factor2", ...],
-            "nearbyHighlights": ["highlight1", "highlight2", ...]
-        }},
-        ...
-    ]
-    
-    IMPORTANT: Do not include any comments in the JSON. The response must be valid JSON that can be parsed directly.
+        recommendations, simplified = parse_recommendations(response.text)
+    response_data = {
+        'success': True,
+        'recommendations': recommendations,
+    }
+    # Add timeline analysis to response if available
+    if timeline_analysis:
+        response_data['timelineAnalysis'] = timeline_analysis
+    if simplified:
+        response_data['note'] = 'This is a simplified response due to JSON parsing issues'
+    return response_data
+
+def _is_cacheable(response_data):
+    return 'note' not in response_data and 'enrichment' not in response_data
+
+def precomputed_timeline_analysis(timeline_text=None, digest=None):
+    """
+    Personality analysis computed by the background job for an upload,
+    looked up by the upload's SHA-256 (or the SHA-256 of text that is the
+    uploaded file). None if there is none yet.
     """
-    return prompt
+    if digest is None and timeline_text:
+        digest = hashlib.sha256(timeline_text.encode('utf-8')).hexdigest()
+    if not digest:
+        return None
+    return blob_store.get_artifact(digest, 'personality')
 
-def get_available_gemini_model():
-    """Get an available Gemini model from the list of models."""
+def latest_timeline_digest():
+    """SHA-256 of the current user's most recently processed upload, if any."""
+    user = session.get('user')
+    if not user:
+        return None
+    job = job_queue.latest_done('timeline', user['uid'])
+    return job['key'] if job else None
+
+def get_timeline_analysis(timeline_text):
+    """Personality analysis for an uploaded timeline, cached by content hash."""
+    analysis_key = make_cache_key(timeline_text)
+    timeline_analysis = timeline_analysis_cache.get(analysis_key)
+    if timeline_analysis is None:
+        timeline_analysis = precomputed_timeline_analysis(timeline_text)
+        if timeline_analysis:
+            timeline_analysis_cache.set(analysis_key, timeline_analysis)
+    if timeline_analysis is None:
+        timeline_analysis = analyze_user_personality(timeline_text)
+        if timeline_analysis:
+            timeline_analysis_cache.set(analysis_key, timeline_analysis)
+    return timeline_analysis
+
+def _baseline_recommendations(preferences):
+    """Recommendations without timeline analysis, shared with plain requests."""
+    baseline_key = housing_cache_key(preferences)
+    response_data = housing_cache.get(baseline_key)
+    if response_data is None:
+        response_data = generate_recommendations(preferences)
+        if _is_cacheable(response_data):
+            housing_cache.set(baseline_key, response_data)
+    return dict(response_data)
+
+def _enrich_later(preferences, cache_key, analysis_future):
+    """Once a late timeline analysis lands, cache the enriched recommendations."""
     try:
-        models = genai.list_models()
-        model_names = [model.name for model in models]
-        print("Available models:", model_names)
-        
-        # Try models in order of preference
-        preferred_models = [
-            'gemini-1.5-flash',
-            'gemini-1.5-pro',
-            'gemini-pro',
-            'gemini-pro-vision',
-            'models/gemini-1.0-pro',
-            'models/gemini-pro'
-        ]
-        
-        for model_name in preferred_models:
-            if any(model_name in name for name in model_names):
-                matching_models = [name for name in model_names if model_name in name]
-                print(f"Using model: {matching_models[0]}")
-                return matching_models[0]
-        
-        # If none of the preferred models are available, use the first available model
-        if model_names:
-            print(f"Using first available model: {model_names[0]}")
-            return model_names[0]
-        
-        # Default fallback
-        print("No models available, using default: gemini-1.5-flash")
-        return 'gemini-1.5-flash'
+        timeline_analysis = analysis_future.result()
+        if not timeline_analysis:
+            return
+        response_data = generate_recommendations(preferences, timeline_analysis)
+        if _is_cacheable(response_data):
+            housing_cache.set(cache_key, response_data)
+        _count('enriched_later')
     except Exception as e:
-        print(f"Error listing models: {e}")
-        print("Using default model: gemini-1.5-flash")
-        return 'gemini-1.5-flash'
+        print(f"Error enriching recommendations: {e}")
+
+def recommend_with_timeline(preferences, timeline_text, cache_key):
+    """
+    Recommendations for a request with timeline data.
+
+    With a cached analysis this is a single generation. Otherwise the
+    analysis and a baseline (timeline-free) recommendation run concurrently;
+    if the analysis lands within TIMELINE_ANALYSIS_DEADLINE the enriched
+    recommendation is generated and returned, else the baseline is returned
+    and the enriched result is generated in the background and cached for
+    the next identical request.
+    """
+    timeline_analysis = (timeline_analysis_cache.get(make_cache_key(timeline_text))
+                         or precomputed_timeline_analysis(timeline_text))
+    if timeline_analysis is not None:
+        return generate_recommendations(preferences, timeline_analysis)
+
+    if not TIMELINE_PIPELINE:
+        return generate_recommendations(preferences, get_timeline_analysis(timeline_text))
+
+    analysis_future = _pipeline_executor.submit(get_timeline_analysis, timeline_text)
+    baseline_future = _pipeline_executor.submit(_baseline_recommendations, preferences)
+
+    try:
+        timeline_analysis = analysis_future.result(timeout=TIMELINE_ANALYSIS_DEADLINE)
+    except TimeoutError:
+        timeline_analysis = None
+
+    if timeline_analysis:
+        _count('enriched_inline')
+        return generate_recommendations(preferences, timeline_analysis)
+
+    response_data = baseline_future.result()
+    _count('baseline_returned')
+    if not analysis_future.done():
+        response_data['enrichment'] = 'pending'
+        analysis_future.add_done_callback(
+            lambda future: _pipeline_executor.submit(_enrich_later, preferences, cache_key, future)
+        )
+    return response_data
+
+def _with_cache_headers(response, status):
+    """Tag a recommendation response with its cache status."""
+    response.headers['X-Cache'] = status
+    response.headers['Cache-Control'] = f'private, max-age={housing_cache.ttl}'
+    return response
 
 def recommend_housing():
     try:
@@ -264,26 +657,60 @@ def recommend_housing():
             }), 400
         
         # Extract preferences from data
-        preferences = data.get('preferences', data)  # Try both formats
+        raw_preferences = data.get('preferences', data)  # Try both formats
+        mode = data.get('mode') or request.args.get('mode', 'llm')
         
         # Validate required fields
-        if 'userCategory' not in preferences:
+        if 'userCategory' not in raw_preferences:
             return jsonify({
                 'success': False,
                 'error': 'Missing userCategory in preferences'
             }), 400
             
-        if 'commute' not in preferences or not isinstance(preferences['commute'], dict):
+        if 'commute' not in raw_preferences or not isinstance(raw_preferences['commute'], dict):
             return jsonify({
                 'success': False,
                 'error': 'Missing or invalid commute information in preferences'
             }), 400
+
+        # Normalize once; everything below works from the parsed preferences
+        try:
+            preferences = parse_preferences(raw_preferences)
+        except PreferencesError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        # Fast mode: rank locally, no model call and no cache needed
+        if mode == 'fast':
+            response_data = fast_response(preferences)
+            if response_data is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Fast mode needs work coordinates or a work address in a known '
+                             'neighborhood, with neighborhoods in reach of it'
+                }), 422
+            _count('fast')
+            return jsonify(response_data)
         
-        # Process timeline data if provided
+        # Without timeline text, use the analysis precomputed for the user's
+        # latest upload (or the upload named by timelineSha256)
+        timeline_text = data.get('timelineData')
+        timeline_digest = None
         timeline_analysis = None
-        if 'timelineData' in data:
-            timeline_analysis = analyze_user_personality(data['timelineData'])
-        
+        if not timeline_text:
+            timeline_digest = data.get('timelineSha256') or latest_timeline_digest()
+            timeline_analysis = precomputed_timeline_analysis(digest=timeline_digest)
+            if timeline_analysis is None:
+                timeline_digest = None
+
+        # Serve identical requests from the response cache
+        cache_key = housing_cache_key(preferences, timeline_text, timeline_digest)
+        cached_response = housing_cache.get(cache_key)
+        if cached_response is not None:
+            return _with_cache_headers(jsonify(cached_response), 'HIT')
+
         # Check for API key
         google_ai_key = os.getenv('GOOGLE_AI_KEY')
         if not google_ai_key:
@@ -293,121 +720,25 @@ def recommend_housing():
             }), 500
 
         try:
-            # Generate prompt for Gemini
-            prompt = generate_housing_prompt(preferences, timeline_analysis)
-            print("Generated prompt:", prompt)
-            
-            # Get recommendations from Gemini
-            genai.configure(api_key=google_ai_key)
-            
-            # Get an available model
-            model_name = get_available_gemini_model()
-            
-            # Create the model
-            model = genai.GenerativeModel(model_name)
-            
-            # Set generation config to ensure proper JSON formatting
-            generation_config = {
-                "temperature": 0.2,  # Lower temperature for more deterministic output
-                "top_p": 0.8,
-                "top_k": 40,
-                "response_mime_type": "application/json",  # Request JSON response
-            }
-            
-            # Generate the content with the specified config
-            response = model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            if not response or not hasattr(response, 'text'):
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to get response from Gemini API'
-                }), 500
+            # Process timeline data if provided
+            if timeline_text:
+                response_data = recommend_with_timeline(preferences, timeline_text, cache_key)
+            elif timeline_analysis:
+                response_data = generate_recommendations(preferences, timeline_analysis)
+            else:
+                response_data = generate_recommendations(preferences)
 
-            # Process the response
-            recommendations = response.text
-            
-            # Clean up the response
-            if recommendations.startswith("```json"):
-                recommendations = recommendations[7:].strip()
-            if recommendations.endswith("```"):
-                recommendations = recommendations[:-3].strip()
+            if _is_cacheable(response_data):
+                housing_cache.set(cache_key, response_data)
+            return _with_cache_headers(jsonify(response_data), 'MISS')
 
-            try:
-                parsed_recommendations = json.loads(recommendations)
-                
-                # Add timeline analysis to response if available
-                response_data = {
-                    'success': True,
-                    'recommendations': parsed_recommendations,
-                }
-                if timeline_analysis:
-                    response_data['timelineAnalysis'] = timeline_analysis
-                
-                return jsonify(response_data)
-                
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse recommendations JSON: {str(e)}")
-                print(f"Raw response: {recommendations}")
-                
-                # Try to clean up the JSON by removing comments and fixing formatting issues
-                try:
-                    # Remove comments (both // and /* */ style)
-                    import re
-                    cleaned_json = re.sub(r'//.*?(\n|$)', '\n', recommendations)
-                    cleaned_json = re.sub(r'/\*.*?\*/', '', cleaned_json, flags=re.DOTALL)
-                    
-                    # Try to parse the cleaned JSON
-                    parsed_recommendations = json.loads(cleaned_json)
-                    
-                    response_data = {
-                        'success': True,
-                        'recommendations': parsed_recommendations,
-                    }
-                    if timeline_analysis:
-                        response_data['timelineAnalysis'] = timeline_analysis
-                    
-                    return jsonify(response_data)
-                except Exception as cleanup_error:
-                    print(f"Failed to clean up and parse JSON: {str(cleanup_error)}")
-                    
-                    # As a last resort, try to manually fix the JSON
-                    try:
-                        # Create a simplified response with the data we can extract
-                        import re
-                        
-                        # Extract neighborhood names
-                        names = re.findall(r'"name":\s*"([^"]+)"', recommendations)
-                        cities = re.findall(r'"city":\s*"([^"]+)"', recommendations)
-                        descriptions = re.findall(r'"description":\s*"([^"]+)"', recommendations)
-                        
-                        # Create a simplified response
-                        simplified_recommendations = []
-                        for i in range(min(len(names), len(cities))):
-                            neighborhood = {
-                                "name": names[i],
-                                "city": cities[i],
-                                "description": descriptions[i] if i < len(descriptions) else "No description available"
-                            }
-                            simplified_recommendations.append(neighborhood)
-                        
-                        if simplified_recommendations:
-                            return jsonify({
-                                'success': True,
-                                'recommendations': simplified_recommendations,
-                                'note': 'This is a simplified response due to JSON parsing issues'
-                            })
-                    except Exception as manual_error:
-                        print(f"Failed to manually extract data: {str(manual_error)}")
-                
-                # If all attempts fail, return the error
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to parse recommendations JSON',
-                    'raw_response': recommendations[:500]  # Include part of the raw response for debugging
-                }), 500
+        except RecommendationParseError as parse_error:
+            # If all attempts fail, return the error
+            return jsonify({
+                'success': False,
+                'error': 'Failed to parse recommendations JSON',
+                'raw_response': parse_error.raw_response[:500]  # Include part of the raw response for debugging
+            }), 500
 
         except Exception as gemini_error:
             print(f"Gemini API error: {str(gemini_error)}")
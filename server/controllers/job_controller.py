@@ -0,0 +1,22 @@
+from flask import jsonify, session
+from services.job_queue import job_queue
+
+def _current_uid():
+    user = session.get("user")
+    # For development, mirror upload_file's mock user if not logged in
+    return user["uid"] if user else "mock_user_id"
+
+def get_job(job_id):
+    """
+    Report the status of a background job: queued, running, done or failed.
+    """
+    job = job_queue.get(job_id, owner=_current_uid())
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+def list_jobs():
+    """
+    List the current user's most recent background jobs.
+    """
+    return jsonify({"jobs": job_queue.list(_current_uid())}), 200
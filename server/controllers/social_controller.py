@@ -1,41 +1,75 @@
-from flask import jsonify
-import google.generativeai as genai
-import os
+from flask import current_app, jsonify, request
 from dotenv import load_dotenv
+from datetime import date
+import os
+from services.events_feed import EventsFeed
+from services.llm_gateway import llm_gateway
+from services.prompt_compiler import prompt_compiler
+from services.response_decoder import events_decoder
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-GOOGLE_API_KEY = os.getenv("GOOGLE_AI_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+# How long a request waits for the first feed when none has been generated yet (seconds)
+EVENTS_FIRST_WAIT = float(os.getenv('EVENTS_FIRST_WAIT', 30))
+
+# How long clients may reuse the feed before revalidating it (seconds)
+EVENTS_MAX_AGE = int(os.getenv('EVENTS_MAX_AGE', 300))
+
+EVENTS_TEMPLATE = """
+Today is {today}. Find me a list of upcoming social events happening in Pune, including live concerts,
+networking meetups, parties, cultural festivals, open mics, and tech gatherings.
+Format the response strictly in JSON with the following structure:
+{{
+  "events": [
+    {{
+      "name": "<Event Name>",
+      "date": "<Date in YYYY-MM-DD format>",
+      "location": "<Event Location>",
+      "category": "<Category: Concert, Meetup, Festival, etc.>",
+      "ticket_details": {{
+        "price": "<Price or Free>",
+        "booking_link": "<URL for tickets>"
+      }},
+      "official_source": "<Official Event Page URL>"
+    }}
+  ]
+}}
+"""
+
+def generate_social_events():
+    """Ask Gemini for upcoming social events in Pune and parse them."""
+    if not llm_gateway.api_key():
+        raise RuntimeError("Google AI API key not configured")
+    prompt = prompt_compiler.compile('social-events', EVENTS_TEMPLATE, required={'today': date.today().isoformat()})
+    response = llm_gateway.generate(prompt, model_name="gemini-2.0-flash", rate_key="social")
+    events = events_decoder.decode(response.text)['events']
+    if not events:
+        # Keep serving the previous feed rather than an empty one
+        raise ValueError("No events in the response")
+    return events
+
+# Regenerated in the background; requests are served from its snapshot
+events_feed = EventsFeed(generate_social_events)
 
 def fetch_social_events():
-    """Fetches upcoming social events in Pune using Google Gemini."""
+    """
+    Serve upcoming social events in Pune from the latest feed snapshot.
+    Clients that send the snapshot's ETag in If-None-Match get a 304.
+    """
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        prompt = (
-            "Find me a list of upcoming social events happening in Pune, including live concerts, "
-            "networking meetups, parties, cultural festivals, open mics, and tech gatherings. "
-            "Format the response strictly in JSON with the following structure:\n"
-            "{\n"
-            '  "events": [\n'
-            "    {\n"
-            '      "name": "<Event Name>",\n'
-            '      "date": "<Date in YYYY-MM-DD format>",\n'
-            '      "location": "<Event Location>",\n'
-            '      "category": "<Category: Concert, Meetup, Festival, etc.>",\n'
-            '      "ticket_details": {\n'
-            '        "price": "<Price or Free>",\n'
-            '        "booking_link": "<URL for tickets>"\n'
-            "      },\n"
-            '      "official_source": "<Official Event Page URL>"\n'
-            "    }\n"
-            "  ]\n"
-            "}"
-        )
-        response = model.generate_content(prompt)
-        return jsonify({"events": response.text})
-    
+        snapshot = events_feed.snapshot(timeout=EVENTS_FIRST_WAIT)
+        if snapshot is None:
+            response = jsonify({"error": "Events are not available yet, please try again shortly"})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(events_feed.retry)
+            return response
+
+        response = current_app.response_class(snapshot["body"], mimetype="application/json")
+        response.set_etag(snapshot["etag"])
+        response.headers["Cache-Control"] = f"public, max-age={EVENTS_MAX_AGE}"
+        response.headers["X-Feed-Version"] = str(snapshot["version"])
+        return response.make_conditional(request)
+
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,110 @@
+from flask import jsonify, request, session
+import os
+import time
+import traceback
+from werkzeug.utils import secure_filename
+from services.blob_store import blob_store
+from services.chunked_upload import ChunkedUploadError, DEFAULT_CHUNK_SIZE, chunked_uploads
+from controllers.user_controller import queue_timeline_processing, record_upload
+
+def _current_user():
+    user = session.get("user")
+    if not user:
+        # For development, mirror upload_file's mock user if not logged in
+        user = {"uid": "mock_user_id"}
+    return user
+
+def init_upload():
+    """
+    Start a resumable upload.
+    Body: {"filename": ..., "size": bytes, "chunkSize": bytes (optional)}
+    """
+    try:
+        data = request.json or {}
+        filename = data.get("filename")
+        if not filename:
+            return jsonify({"error": "Missing filename"}), 400
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in ('.txt', '.json'):
+            return jsonify({"error": "Unsupported file type. Only .txt and .json files are allowed."}), 400
+
+        status = chunked_uploads.create(
+            _current_user()["uid"], filename, data.get("size"), data.get("chunkSize", DEFAULT_CHUNK_SIZE)
+        )
+        return jsonify(status), 201
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print(f"Error in init_upload: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def upload_status(upload_id):
+    """Report which chunks of an upload are still missing."""
+    try:
+        return jsonify(chunked_uploads.status(upload_id, _current_user()["uid"])), 200
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+def put_chunk(upload_id):
+    """
+    Write one chunk. The raw request body is the chunk; `?offset=` gives its
+    position and the X-Chunk-SHA256 header its checksum.
+    """
+    try:
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            return jsonify({"error": "Missing offset"}), 400
+        result = chunked_uploads.write_chunk(
+            upload_id,
+            _current_user()["uid"],
+            offset,
+            request.stream,
+            request.content_length,
+            request.headers.get("X-Chunk-SHA256"),
+        )
+        return jsonify(result), 200
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print(f"Error in put_chunk: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def finalize_upload(upload_id):
+    """
+    Assemble a completed upload into the upload store and queue it for
+    processing. Body (optional): {"sha256": hash of the whole file}
+    """
+    try:
+        user = _current_user()
+        data = request.get_json(silent=True) or {}
+        manifest, path, digest = chunked_uploads.finalize(upload_id, user["uid"], data.get("sha256"))
+
+        duplicate = blob_store.adopt(path, digest)
+        user_upload_dir = os.path.join("uploads", user["uid"])
+        save_path = os.path.join(user_upload_dir, f"{int(time.time())}_{secure_filename(manifest['filename'])}")
+        blob_store.link(digest, save_path)
+        print(f"Chunked upload saved to {save_path} ({manifest['size']} bytes, sha256 {digest[:12]}"
+              f"{', duplicate' if duplicate else ''})")
+        record_upload(user, manifest["filename"], save_path, digest)
+
+        job = None
+        if os.path.splitext(manifest["filename"])[1].lower() == '.json':
+            job = queue_timeline_processing(user, digest)
+
+        return jsonify({
+            "message": "Upload complete",
+            "filename": manifest["filename"],
+            "path": save_path,
+            "size": manifest["size"],
+            "sha256": digest,
+            "jobId": job["id"] if job else None,
+            "status": f"/api/jobs/{job['id']}" if job else None,
+        }), 202 if job else 200
+    except ChunkedUploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print(f"Error in finalize_upload: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
@@ -1,7 +1,11 @@
 from flask import jsonify, request, session
 import os
-from config.firebase import get_firebase_db_ref
-import json
+from services.blob_store import blob_store
+from services.db_writer import db_writer, push_id
+from services.job_queue import job_queue
+from services.preferences import PreferencesError, parse_preferences
+from services.preferences_cache import preferences_cache
+from services.timeline_parser import TimelineParseError, validate_json_file
 import time
 from werkzeug.utils import secure_filename
 import traceback
@@ -12,6 +16,27 @@ def get_user():
         return jsonify(user), 200
     return jsonify({"error": "User not logged in"}), 401
 
+def queue_timeline_processing(user, digest):
+    """Queue the background job that parses and analyzes an uploaded export."""
+    return job_queue.enqueue("timeline", {"digest": digest}, owner=user["uid"], key=digest)
+
+def record_upload(user, filename, save_path, digest):
+    """Queue the upload's metadata for Firebase under a locally generated push ID."""
+    if not user or user["uid"] == "mock_user_id":
+        return
+    try:
+        file_meta = {
+            "filename": filename,
+            "uploaded_at": {".sv": "timestamp"},
+            "path": save_path,
+            "sha256": digest
+        }
+        
+        db_writer.write(f"users/{user['uid']}/uploads/{push_id()}", file_meta)
+        print(f"File metadata queued for Firebase for user {user['uid']}")
+    except Exception as firebase_error:
+        print(f"Firebase error (non-critical): {str(firebase_error)}")
+
 def upload_file():
     """
     Handle file uploads from the client.
@@ -56,9 +81,11 @@ def upload_file():
         safe_filename = f"{timestamp}_{secure_filename(file.filename)}"
         save_path = os.path.join(user_upload_dir, safe_filename)
         
-        # Save the file
-        file.save(save_path)
-        print(f"File saved to {save_path}")
+        # Store the content once per distinct hash and link it into place,
+        # so re-uploads of the same export share one copy
+        digest, size, duplicate = blob_store.put(file.stream)
+        blob_store.link(digest, save_path)
+        print(f"File saved to {save_path} ({size} bytes, sha256 {digest[:12]}{', duplicate' if duplicate else ''})")
         
         # Process file based on type
         if file_ext == '.txt':
@@ -73,42 +100,32 @@ def upload_file():
                 "data": text_content[:1000]  # Send first 1000 chars as preview
             }), 200
         elif file_ext == '.json':
-            # Process JSON file
+            # Reject malformed JSON up front; the streaming check is cheap
+            # next to the analysis
             try:
-                with open(save_path, 'r') as f:
-                    json_data = json.load(f)
-                
-                print(f"JSON file processed successfully")
-                
-                # Store in Firebase if needed
-                if user and user["uid"] != "mock_user_id":
-                    try:
-                        db_ref = get_firebase_db_ref()
-                        user_ref = db_ref.child('users').child(user["uid"])
-                        
-                        # Save file metadata
-                        file_meta = {
-                            "filename": file.filename,
-                            "uploaded_at": {"sv": "timestamp"},
-                            "path": save_path
-                        }
-                        
-                        user_ref.child('uploads').push(file_meta)
-                        print(f"File metadata saved to Firebase for user {user['uid']}")
-                    except Exception as firebase_error:
-                        print(f"Firebase error (non-critical): {str(firebase_error)}")
-                
-                # Return a simplified version of the data to avoid large responses
-                simplified_data = {
-                    "message": "JSON file uploaded and processed successfully",
-                    "filename": file.filename,
-                    "data": "JSON data processed successfully"
-                }
-                
-                return jsonify(simplified_data), 200
-            except json.JSONDecodeError as json_error:
+                validate_json_file(save_path)
+            except TimelineParseError as json_error:
                 print(f"Invalid JSON file: {str(json_error)}")
                 return jsonify({"error": f"Invalid JSON file: {str(json_error)}"}), 400
+
+            # Process JSON file in the background: parsing, timeline analysis
+            # and the personality analysis recommendations use
+            job = queue_timeline_processing(user, digest)
+            print(f"JSON file queued for processing (job {job['id']})")
+            
+            # Store in Firebase if needed
+            record_upload(user, file.filename, save_path, digest)
+            
+            # Return a simplified version of the data to avoid large responses
+            simplified_data = {
+                "message": "JSON file uploaded, processing in the background",
+                "filename": file.filename,
+                "sha256": digest,
+                "jobId": job["id"],
+                "status": f"/api/jobs/{job['id']}"
+            }
+            
+            return jsonify(simplified_data), 202
         else:
             print(f"Unsupported file type: {file_ext}")
             return jsonify({"error": "Unsupported file type. Only .txt and .json files are allowed."}), 400
@@ -132,23 +149,22 @@ def save_user_preferences():
     if not preferences:
         return jsonify({"error": "No preferences provided"}), 400
     
-    # Process prioritized must-haves if present
-    if "prioritizedMustHaves" in preferences:
-        # Ensure prioritizedMustHaves is properly formatted
-        if not isinstance(preferences["prioritizedMustHaves"], list):
-            return jsonify({"error": "prioritizedMustHaves must be an array"}), 400
-        
-        # Validate that each item has name and priority
-        for item in preferences["prioritizedMustHaves"]:
-            if not isinstance(item, dict) or "name" not in item or "priority" not in item:
-                return jsonify({"error": "Each prioritizedMustHave must have name and priority"}), 400
-    
-    # Get Firebase DB reference
-    db_ref = get_firebase_db_ref()
-    user_ref = db_ref.child('users').child(user["uid"])
+    # Validate against the same model housing requests are parsed with
+    # (must-haves need a name and priority, travel distances are numbers, ...)
+    try:
+        parse_preferences(preferences)
+    except PreferencesError as e:
+        return jsonify({"error": str(e)}), 400
     
-    # Save preferences to user's record
-    user_ref.child('preferences').set(preferences)
+    # Save preferences to user's record (written behind). The new value is
+    # cached right away so reads before the flush don't see the old one, and
+    # dropped again if the write fails
+    uid = user["uid"]
+    preferences_cache.put(uid, preferences)
+    if not db_writer.write(f"users/{uid}/preferences", preferences,
+                           on_failed=lambda: preferences_cache.discard(uid, preferences)):
+        preferences_cache.discard(uid, preferences)
+        return jsonify({"error": "Could not save preferences, please try again"}), 503
     
     return jsonify({
         "message": "Preferences saved successfully",
@@ -163,12 +179,8 @@ def get_user_preferences():
     if not user:
         return jsonify({"error": "User not logged in"}), 401
     
-    # Get Firebase DB reference
-    db_ref = get_firebase_db_ref()
-    user_ref = db_ref.child('users').child(user["uid"])
-    
-    # Get preferences from user's record
-    preferences = user_ref.child('preferences').get()
+    # Get preferences from user's record, through the cache
+    preferences = preferences_cache.get(user["uid"])
     
     if not preferences:
         return jsonify({"message": "No preferences found"}), 404
@@ -1,6 +1,7 @@
 from flask import Blueprint
-from controllers.chatbot_controller import chatbot_controller
+from controllers.chatbot_controller import chatbot_controller, chatbot_stream_controller
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
-chatbot_bp.route('/chat', methods=['POST'])(chatbot_controller)
\ No newline at end of file
+chatbot_bp.route('/chat', methods=['POST'])(chatbot_controller)
+chatbot_bp.route('/chat/stream', methods=['GET', 'POST'])(chatbot_stream_controller)
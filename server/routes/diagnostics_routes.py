@@ -0,0 +1,6 @@
+from flask import Blueprint
+from controllers.diagnostics_controller import get_diagnostics
+
+diagnostics_bp = Blueprint("diagnostics", __name__)
+
+diagnostics_bp.route("/", methods=["GET"])(get_diagnostics)
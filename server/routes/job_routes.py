@@ -0,0 +1,7 @@
+from flask import Blueprint
+from controllers.job_controller import get_job, list_jobs
+
+job_bp = Blueprint("jobs", __name__)
+
+job_bp.route("/", methods=["GET"])(list_jobs)
+job_bp.route("/<job_id>", methods=["GET"])(get_job)
@@ -1,7 +1,14 @@
 from flask import Blueprint
 from controllers.user_controller import upload_file
+from controllers.upload_controller import init_upload, upload_status, put_chunk, finalize_upload
 
 upload_routes = Blueprint("upload_routes", __name__)
 
 # Register the upload route
-upload_routes.route("/upload", methods=["POST"])(upload_file)
\ No newline at end of file
+upload_routes.route("/upload", methods=["POST"])(upload_file)
+
+# Resumable uploads: init, then PUT chunks, then finalize
+upload_routes.route("/uploads", methods=["POST"])(init_upload)
+upload_routes.route("/uploads/<upload_id>", methods=["GET"])(upload_status)
+upload_routes.route("/uploads/<upload_id>", methods=["PUT"])(put_chunk)
+upload_routes.route("/uploads/<upload_id>/finalize", methods=["POST"])(finalize_upload)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from services.blob_store import blob_store
+from services.location_service import summarize_timeline_file
+from services.timeline_digest import build_timeline_digest, render_digest
+
+
+def timeline_summary(digest):
+    """
+    Segment count and analysis of an uploaded export. Reuses the results
+    for this content if it was processed before; otherwise validates and
+    analyzes it in one streaming pass. Raises TimelineParseError.
+    """
+    summary = blob_store.get_artifact(digest, 'timeline')
+    if summary is None:
+        summary = summarize_timeline_file(blob_store.path(digest))
+        blob_store.put_artifact(digest, 'timeline', summary)
+    return summary
+
+
+def personality_summary(digest):
+    """
+    LLM personality analysis of an uploaded export, computed once per
+    content. Returns None if it isn't available (e.g. no API key).
+    """
+    personality = blob_store.get_artifact(digest, 'personality')
+    if personality is None:
+        # Imported here: the housing controller imports this module
+        from controllers.housing_controller import analyze_timeline_digest
+
+        summary = timeline_summary(digest)
+        personality = analyze_timeline_digest(render_digest(build_timeline_digest(summary['analysis'])))
+        if personality:
+            blob_store.put_artifact(digest, 'personality', personality)
+    return personality
+
+
+def process_timeline(digest):
+    """
+    Job handler run in a worker process after an upload: parse and analyze
+    the export.
+    """
+    summary = timeline_summary(digest)
+    return {'segments': summary['segments']}
+
+
+def finish_timeline(result, digest):
+    """
+    Job finisher run in the server process once the export is analyzed:
+    precompute the personality analysis recommendation requests use. Runs
+    here rather than in the worker so the LLM call goes through this
+    process's LLM gateway and its limits.
+    """
+    personality = personality_summary(digest)
+    return dict(result, personality_ready=personality is not None)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# Where upload contents live, one file per distinct SHA-256
+UPLOAD_BLOB_DIR = os.getenv('UPLOAD_BLOB_DIR', os.path.join('uploads', '.store'))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploads.
+
+    `put` streams a file object to disk while hashing it and keeps one copy
+    per distinct content. `link` hardlinks a blob to the path a user's
+    upload is recorded under, so the link count is the blob's reference
+    count. Artifacts derived from a blob (parse results, analyses) are
+    stored next to it under the same hash, so identical uploads from any
+    user are only ever processed once.
+    """
+
+    def __init__(self, root=UPLOAD_BLOB_DIR):
+        self.root = root
+        self._tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.duplicates = 0
+        self.bytes_received = 0
+        self.bytes_deduplicated = 0
+        self.artifact_hits = 0
+        self.artifact_misses = 0
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _artifact_path(self, digest, name):
+        return f"{self.path(digest)}.{name}.json"
+
+    def put(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Store the contents of a file object. Returns (digest, size, duplicate).
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            duplicate = self.adopt(tmp_path, digest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest, size, duplicate
+
+    def adopt(self, file_path, digest):
+        """
+        Move a file whose SHA-256 is already known into the store. Returns
+        True if the content was already there (the file is then removed).
+        """
+        blob_path = self.path(digest)
+        size = os.path.getsize(file_path)
+        duplicate = os.path.exists(blob_path)
+        if duplicate:
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            # Blobs are shared between users, so nobody may modify one in place
+            os.chmod(file_path, 0o444)
+            os.replace(file_path, blob_path)
+
+        with self._lock:
+            self.uploads += 1
+            self.bytes_received += size
+            if duplicate:
+                self.duplicates += 1
+                self.bytes_deduplicated += size
+        return duplicate
+
+    def link(self, digest, dest_path):
+        """Make `dest_path` refer to the blob, falling back to a copy across filesystems."""
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        # Replace, never write through, an existing link: it may share a blob
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(self.path(digest), dest_path)
+        except OSError:
+            shutil.copyfile(self.path(digest), dest_path)
+
+    def refcount(self, digest):
+        """Number of user uploads pointing at a blob."""
+        try:
+            return os.stat(self.path(digest)).st_nlink - 1
+        except OSError:
+            return 0
+
+    def get_artifact(self, digest, name):
+        try:
+            with open(self._artifact_path(digest, name), 'r') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.artifact_misses += 1
+            return None
+        with self._lock:
+            self.artifact_hits += 1
+        return value
+
+    def put_artifact(self, digest, name, value):
+        path = self._artifact_path(digest, name)
+        tmp_path = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error storing {name} artifact for {digest}: {e}")
+
+    def disk_usage(self):
+        """Bytes on disk for blobs vs. what the uploads would take without dedup."""
+        stored = logical = blobs = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self._tmp_dir:
+                continue
+            for filename in filenames:
+                if filename.endswith('.json'):
+                    continue
+                st = os.stat(os.path.join(dirpath, filename))
+                blobs += 1
+                stored += st.st_size
+                logical += st.st_size * max(1, st.st_nlink - 1)
+        return {'blobs': blobs, 'stored_bytes': stored, 'logical_bytes': logical}
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'uploads': self.uploads,
+                'duplicates': self.duplicates,
+                'bytes_received': self.bytes_received,
+                'bytes_deduplicated': self.bytes_deduplicated,
+                'artifact_hits': self.artifact_hits,
+                'artifact_misses': self.artifact_misses,
+            }
+        return {**counters, **self.disk_usage()}
+
+
+blob_store = BlobStore()
@@ -0,0 +1,298 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+# In-progress uploads: one directory each with the preallocated file,
+# its manifest and a marker per received chunk
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join('uploads', '.partial'))
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 2 * 1024 ** 3))
+
+# Unfinished uploads are removed after this long without a chunk (seconds)
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))
+
+# Bytes copied from the request body per read
+COPY_BUFFER_SIZE = 256 * 1024
+
+_UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class ChunkedUploadError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploads:
+    """
+    Resumable uploads sent as fixed-size chunks.
+
+    `create` preallocates the destination file. Each `write_chunk` streams
+    one chunk from the request body straight into place with `os.pwrite`,
+    hashing it as it goes, and only records the chunk as received if its
+    SHA-256 matches what the client sent. Chunks can arrive in any order,
+    in parallel, or again after a dropped connection; `status` lists what
+    is still missing. `finalize` checks every chunk is there and still
+    matches its recorded hash, and hands back the completed file. State
+    lives on disk, so uploads survive restarts and work across worker
+    processes; writers hold a shared lock on the file and `finalize` an
+    exclusive one.
+    """
+
+    def __init__(self, root=CHUNKED_UPLOAD_DIR, ttl=UPLOAD_SESSION_TTL):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        if not _UPLOAD_ID.fullmatch(upload_id or ''):
+            raise ChunkedUploadError("Unknown upload", status=404)
+        return os.path.join(self.root, upload_id)
+
+    def _manifest(self, upload_id, owner):
+        try:
+            with open(os.path.join(self._dir(upload_id), 'manifest.json'), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            raise ChunkedUploadError("Unknown upload", status=404)
+        if manifest['owner'] != owner:
+            raise ChunkedUploadError("Unknown upload", status=404)
+        return manifest
+
+    def _chunk_length(self, manifest, index):
+        return min(manifest['chunk_size'], manifest['size'] - index * manifest['chunk_size'])
+
+    def _received(self, upload_id):
+        """Map of received chunk index to its recorded SHA-256."""
+        chunks_dir = os.path.join(self._dir(upload_id), 'chunks')
+        received = {}
+        try:
+            names = os.listdir(chunks_dir)
+        except FileNotFoundError:
+            # Finalized (and removed) since the manifest was read
+            raise ChunkedUploadError("Unknown upload", status=404)
+        for name in names:
+            try:
+                with open(os.path.join(chunks_dir, name), 'r') as f:
+                    received[int(name)] = f.read()
+            except FileNotFoundError:
+                # Being rewritten
+                pass
+        return received
+
+    def create(self, owner, filename, size, chunk_size=DEFAULT_CHUNK_SIZE):
+        if not isinstance(size, int) or size <= 0:
+            raise ChunkedUploadError("size must be a positive integer")
+        if size > MAX_UPLOAD_SIZE:
+            raise ChunkedUploadError(f"Uploads are limited to {MAX_UPLOAD_SIZE} bytes", status=413)
+        if not isinstance(chunk_size, int) or not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ChunkedUploadError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+        self.sweep()
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = os.path.join(self.root, upload_id)
+        os.makedirs(os.path.join(upload_dir, 'chunks'))
+        fd = os.open(os.path.join(upload_dir, 'data'), os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            # Reserve the space up front so chunks never hit a full disk midway
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+        manifest = {
+            'upload_id': upload_id,
+            'owner': owner,
+            'filename': filename,
+            'size': size,
+            'chunk_size': chunk_size,
+            'chunks': -(-size // chunk_size),
+            'created_at': time.time(),
+        }
+        with open(os.path.join(upload_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        return self.status(upload_id, owner)
+
+    def status(self, upload_id, owner):
+        manifest = self._manifest(upload_id, owner)
+        received = set(self._received(upload_id))
+        missing = [index for index in range(manifest['chunks']) if index not in received]
+        return {
+            'upload_id': upload_id,
+            'filename': manifest['filename'],
+            'size': manifest['size'],
+            'chunk_size': manifest['chunk_size'],
+            'chunks': manifest['chunks'],
+            'received_bytes': sum(self._chunk_length(manifest, index) for index in received),
+            'missing_offsets': [index * manifest['chunk_size'] for index in missing],
+        }
+
+    def write_chunk(self, upload_id, owner, offset, stream, length, sha256):
+        """
+        Copy `length` bytes from `stream` to `offset`. Raises
+        ChunkedUploadError if the chunk is misplaced, short or corrupt.
+        """
+        manifest = self._manifest(upload_id, owner)
+        chunk_size = manifest['chunk_size']
+        if not isinstance(offset, int) or offset < 0 or offset % chunk_size or offset >= manifest['size']:
+            raise ChunkedUploadError(f"offset must be a multiple of {chunk_size} within the file")
+        index = offset // chunk_size
+        expected = self._chunk_length(manifest, index)
+        if length != expected:
+            raise ChunkedUploadError(f"Chunk at offset {offset} must be {expected} bytes")
+        if not sha256:
+            raise ChunkedUploadError("Missing X-Chunk-SHA256 header")
+
+        upload_dir = self._dir(upload_id)
+        data_path = os.path.join(upload_dir, 'data')
+        marker_path = os.path.join(upload_dir, 'chunks', str(index))
+        hasher = hashlib.sha256()
+        buffer = bytearray(min(COPY_BUFFER_SIZE, length))
+        view = memoryview(buffer)
+        written = 0
+        try:
+            fd = os.open(data_path, os.O_WRONLY)
+        except FileNotFoundError:
+            raise ChunkedUploadError("Upload is being finalized", status=409)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if not _same_file(fd, data_path):
+                # finalize took the file between our open and lock
+                raise ChunkedUploadError("Upload is being finalized", status=409)
+            # Whatever was recorded for this chunk is about to be overwritten
+            try:
+                os.remove(marker_path)
+            except FileNotFoundError:
+                pass
+            while written < length:
+                read = stream.readinto(view[:min(len(buffer), length - written)])
+                if not read:
+                    break
+                hasher.update(view[:read])
+                os.pwrite(fd, view[:read], offset + written)
+                written += read
+        finally:
+            os.close(fd)
+
+        if written != length:
+            raise ChunkedUploadError(f"Chunk at offset {offset} ended after {written} of {length} bytes")
+        digest = hasher.hexdigest()
+        if digest != sha256.lower():
+            raise ChunkedUploadError(f"Checksum mismatch for chunk at offset {offset}", status=422)
+
+        with open(marker_path, 'w') as f:
+            f.write(digest)
+        # Activity keeps the upload from being swept
+        os.utime(upload_dir)
+        return {'offset': offset, 'length': length, 'sha256': digest}
+
+    def finalize(self, upload_id, owner, sha256=None):
+        """
+        Check the upload is complete and detach its file. Returns
+        (manifest, path, digest); the caller owns `path` afterwards.
+        Chunks whose data no longer matches the hash recorded for them
+        (e.g. overwritten by a failed resend) are marked missing again.
+        """
+        status = self.status(upload_id, owner)
+        if status['missing_offsets']:
+            raise ChunkedUploadError(
+                f"{len(status['missing_offsets'])} chunks are missing", status=409
+            )
+        manifest = self._manifest(upload_id, owner)
+        upload_dir = self._dir(upload_id)
+        data_path = os.path.join(upload_dir, 'data')
+        finalizing_path = os.path.join(upload_dir, 'data.finalizing')
+
+        # Moving the file aside claims the upload: a concurrent finalize
+        # and any later chunk writes find no data file
+        try:
+            os.rename(data_path, finalizing_path)
+        except FileNotFoundError:
+            raise ChunkedUploadError("Upload is already being finalized", status=409)
+
+        try:
+            with open(finalizing_path, 'rb', buffering=0) as f:
+                # Wait for writes that opened the file before it moved
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                recorded = self._received(upload_id)
+                digest, corrupt = self._verify(f, manifest, recorded)
+            if corrupt:
+                for index in corrupt:
+                    try:
+                        os.remove(os.path.join(upload_dir, 'chunks', str(index)))
+                    except FileNotFoundError:
+                        pass
+                raise ChunkedUploadError(
+                    f"{len(corrupt)} chunks no longer match their checksum and must be sent again",
+                    status=409,
+                )
+            if sha256 and digest != sha256.lower():
+                raise ChunkedUploadError("Checksum mismatch for the assembled file", status=422)
+        except BaseException:
+            os.rename(finalizing_path, data_path)
+            raise
+
+        path = os.path.join(self.root, f"{upload_id}.complete")
+        os.replace(finalizing_path, path)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return manifest, path, digest
+
+    def _verify(self, f, manifest, recorded):
+        """
+        Hash the file in one sequential read, mostly from the page cache:
+        the whole-file digest names the blob, and each chunk is checked
+        against the digest recorded when it was written. Returns
+        (digest, indexes of chunks that don't match).
+        """
+        hasher = hashlib.sha256()
+        buffer = bytearray(COPY_BUFFER_SIZE)
+        view = memoryview(buffer)
+        corrupt = []
+        for index in range(manifest['chunks']):
+            chunk_hasher = hashlib.sha256()
+            remaining = self._chunk_length(manifest, index)
+            while remaining:
+                read = f.readinto(view[:min(len(buffer), remaining)])
+                if not read:
+                    break
+                hasher.update(view[:read])
+                chunk_hasher.update(view[:read])
+                remaining -= read
+            if chunk_hasher.hexdigest() != recorded.get(index):
+                corrupt.append(index)
+        return hasher.hexdigest(), corrupt
+
+    def sweep(self):
+        """Remove uploads that haven't received a chunk within the TTL."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+            except OSError:
+                pass
+
+
+def _same_file(fd, path):
+    """Whether `path` still names the file open as `fd`."""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+chunked_uploads = ChunkedUploads()
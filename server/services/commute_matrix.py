@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Distance Matrix API limits per request
+MAX_SIDE = 25
+MAX_ELEMENTS = 100
+
+# How long a cached commute time stays valid (seconds)
+COMMUTE_CACHE_TTL = int(os.getenv('COMMUTE_CACHE_TTL', 7 * 24 * 3600))
+
+# How long a failed or unreachable lookup is remembered before retrying (seconds)
+COMMUTE_FAILURE_TTL = int(os.getenv('COMMUTE_FAILURE_TTL', 600))
+
+COMMUTE_CACHE_DB = os.getenv('COMMUTE_CACHE_DB', os.path.join('cache', 'commute_matrix.sqlite3'))
+
+# Geohash precision for coordinate endpoints (7 characters is ~150 m)
+GEOHASH_PRECISION = 7
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Modes whose duration depends on departure time
+_TIME_DEPENDENT_MODES = ('driving', 'transit')
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_decode(geohash):
+    """Return the (lat, lng) centre of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def normalize_endpoint(endpoint):
+    """
+    Cache key for an origin/destination. Coordinates are rounded to a
+    geohash cell; addresses are lower-cased with whitespace collapsed.
+    """
+    if isinstance(endpoint, (tuple, list)):
+        return 'gh:' + geohash_encode(float(endpoint[0]), float(endpoint[1]))
+    if isinstance(endpoint, dict):
+        return 'gh:' + geohash_encode(float(endpoint['lat']), float(endpoint['lng']))
+    return ' '.join(str(endpoint).lower().split())
+
+
+def _api_endpoint(key):
+    """What to send to the API for a normalized endpoint."""
+    if key.startswith('gh:'):
+        return geohash_decode(key[3:])
+    return key
+
+
+def departure_bucket(mode, when=None):
+    """
+    Coarse departure-time bucket: weekday-peak, weekday-offpeak or weekend
+    for time-dependent modes, 'any' otherwise.
+    """
+    if mode not in _TIME_DEPENDENT_MODES:
+        return 'any'
+    when = when or datetime.now()
+    if when.weekday() >= 5:
+        return 'weekend'
+    if 8 <= when.hour < 11 or 17 <= when.hour < 21:
+        return 'weekday-peak'
+    return 'weekday-offpeak'
+
+
+def _bucket_departure_time(bucket, now=None):
+    """A future departure time representative of the bucket, for the API."""
+    if bucket == 'any':
+        return None
+    now = now or datetime.now()
+    hour = {'weekday-peak': 9, 'weekday-offpeak': 13, 'weekend': 12}[bucket]
+    candidate = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    while candidate <= now or (candidate.weekday() >= 5) != (bucket == 'weekend'):
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class CommuteMatrix:
+    """
+    Commute times between many origins and destinations.
+
+    Endpoints are normalized (see `normalize_endpoint`) and departure times
+    bucketed, and results are cached in SQLite for `ttl` seconds; pairs
+    without a result (failed or unreachable) only for `failure_ttl`
+    seconds. Expired rows are purged on every write. Uncached pairs are
+    fetched with as few Distance Matrix requests as the API limits allow.
+    `client` is a googlemaps.Client or anything with the same
+    `distance_matrix` method.
+    """
+
+    def __init__(self, client, db_path=COMMUTE_CACHE_DB, ttl=COMMUTE_CACHE_TTL,
+                 failure_ttl=COMMUTE_FAILURE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS commute ('
+            ' origin TEXT, destination TEXT, mode TEXT, bucket TEXT,'
+            ' minutes INTEGER, fetched_at REAL,'
+            ' PRIMARY KEY (origin, destination, mode, bucket))'
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.api_requests = 0
+        self.api_elements = 0
+
+    def _lookup(self, pairs, mode, bucket):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for origin, destination in pairs:
+                row = self._db.execute(
+                    'SELECT minutes FROM commute WHERE origin=? AND destination=? AND mode=? '
+                    'AND bucket=? AND fetched_at >= CASE WHEN minutes IS NULL THEN ? ELSE ? END',
+                    (origin, destination, mode, bucket, now - self.failure_ttl, now - self.ttl),
+                ).fetchone()
+                if row is not None:
+                    found[(origin, destination)] = row[0]
+        return found
+
+    def _store(self, results, mode, bucket):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO commute VALUES (?, ?, ?, ?, ?, ?)',
+                [(origin, destination, mode, bucket, minutes, now)
+                 for (origin, destination), minutes in results.items()],
+            )
+            self._db.execute(
+                'DELETE FROM commute WHERE fetched_at < ? OR (minutes IS NULL AND fetched_at < ?)',
+                (now - self.ttl, now - self.failure_ttl),
+            )
+            self._db.commit()
+
+    def _batches(self, pairs):
+        """
+        Group pairs into (origins, destinations) requests within the API
+        limits, grouping by whichever side has fewer distinct endpoints.
+        """
+        by_origin = len({origin for origin, _ in pairs}) <= len({dest for _, dest in pairs})
+        groups = {}
+        for origin, destination in pairs:
+            anchor, other = (origin, destination) if by_origin else (destination, origin)
+            groups.setdefault(anchor, []).append(other)
+
+        # Anchors with the same counterpart set share requests
+        shared = {}
+        for anchor, others in groups.items():
+            shared.setdefault(tuple(sorted(set(others))), []).append(anchor)
+
+        for others, anchors in shared.items():
+            for i in range(0, len(others), MAX_SIDE):
+                other_chunk = list(others[i:i + MAX_SIDE])
+                anchors_per_request = max(1, min(MAX_SIDE, MAX_ELEMENTS // len(other_chunk)))
+                for j in range(0, len(anchors), anchors_per_request):
+                    anchor_chunk = anchors[j:j + anchors_per_request]
+                    if by_origin:
+                        yield anchor_chunk, other_chunk
+                    else:
+                        yield other_chunk, anchor_chunk
+
+    def _fetch(self, pairs, mode, bucket):
+        """
+        Request the given pairs, storing each response's results as it
+        arrives so a later failing request does not discard billed ones.
+        """
+        wanted = set(pairs)
+        results = {}
+        departure_time = _bucket_departure_time(bucket)
+        for origins, destinations in self._batches(pairs):
+            response = self.client.distance_matrix(
+                [_api_endpoint(origin) for origin in origins],
+                [_api_endpoint(destination) for destination in destinations],
+                mode=mode,
+                departure_time=departure_time,
+            )
+            with self._lock:
+                self.api_requests += 1
+                self.api_elements += len(origins) * len(destinations)
+            # Only remember pairs that were actually requested
+            batch = {(origin, destination): None
+                     for origin in origins for destination in destinations
+                     if (origin, destination) in wanted}
+            for row, origin in zip(response.get('rows', []), origins):
+                for element, destination in zip(row.get('elements', []), destinations):
+                    if (origin, destination) in batch and element.get('status') == 'OK':
+                        duration = element.get('duration_in_traffic') or element['duration']
+                        batch[(origin, destination)] = round(duration['value'] / 60)
+            self._store(batch, mode, bucket)
+            results.update(batch)
+        return results
+
+    def durations(self, origins, destinations, mode='transit', when=None):
+        """
+        Commute minutes for every origin/destination pair, keyed by the
+        pair as passed in. Unreachable pairs map to None.
+        """
+        bucket = departure_bucket(mode, when)
+        requested = {}
+        for origin in origins:
+            for destination in destinations:
+                requested[(_hashable(origin), _hashable(destination))] = (
+                    normalize_endpoint(origin), normalize_endpoint(destination)
+                )
+
+        keys = set(requested.values())
+        found = self._lookup(keys, mode, bucket)
+        missing = [key for key in keys if key not in found]
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            found.update(self._fetch(missing, mode, bucket))
+
+        return {pair: found.get(key) for pair, key in requested.items()}
+
+    def duration(self, origin, destination, mode='transit', when=None):
+        return next(iter(self.durations([origin], [destination], mode, when).values()))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'api_requests': self.api_requests,
+                'api_elements': self.api_elements,
+                'ttl_seconds': self.ttl,
+                'failure_ttl_seconds': self.failure_ttl,
+            }
+
+
+def _hashable(endpoint):
+    if isinstance(endpoint, list):
+        return tuple(endpoint)
+    if isinstance(endpoint, dict):
+        return (endpoint['lat'], endpoint['lng'])
+    return endpoint
@@ -0,0 +1,135 @@
+import datetime
+import os
+import threading
+import time
+import google.generativeai as genai
+from google.generativeai import caching
+from services.llm_gateway import llm_gateway
+
+# Lifetime requested for provider-side cached content (seconds)
+CONTEXT_CACHE_TTL = int(os.getenv('CONTEXT_CACHE_TTL', 3600))
+
+# Renew the cache when less than this much lifetime is left (seconds)
+RENEW_MARGIN = 300
+
+# After a failed create, serve the preamble inline for this long (seconds)
+FAILURE_BACKOFF = 600
+
+
+class ContextCache:
+    """
+    Provider-side cache for a fixed conversation prefix.
+
+    The prefix is uploaded once as a Gemini CachedContent and later turns
+    only send their new messages. The cache's TTL is renewed while it is
+    in use, on a background thread so no request waits on it. Until the
+    cache exists, and for models or prefixes that do not support context
+    caching, the prefix is sent inline (see `model_for`).
+    """
+
+    def __init__(self, model_name, contents, ttl=CONTEXT_CACHE_TTL, display_name=None):
+        self.model_name = model_name
+        self.contents = contents
+        self.ttl = ttl
+        self.display_name = display_name
+        self.enabled = os.getenv('CONTEXT_CACHE_ENABLED', '1') != '0'
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_model = None
+        self._expires_at = 0
+        self._failed_at = None
+        self._last_error = None
+        self._refreshing = False
+        self.creates = 0
+        self.renewals = 0
+
+    def _create(self):
+        cached = caching.CachedContent.create(
+            model=self.model_name,
+            display_name=self.display_name,
+            contents=list(self.contents),
+            ttl=datetime.timedelta(seconds=self.ttl),
+        )
+        print(f"Created context cache {cached.name} for {self.model_name}")
+        return cached
+
+    def _refresh(self, cached):
+        """Create or renew the cache (network calls, made without the lock)."""
+        renewed = False
+        try:
+            if cached is not None:
+                try:
+                    cached.update(ttl=datetime.timedelta(seconds=self.ttl))
+                    renewed = True
+                except Exception as e:
+                    # The cache may have been evicted upstream; start over
+                    print(f"Error renewing context cache, recreating: {e}")
+            if not renewed:
+                cached = self._create()
+            with self._lock:
+                self._cached = cached
+                self._expires_at = time.time() + self.ttl
+                self._failed_at = None
+                self._last_error = None
+                if renewed:
+                    self.renewals += 1
+                else:
+                    self.creates += 1
+        except Exception as e:
+            print(f"Context caching unavailable for {self.model_name}: {e}")
+            with self._lock:
+                self._cached = None
+                self._failed_at = time.time()
+                self._last_error = str(e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _get_cached(self):
+        """
+        Return a live CachedContent, or None if there is none right now.
+        Creating and renewing happen on a background thread, one at a time;
+        requests never wait for them and send the prefix inline meanwhile.
+        """
+        with self._lock:
+            now = time.time()
+            live = self._cached is not None and now < self._expires_at
+            if self._failed_at and now - self._failed_at < FAILURE_BACKOFF:
+                return None
+            if not live or self._expires_at - now < RENEW_MARGIN:
+                if not self._refreshing:
+                    self._refreshing = True
+                    cached = self._cached if live else None
+                    threading.Thread(target=self._refresh, args=(cached,), daemon=True).start()
+            return self._cached if live else None
+
+    def model_for(self, generation_config=None):
+        """
+        Return `(model, prefix)` for the next turn. When the provider-side
+        cache is live `prefix` is empty; otherwise it is the contents that
+        must be sent inline ahead of the new messages.
+        """
+        cached = self._get_cached() if self.enabled else None
+        if cached is not None:
+            with self._lock:
+                if self._cached_model is None or self._cached_model[0] != cached.name:
+                    model = genai.GenerativeModel.from_cached_content(
+                        cached_content=cached,
+                        generation_config=generation_config,
+                    )
+                    self._cached_model = (cached.name, model)
+                return self._cached_model[1], []
+        model = llm_gateway.get_model(self.model_name, generation_config)
+        return model, list(self.contents)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'model': self.model_name,
+                'active': self._cached is not None and time.time() < self._expires_at,
+                'expires_in_seconds': round(self._expires_at - time.time()) if self._cached else None,
+                'creates': self.creates,
+                'renewals': self.renewals,
+                'last_error': self._last_error,
+            }
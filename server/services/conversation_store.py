@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Token budget for the verbatim history sent with each turn
+HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKENS', 4000))
+
+# Token budget for the rolling summary of older turns
+SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_TOKENS', 500))
+
+# Hard cap on the memory a single conversation may hold (bytes)
+MAX_CONVERSATION_BYTES = int(os.getenv('CHAT_MAX_CONVERSATION_BYTES', 64 * 1024))
+
+# Conversations idle for longer than this are evicted (seconds)
+IDLE_TTL = int(os.getenv('CHAT_IDLE_TTL', 30 * 60))
+
+# Upper bound on live conversations; the least recently used go first
+MAX_CONVERSATIONS = int(os.getenv('CHAT_MAX_CONVERSATIONS', 5000))
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    def __init__(self):
+        self.turns = []  # (role, text) pairs, oldest first
+        self.summary = ""
+        self.last_active = time.time()
+        self.lock = threading.Lock()
+        self.compacting = False
+        self.summarized_turns = 0
+
+    def history_tokens(self):
+        return sum(estimate_tokens(text) for _, text in self.turns)
+
+    def size_bytes(self):
+        return len(self.summary.encode('utf-8')) + sum(
+            len(text.encode('utf-8')) for _, text in self.turns
+        )
+
+
+def fallback_summary(previous_summary, turns, max_tokens=SUMMARY_TOKEN_BUDGET):
+    """Summarize without the LLM by keeping the start of each old turn."""
+    lines = [previous_summary] if previous_summary else []
+    for role, text in turns:
+        lines.append(f"{role}: {' '.join(text.split())[:200]}")
+    summary = "\n".join(lines)
+    # Keep the most recent part of the summary within budget
+    return summary[-max_tokens * 4:]
+
+
+class ConversationStore:
+    """
+    Server-side chat histories keyed by session id.
+
+    Each conversation keeps recent turns verbatim up to a token budget.
+    Once over budget, the oldest turns are folded into a rolling summary
+    (by `summarizer`, in the background) so the prompt stays bounded.
+    Idle conversations are evicted, as are the least recently used ones
+    once `max_conversations` is reached.
+
+    `summarizer(previous_summary, turns)` returns the new summary text.
+    """
+
+    def __init__(self, summarizer=None, history_tokens=HISTORY_TOKEN_BUDGET,
+                 summary_tokens=SUMMARY_TOKEN_BUDGET, max_bytes=MAX_CONVERSATION_BYTES,
+                 idle_ttl=IDLE_TTL, max_conversations=MAX_CONVERSATIONS):
+        self.summarizer = summarizer
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.summarizations = 0
+
+    def _evict(self, now):
+        """Drop idle and excess conversations. Caller holds self._lock."""
+        while self._conversations:
+            session_id, conversation = next(iter(self._conversations.items()))
+            idle = now - conversation.last_active > self.idle_ttl
+            if not idle and len(self._conversations) <= self.max_conversations:
+                break
+            del self._conversations[session_id]
+            self.evictions += 1
+
+    def get(self, session_id):
+        """Return the conversation for session_id, creating it if needed."""
+        now = time.time()
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if conversation is None:
+                conversation = Conversation()
+                self._conversations[session_id] = conversation
+            conversation.last_active = now
+            self._conversations.move_to_end(session_id)
+            self._evict(now)
+            return conversation
+
+    def reset(self, session_id):
+        with self._lock:
+            self._conversations.pop(session_id, None)
+
+    def snapshot(self, session_id):
+        """Return `(summary, turns)` to send ahead of the next message."""
+        conversation = self.get(session_id)
+        with conversation.lock:
+            return conversation.summary, list(conversation.turns)
+
+    def append(self, session_id, user_text, model_text):
+        """Record a completed exchange and compact the history if needed."""
+        conversation = self.get(session_id)
+        with conversation.lock:
+            conversation.turns.append(("user", user_text))
+            conversation.turns.append(("model", model_text))
+            over_budget = conversation.history_tokens() > self.history_tokens
+            if over_budget and not conversation.compacting:
+                conversation.compacting = True
+                threading.Thread(target=self._compact, args=(conversation,), daemon=True).start()
+            self._enforce_byte_cap(conversation)
+
+    def _split_old_turns(self, conversation):
+        """Take the oldest turns so the rest fit in half the history budget."""
+        keep_tokens = 0
+        split = len(conversation.turns)
+        while split > 0:
+            tokens = estimate_tokens(conversation.turns[split - 1][1])
+            if keep_tokens + tokens > self.history_tokens // 2:
+                break
+            keep_tokens += tokens
+            split -= 1
+        # Always summarize whole exchanges so roles keep alternating
+        split -= split % 2
+        return conversation.turns[:split]
+
+    def _compact(self, conversation):
+        try:
+            with conversation.lock:
+                old_turns = self._split_old_turns(conversation)
+                previous_summary = conversation.summary
+            if not old_turns:
+                return
+
+            summary = None
+            if self.summarizer:
+                try:
+                    summary = self.summarizer(previous_summary, old_turns)
+                except Exception as e:
+                    print(f"Error summarizing conversation: {e}")
+            if not summary:
+                summary = fallback_summary(previous_summary, old_turns, self.summary_tokens)
+
+            with conversation.lock:
+                # New turns are only ever appended, but the byte cap may have
+                # dropped some of old_turns from the front in the meantime
+                remaining = old_turns
+                while remaining and conversation.turns[:len(remaining)] != remaining:
+                    remaining = remaining[2:]
+                del conversation.turns[:len(remaining)]
+                conversation.summary = summary[-self.summary_tokens * 4:]
+                conversation.summarized_turns += len(old_turns)
+            with self._lock:
+                self.summarizations += 1
+        finally:
+            conversation.compacting = False
+
+    def _enforce_byte_cap(self, conversation):
+        """Drop the oldest turns outright if a conversation outgrows its cap."""
+        while conversation.turns and conversation.size_bytes() > self.max_bytes:
+            dropped = conversation.turns[:2]
+            del conversation.turns[:2]
+            conversation.summary = fallback_summary(conversation.summary, dropped, self.summary_tokens)
+            conversation.summarized_turns += len(dropped)
+
+    def stats(self):
+        with self._lock:
+            conversations = list(self._conversations.values())
+            evictions = self.evictions
+            summarizations = self.summarizations
+        sizes = [conversation.size_bytes() for conversation in conversations]
+        return {
+            'conversations': len(conversations),
+            'total_bytes': sum(sizes),
+            'max_conversation_bytes': max(sizes) if sizes else 0,
+            'byte_cap_per_conversation': self.max_bytes,
+            'history_token_budget': self.history_tokens,
+            'evictions': evictions,
+            'summarizations': summarizations,
+        }
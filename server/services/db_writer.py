@@ -0,0 +1,320 @@
+import atexit
+import os
+import random
+import threading
+import time
+from collections import deque
+from config.firebase import get_firebase_db_ref
+
+# Paths waiting beyond this are rejected rather than queued without bound
+DB_WRITER_QUEUE_SIZE = int(os.getenv('DB_WRITER_QUEUE_SIZE', 10000))
+
+# A batch is flushed once it holds this many paths...
+DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', 500))
+
+# ...or once its oldest write has waited this long (seconds)
+DB_WRITE_FLUSH_INTERVAL = float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 0.25))
+
+# Attempts after the first, with exponential backoff starting at RETRY_BACKOFF seconds
+DB_WRITE_MAX_RETRIES = int(os.getenv('DB_WRITE_MAX_RETRIES', 5))
+RETRY_BACKOFF = 0.5
+MAX_RETRY_BACKOFF = 30
+
+# How long shutdown waits for queued writes to drain (seconds)
+DB_WRITER_DRAIN_TIMEOUT = float(os.getenv('DB_WRITER_DRAIN_TIMEOUT', 10))
+
+_PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+
+class _PushIds:
+    """
+    Firebase-style push IDs generated locally: 8 characters of millisecond
+    timestamp followed by 12 random ones, incremented within the same
+    millisecond so IDs from this process always sort in creation order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_time = 0
+        self._last_random = [0] * 12
+
+    def __call__(self):
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now == self._last_time:
+                for i in range(11, -1, -1):
+                    if self._last_random[i] != 63:
+                        self._last_random[i] += 1
+                        break
+                    self._last_random[i] = 0
+            else:
+                self._last_time = now
+                self._last_random = [random.randrange(64) for _ in range(12)]
+            random_chars = ''.join(_PUSH_CHARS[i] for i in self._last_random)
+
+        time_chars = []
+        for _ in range(8):
+            time_chars.append(_PUSH_CHARS[now % 64])
+            now //= 64
+        return ''.join(reversed(time_chars)) + random_chars
+
+
+push_id = _PushIds()
+
+
+def _normalize_path(path):
+    return '/'.join(part for part in path.split('/') if part)
+
+
+class DatabaseWriter:
+    """
+    Write-behind queue for Realtime Database writes.
+
+    `update` takes a multi-path update (path -> value) and returns at once.
+    Writes to the same path in the open batch are coalesced, last write
+    winning, and a background thread sends each batch as one multi-path
+    `update()` once it reaches `batch_size` paths or `flush_interval`
+    seconds. Batches are sent one at a time in submission order and a
+    failed batch is retried with backoff before later batches go out, so
+    writes to any one path land in the order they were made.
+
+    `submit` queues an arbitrary callable (e.g. a transaction) behind the
+    writes made before it. `on_written` callbacks run once the batch holding
+    the write has been sent successfully, `on_failed` ones once it has been
+    given up on.
+    """
+
+    def __init__(self, get_ref=get_firebase_db_ref, batch_size=DB_WRITE_BATCH_SIZE,
+                 flush_interval=DB_WRITE_FLUSH_INTERVAL, max_retries=DB_WRITE_MAX_RETRIES,
+                 max_queue=DB_WRITER_QUEUE_SIZE):
+        self.get_ref = get_ref
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._pending_since = None
+        self._pending_callbacks = []
+        self._queue = deque()
+        self._depth = 0
+        self._busy = False
+        self._closing = False
+        self._thread = None
+
+        self.writes = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.retries = 0
+        self.jobs = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_error = None
+        self.max_depth = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_max = 0.0
+        self.flush_latency_last = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _put(self, path, value):
+        """Merge one write into the open batch. Caller holds the lock."""
+        for pending_path in list(self._pending):
+            if pending_path == path or pending_path.startswith(path + '/'):
+                # The new write replaces this one (or the subtree it lives in)
+                del self._pending[pending_path]
+                self._depth -= 1
+                self.coalesced += 1
+            elif path.startswith(pending_path + '/'):
+                # A multi-path update can't hold a path and its ancestor, so
+                # fold the write into the pending ancestor value instead
+                parent = self._pending[pending_path]
+                if not isinstance(parent, dict):
+                    parent = {}
+                parent = node = dict(parent)
+                parts = path[len(pending_path) + 1:].split('/')
+                for part in parts[:-1]:
+                    child = node.get(part)
+                    node[part] = dict(child) if isinstance(child, dict) else {}
+                    node = node[part]
+                node[parts[-1]] = value
+                self._pending[pending_path] = parent
+                self.coalesced += 1
+                return
+        self._pending[path] = value
+        self._depth += 1
+
+    def update(self, values, on_written=None, on_failed=None):
+        """
+        Queue a multi-path update. Returns False if the queue is full.
+        `on_written()` is called from the writer thread once it has landed,
+        `on_failed()` if it never will.
+        """
+        with self._cond:
+            if self._depth + len(values) > self.max_queue:
+                print(f"Database write queue full, dropping {len(values)} writes")
+                self.rejected += len(values)
+                return False
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            for path, value in values.items():
+                self._put(_normalize_path(path), value)
+            if on_written is not None or on_failed is not None:
+                self._pending_callbacks.append((on_written, on_failed))
+            self.writes += len(values)
+            self.max_depth = max(self.max_depth, self._depth)
+            self._ensure_thread()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def write(self, path, value, on_written=None, on_failed=None):
+        return self.update({path: value}, on_written, on_failed)
+
+    def submit(self, label, func, *args, **kwargs):
+        """Queue `func(*args, **kwargs)` to run after the writes queued so far."""
+        with self._cond:
+            self._seal()
+            self._queue.append(('job', (label, func, args, kwargs), time.monotonic()))
+            self._ensure_thread()
+            self._cond.notify_all()
+        return True
+
+    def _seal(self):
+        """Close the open batch so later writes start a new one. Caller holds the lock."""
+        if self._pending:
+            self._queue.append(('batch', (self._pending, self._pending_callbacks), self._pending_since))
+            self._pending = {}
+            self._pending_since = None
+            self._pending_callbacks = []
+
+    def _next_item(self):
+        with self._cond:
+            while True:
+                if self._queue:
+                    self._busy = True
+                    return self._queue.popleft()
+                if self._pending:
+                    waited = time.monotonic() - self._pending_since
+                    if self._closing or len(self._pending) >= self.batch_size or waited >= self.flush_interval:
+                        self._seal()
+                        continue
+                    self._cond.wait(self.flush_interval - waited)
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            kind, payload, queued_at = self._next_item()
+            try:
+                if kind == 'batch':
+                    batch, callbacks = payload
+                    self._confirm(callbacks, self._send_batch(batch, queued_at))
+                else:
+                    self._run_job(*payload)
+            finally:
+                with self._cond:
+                    if kind == 'batch':
+                        self._depth -= len(payload[0])
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _send_batch(self, batch, queued_at):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.get_ref().update(batch)
+                latency = time.monotonic() - queued_at
+                with self._cond:
+                    self.batches += 1
+                    self.flush_latency_total += latency
+                    self.flush_latency_max = max(self.flush_latency_max, latency)
+                    self.flush_latency_last = latency
+                return True
+            except (TypeError, ValueError) as e:
+                # Bad data won't get better by retrying
+                self._record_failure(f"batch of {len(batch)} writes: {e}", len(batch))
+                return False
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._record_failure(f"batch of {len(batch)} writes: {e}", len(batch))
+                    return False
+                delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** attempt)
+                print(f"Database write failed ({e}), retrying in {delay}s")
+                with self._cond:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def _confirm(self, callbacks, written):
+        for on_written, on_failed in callbacks:
+            callback = on_written if written else on_failed
+            if callback is None:
+                continue
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in database write callback: {e}")
+
+    def _run_job(self, label, func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+            with self._cond:
+                self.jobs += 1
+        except Exception as e:
+            self._record_failure(f"{label}: {e}", 1)
+
+    def _record_failure(self, message, count):
+        print(f"Error in database write {message}")
+        with self._cond:
+            self.failed += count
+            self.last_error = message
+
+    def flush(self, timeout=None):
+        """Send everything queued so far and wait for it. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._seal()
+            self._cond.notify_all()
+            while self._queue or self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=DB_WRITER_DRAIN_TIMEOUT):
+        """Drain the queue on shutdown."""
+        with self._cond:
+            self._closing = True
+            if self._thread is None:
+                return True
+        drained = self.flush(timeout)
+        if not drained:
+            print(f"Database writer shut down with {self._depth} writes still queued")
+        return drained
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': self._depth,
+                'max_queue_depth': self.max_depth,
+                'writes': self.writes,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'jobs': self.jobs,
+                'retries': self.retries,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+                'flush_latency_ms': {
+                    'last': round(self.flush_latency_last * 1000, 1) if self.flush_latency_last is not None else None,
+                    'avg': round(self.flush_latency_total * 1000 / self.batches, 1) if self.batches else None,
+                    'max': round(self.flush_latency_max * 1000, 1),
+                },
+            }
+
+
+db_writer = DatabaseWriter()
+atexit.register(db_writer.close)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# How often the feed is regenerated (seconds)
+EVENTS_REFRESH_SECONDS = int(os.getenv('EVENTS_REFRESH_SECONDS', 6 * 3600))
+
+# Retry delay after a failed generation (seconds)
+EVENTS_RETRY_SECONDS = int(os.getenv('EVENTS_RETRY_SECONDS', 300))
+
+# Last snapshot on disk, so a restarted (or another) worker serves it at once
+EVENTS_SNAPSHOT_PATH = os.getenv('EVENTS_SNAPSHOT_PATH', os.path.join('cache', 'social_events.json'))
+
+
+class EventsFeed:
+    """
+    A global feed generated in the background and served from memory.
+
+    A daemon thread calls `generate` every `interval` seconds and keeps the
+    result as a versioned snapshot: the response body is serialized once
+    and its ETag is a hash of the events, so a regeneration with the same
+    events keeps the version and ETag clients already have. Snapshots are
+    written to `path`; a fresh one found there (from before a restart or
+    from another worker) is used instead of generating again. Only the
+    very first request, before any snapshot exists, waits for a generation.
+    """
+
+    def __init__(self, generate, interval=EVENTS_REFRESH_SECONDS, path=EVENTS_SNAPSHOT_PATH,
+                 retry=EVENTS_RETRY_SECONDS):
+        self._generate = generate
+        self.interval = interval
+        self.retry = retry
+        self.path = path
+        self._lock = threading.Lock()
+        # Set once there is a snapshot or the first generation has failed
+        self._settled = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self.refreshes = 0
+        self.unchanged = 0
+        self.failures = 0
+        self.last_error = None
+        self._load()
+
+    def _load(self):
+        """Adopt the snapshot on disk if it is newer than the one in memory."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            snapshot = self._build(stored['events'], stored['version'], stored['generated_at'], stored['checked_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            if self._snapshot is None or snapshot['checked_at'] > self._snapshot['checked_at']:
+                self._snapshot = snapshot
+        self._settled.set()
+
+    def _save(self, snapshot):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({key: snapshot[key] for key in ('version', 'generated_at', 'checked_at', 'events')}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _etag(events):
+        return hashlib.sha256(json.dumps(events, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def _build(self, events, version, generated_at, checked_at):
+        body = json.dumps({
+            'events': events,
+            'version': version,
+            'generated_at': datetime.fromtimestamp(generated_at, timezone.utc).isoformat(),
+        }, ensure_ascii=False).encode('utf-8')
+        return {
+            'events': events,
+            'version': version,
+            'etag': self._etag(events),
+            'generated_at': generated_at,
+            'checked_at': checked_at,
+            'body': body,
+        }
+
+    def refresh(self):
+        """Generate the feed now and publish it. Returns the current snapshot."""
+        events = self._generate()
+        now = time.time()
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current['etag'] == self._etag(events):
+                # Same events: keep the version and ETag clients already have
+                snapshot = dict(current, checked_at=now)
+                self.unchanged += 1
+            else:
+                version = current['version'] + 1 if current is not None else 1
+                snapshot = self._build(events, version, now, now)
+            self._snapshot = snapshot
+            self.refreshes += 1
+            self.last_error = None
+        self._settled.set()
+        try:
+            self._save(snapshot)
+        except OSError as e:
+            print(f"Error saving events snapshot: {e}")
+        return snapshot
+
+    def _run(self):
+        while True:
+            self._load()
+            with self._lock:
+                age = time.time() - self._snapshot['checked_at'] if self._snapshot else None
+            if age is not None and age < self.interval:
+                time.sleep(self.interval - age)
+                continue
+            try:
+                self.refresh()
+                delay = self.interval
+            except Exception as e:
+                print(f"Error refreshing events feed: {e}")
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                delay = self.retry
+            self._settled.set()
+            time.sleep(delay)
+
+    def start(self):
+        """Start the background refresher (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def snapshot(self, timeout=None):
+        """
+        The current snapshot. Only if there has never been one, waits up to
+        `timeout` seconds for the first generation; None if it failed or
+        took longer.
+        """
+        self.start()
+        if not self._settled.is_set():
+            self._settled.wait(timeout)
+        with self._lock:
+            return self._snapshot
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                'version': snapshot['version'] if snapshot else None,
+                'events': len(snapshot['events']) if snapshot else 0,
+                'age_seconds': round(time.time() - snapshot['checked_at']) if snapshot else None,
+                'refreshes': self.refreshes,
+                'unchanged': self.unchanged,
+                'failures': self.failures,
+                'last_error': self.last_error,
+            }
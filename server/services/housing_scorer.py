@@ -0,0 +1,128 @@
+import threading
+import time
+import numpy as np
+from services.neighborhood_store import CATEGORIES, SCORE_FIELDS, neighborhood_store
+
+# Road distance per km of straight-line distance
+ROAD_DETOUR = 1.3
+
+# Average door-to-door speeds for commute time estimates (km/h)
+MODE_SPEED_KMH = {
+    'walking': 5,
+    'bicycling': 14,
+    'transit': 18,
+    'driving': 24,
+}
+DEFAULT_SPEED_KMH = 20
+
+# Share of a candidate's score from each criterion; they sum to 1
+SCORE_WEIGHTS = {
+    'budget': 0.30,
+    'commute': 0.25,
+    'must_haves': 0.25,
+    'lifestyle': 0.10,
+    'quality': 0.10,
+}
+
+# How a neighbourhood's 0-10 scores combine into its quality criterion
+QUALITY_WEIGHTS = {
+    'safety': 0.4,
+    'walkability': 0.2,
+    'transit': 0.2,
+    'greenery': 0.2,
+    'nightlife': 0.0,
+}
+
+
+class HousingScorer:
+    """
+    Deterministic ranking of every neighbourhood in a NeighborhoodStore,
+    for answering without a model round trip.
+
+    Each criterion is computed for all neighbourhoods at once as a 0-1
+    column: how much of the rent band is within budget, how much of the
+    travel distance allowance is left using the fastest acceptable mode,
+    the priority-weighted share of must-haves present, the share of
+    lifestyle tags matched, and a fixed blend of the quality scores. The
+    columns are combined with SCORE_WEIGHTS; neighbourhoods out of reach
+    of every travel mode are excluded.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        quality_weights = np.array([QUALITY_WEIGHTS[field] for field in SCORE_FIELDS], dtype=np.float64)
+        self.quality = store.scores.astype(np.float64) @ quality_weights / 10
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.score_seconds = 0.0
+
+    def rank(self, lat, lng, budget, travel_distances, must_haves=(), lifestyle_mask=0, limit=5):
+        """
+        The `limit` best neighbourhoods for a work location. `budget` is
+        (category, low, high), `travel_distances` maps each acceptable
+        travel mode to its maximum road distance (km), `must_haves` is in
+        priority order and `lifestyle_mask` is a bitset of lifestyle tags
+        (see Preferences.lifestyle_mask). Returns (indices, scores, road_km, modes).
+        """
+        started = time.perf_counter()
+        store = self.store
+        road = store.distances(lat, lng, slice(None)) * ROAD_DETOUR
+
+        # Commute: fastest mode whose distance allowance covers the trip
+        modes = list(travel_distances)
+        allowances = np.array([travel_distances[mode] for mode in modes], dtype=np.float64)
+        speeds = np.array([MODE_SPEED_KMH.get(mode, DEFAULT_SPEED_KMH) for mode in modes], dtype=np.float64)
+        hours = road[:, None] / speeds
+        hours[road[:, None] > allowances] = np.inf
+        best = hours.argmin(axis=1)
+        reachable = np.flatnonzero(np.isfinite(hours[np.arange(len(road)), best]))
+        best = best[reachable]
+        commute = 1 - road[reachable] / allowances[best]
+
+        category, low, high = budget
+        bands = store.rent[reachable, CATEGORIES.index(category)].astype(np.float64)
+        affordability = np.clip((high - bands[:, 0]) / np.maximum(bands[:, 1] - bands[:, 0], 1), 0, 1)
+
+        # Must-haves: the one ranked r-th weighs 1/r
+        positions = [i for i, tag in enumerate(must_haves) if tag in store.amenity_bits]
+        if positions:
+            bits = np.array([store.amenity_bits[must_haves[i]] for i in positions], dtype=np.uint64)
+            weights = 1 / np.arange(1, len(must_haves) + 1)
+            present = (store.amenity_mask[reachable, None] >> bits) & np.uint64(1)
+            amenities = present.astype(np.float64) @ weights[positions] / weights.sum()
+        else:
+            amenities = np.ones(len(reachable))
+
+        if lifestyle_mask:
+            matched = np.bitwise_count(store.lifestyle_mask[reachable] & np.uint64(lifestyle_mask))
+            lifestyle_fit = matched / lifestyle_mask.bit_count()
+        else:
+            lifestyle_fit = np.zeros(len(reachable))
+
+        scores = (
+            SCORE_WEIGHTS['budget'] * affordability
+            + SCORE_WEIGHTS['commute'] * commute
+            + SCORE_WEIGHTS['must_haves'] * amenities
+            + SCORE_WEIGHTS['lifestyle'] * lifestyle_fit
+            + SCORE_WEIGHTS['quality'] * self.quality[reachable]
+        )
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((road[reachable][top], -scores[top]))]
+
+        with self._lock:
+            self.queries += 1
+            self.score_seconds += time.perf_counter() - started
+        return reachable[top], scores[top], road[reachable][top], [modes[i] for i in best[top]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queries': self.queries,
+                'average_score_ms': round(1000 * self.score_seconds / self.queries, 3) if self.queries else None,
+            }
+
+
+housing_scorer = HousingScorer(neighborhood_store)
@@ -0,0 +1,319 @@
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', os.path.join('cache', 'jobs.sqlite3'))
+
+# Worker processes running jobs
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+# First retry delay (seconds), doubled on every further attempt
+RETRY_BACKOFF = 5
+
+# A running job's lease; the dispatcher running it renews it every third of
+# this, and a job whose lease has run out is assumed lost with its process (seconds)
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+
+# How often the dispatcher looks for jobs queued by other processes (seconds)
+POLL_INTERVAL = 1.0
+
+# Job kind -> "module:function" handler, imported in the worker process
+JOB_HANDLERS = {
+    'timeline': 'services.analysis_service:process_timeline',
+}
+
+# Job kind -> "module:function" called in the dispatcher's process with the
+# handler's result, for work that must go through process-wide services
+# (e.g. LLM calls, which are limited by the shared LLM gateway)
+JOB_FINISHERS = {
+    'timeline': 'services.analysis_service:finish_timeline',
+}
+
+
+def _resolve(spec):
+    module_name, func_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _run_handler(kind, payload):
+    return _resolve(JOB_HANDLERS[kind])(**payload)
+
+
+class JobQueue:
+    """
+    Durable background jobs.
+
+    Jobs are rows in SQLite, so they survive restarts and any process can
+    enqueue them. A dispatcher thread claims queued jobs atomically and
+    runs them on a process pool, so parsing and analysis don't compete
+    with request handling for the GIL; a job's finisher, if it has one,
+    then runs on a thread here. Claims are leases the dispatcher keeps
+    renewing while the job runs, so only jobs whose dispatcher is gone are
+    queued again. Failures are retried with exponential backoff up to
+    JOB_MAX_ATTEMPTS; ValueErrors (bad input) fail immediately.
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_DB, workers=JOB_WORKERS, lease=JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.lease = lease
+        # Identifies this dispatcher's claims
+        self._id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = None
+        self._finishers = None
+        self._thread = None
+        self._running = set()
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY, kind TEXT, key TEXT, owner TEXT, payload TEXT,'
+            ' status TEXT, attempts INTEGER DEFAULT 0, result TEXT, error TEXT,'
+            ' created_at REAL, run_after REAL, started_at REAL, finished_at REAL,'
+            ' claimed_by TEXT, lease_until REAL)'
+        )
+        # Queues created before leases
+        columns = {row['name'] for row in self._db.execute('PRAGMA table_info(jobs)')}
+        for column, column_type in (('claimed_by', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                self._db.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, run_after)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, kind, finished_at)')
+
+    def _row(self, row):
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'key': row['key'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    def enqueue(self, kind, payload, owner=None, key=None):
+        """
+        Queue a job and return it. If the owner already has a queued or
+        running job of this kind for the same key, that job is returned.
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        with self._lock:
+            if key is not None:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE kind=? AND key=? AND owner IS ? AND status IN ('queued', 'running')",
+                    (kind, key, owner),
+                ).fetchone()
+                if row is not None:
+                    return self._row(row)
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                'INSERT INTO jobs (id, kind, key, owner, payload, status, created_at, run_after)'
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, key, owner, json.dumps(payload), now, now),
+            )
+        # Picked up by whichever process runs the dispatcher (see start)
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
+        if row is None or (owner is not None and row['owner'] != owner):
+            return None
+        return self._row(row)
+
+    def list(self, owner, limit=20):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT * FROM jobs WHERE owner=? ORDER BY created_at DESC LIMIT ?', (owner, limit)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def latest_done(self, kind, owner):
+        """The owner's most recently completed job of a kind, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE owner=? AND kind=? AND status='done'"
+                ' ORDER BY finished_at DESC LIMIT 1',
+                (owner, kind),
+            ).fetchone()
+        return self._row(row)
+
+    def start(self):
+        """
+        Start the dispatcher and worker processes (idempotent). Called by
+        app.start_background_services; until then jobs only accumulate.
+        """
+        # Spawned workers re-import the app module; they must not dispatch
+        if multiprocessing.current_process().name != 'MainProcess':
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._dispatch, daemon=True)
+            self._thread.start()
+
+    def _new_pool(self):
+        # Spawned, not forked: this process has threads and open connections
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _replace_pool(self, broken):
+        """Swap in a fresh pool for one that lost a worker, once per broken pool."""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = self._new_pool()
+        broken.shutdown(wait=False)
+
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status='queued' AND run_after<=? ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status='running', attempts=attempts+1, started_at=?,"
+                        ' claimed_by=?, lease_until=? WHERE id=?',
+                        (now, self._id, now + self.lease, row['id']),
+                    )
+                    self._running.add(row['id'])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return row
+
+    def _renew_leases(self):
+        """Extend the leases of the jobs this dispatcher is running."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET lease_until=? WHERE id=? AND claimed_by=? AND status='running'",
+                [(time.time() + self.lease, job_id, self._id) for job_id in self._running],
+            )
+
+    def _requeue_stale(self):
+        """Queue again (or fail, if out of attempts) running jobs whose lease has run out."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=CASE WHEN attempts>=? THEN 'failed' ELSE 'queued' END,"
+                " error=CASE WHEN attempts>=? THEN 'Lost with its worker' ELSE error END,"
+                ' finished_at=CASE WHEN attempts>=? THEN ? ELSE finished_at END,'
+                " run_after=?, claimed_by=NULL WHERE status='running' AND COALESCE(lease_until, started_at+?)<?",
+                (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, now, now, self.lease, now),
+            )
+
+    def _dispatch(self):
+        self._pool = self._new_pool()
+        self._finishers = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-finisher')
+        last_renewal = last_stale_check = 0
+        while True:
+            self._wake.clear()
+            try:
+                if time.time() - last_renewal > self.lease / 3:
+                    self._renew_leases()
+                    last_renewal = time.time()
+                if time.time() - last_stale_check > self.lease / 3:
+                    self._requeue_stale()
+                    last_stale_check = time.time()
+                row = self._claim() if len(self._running) < self.workers else None
+            except sqlite3.Error as e:
+                print(f"Error claiming job: {e}")
+                row = None
+            if row is None:
+                self._wake.wait(POLL_INTERVAL)
+                continue
+
+            pool = self._pool
+            try:
+                future = pool.submit(_run_handler, row['kind'], json.loads(row['payload']))
+            except BrokenProcessPool as e:
+                self._replace_pool(pool)
+                self._complete(row, error=e)
+                continue
+            future.add_done_callback(lambda future, row=row, pool=pool: self._handled(row, future, pool))
+
+    def _handled(self, row, future, pool):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A worker died; later jobs need a fresh pool
+            self._replace_pool(pool)
+        if error is not None or row['kind'] not in JOB_FINISHERS:
+            self._complete(row, None if error else future.result(), error)
+            return
+        self._finishers.submit(self._finish, row, future.result())
+
+    def _finish(self, row, result):
+        try:
+            result = _resolve(JOB_FINISHERS[row['kind']])(result, **json.loads(row['payload']))
+        except Exception as e:
+            self._complete(row, error=e)
+            return
+        self._complete(row, result)
+
+    def _complete(self, row, result=None, error=None):
+        now = time.time()
+        # Only while the claim is still ours: a job requeued after its lease ran
+        # out may have been claimed again by another dispatcher
+        owned = "id=? AND claimed_by=? AND status='running'"
+        with self._lock:
+            self._running.discard(row['id'])
+            if error is None:
+                self._db.execute(
+                    f"UPDATE jobs SET status='done', result=?, error=NULL, finished_at=? WHERE {owned}",
+                    (json.dumps(result), now, row['id'], self._id),
+                )
+            elif isinstance(error, ValueError) or row['attempts'] + 1 >= JOB_MAX_ATTEMPTS:
+                print(f"Job {row['id']} ({row['kind']}) failed: {error}")
+                self._db.execute(
+                    f"UPDATE jobs SET status='failed', error=?, finished_at=? WHERE {owned}",
+                    (str(error), now, row['id'], self._id),
+                )
+            else:
+                delay = RETRY_BACKOFF * 2 ** row['attempts']
+                print(f"Job {row['id']} ({row['kind']}) failed, retrying in {delay}s: {error}")
+                self._db.execute(
+                    f"UPDATE jobs SET status='queued', error=?, run_after=?, claimed_by=NULL WHERE {owned}",
+                    (str(error), now + delay, row['id'], self._id),
+                )
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            return {
+                'workers': self.workers,
+                'inflight': len(self._running),
+                'lease_seconds': self.lease,
+                'queued': counts.get('queued', 0),
+                'running': counts.get('running', 0),
+                'done': counts.get('done', 0),
+                'failed': counts.get('failed', 0),
+            }
+
+
+job_queue = JobQueue()
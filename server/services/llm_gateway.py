@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import google.generativeai as genai
+from services.model_registry import model_registry
+
+# Generations allowed in flight across the whole process
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 32))
+
+# Requests per minute allowed for each rate-limit key
+RATE_PER_MINUTE = int(os.getenv('LLM_RATE_PER_MINUTE', 120))
+
+# Longest a caller will wait for a rate-limit token before giving up (seconds)
+MAX_RATE_WAIT = float(os.getenv('LLM_MAX_RATE_WAIT', 10))
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        self.capacity = max(rate_per_minute, 1)
+        self.tokens = float(self.capacity)
+        self.refill_per_second = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+
+    def reserve(self):
+        """Take a token and return how long to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.refill_per_second
+
+
+class LLMGateway:
+    """
+    Shared access point for Gemini generations.
+
+    Owns the API configuration and long-lived `GenerativeModel` objects,
+    runs blocking generations on a bounded thread pool, caps the number of
+    generations in flight process-wide and rate-limits each key (e.g. one
+    per endpoint). `generate` blocks, `submit` returns a Future and
+    `generate_async` can be awaited from an asyncio loop. Token counts
+    reported with each response are totalled per key.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, rate_per_minute=RATE_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.rate_per_minute = rate_per_minute
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._models = {}
+        self._buckets = {}
+        self._configured_key = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        # Token counts per rate-limit key, as reported by the API
+        self._usage = {}
+
+    def api_key(self):
+        return os.getenv('GOOGLE_AI_KEY') or os.getenv('GEMINI_API_KEY')
+
+    def configure(self):
+        """Configure the Gemini client once (and again only if the key changes)."""
+        api_key = self.api_key()
+        if api_key and api_key != self._configured_key:
+            with self._lock:
+                if api_key != self._configured_key:
+                    genai.configure(api_key=api_key)
+                    self._configured_key = api_key
+        return api_key
+
+    def get_model(self, model_name=None, generation_config=None, system_instruction=None):
+        """Return a cached GenerativeModel for this name and config."""
+        self.configure()
+        model_name = model_name or model_registry.get_model_name()
+        cache_key = (
+            model_name,
+            json.dumps(generation_config, sort_keys=True, default=str),
+            system_instruction,
+        )
+        with self._lock:
+            model = self._models.get(cache_key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name,
+                    generation_config=generation_config,
+                    system_instruction=system_instruction,
+                )
+                self._models[cache_key] = model
+            return model
+
+    def _wait_for_rate(self, rate_key):
+        with self._lock:
+            bucket = self._buckets.get(rate_key)
+            if bucket is None:
+                bucket = self._buckets[rate_key] = TokenBucket(self.rate_per_minute)
+            wait = bucket.reserve()
+            if wait > MAX_RATE_WAIT:
+                # Give the token back; the caller is not going to use it
+                bucket.tokens += 1
+                self.rate_limited += 1
+                raise RateLimitExceeded(f"Rate limit exceeded for '{rate_key}', retry in {wait:.0f}s")
+        if wait:
+            time.sleep(wait)
+
+    def _acquire(self, rate_key):
+        self._wait_for_rate(rate_key)
+        self._slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self, failed):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+        self._slots.release()
+
+    def _record_usage(self, rate_key, response):
+        """Add a finished generation's token counts to its rate key's totals."""
+        usage = getattr(response, 'usage_metadata', None)
+        input_tokens = getattr(usage, 'prompt_token_count', None)
+        output_tokens = getattr(usage, 'candidates_token_count', None)
+        if not isinstance(input_tokens, int) or not isinstance(output_tokens, int):
+            return
+        with self._lock:
+            totals = self._usage.setdefault(rate_key, {'calls': 0, 'input_tokens': 0, 'output_tokens': 0})
+            totals['calls'] += 1
+            totals['input_tokens'] += input_tokens
+            totals['output_tokens'] += output_tokens
+        print(f"LLM usage for {rate_key}: {input_tokens} input tokens, {output_tokens} output tokens")
+
+    def _run(self, model, contents, rate_key, kwargs):
+        self._acquire(rate_key)
+        failed = True
+        try:
+            response = model.generate_content(contents, **kwargs)
+            failed = False
+        finally:
+            self._release(failed)
+        self._record_usage(rate_key, response)
+        return response
+
+    def submit(self, contents, model=None, model_name=None, generation_config=None,
+               rate_key='default', **kwargs):
+        """Start a generation on the pool and return a Future of the response."""
+        model = model or self.get_model(model_name, generation_config)
+        return self._executor.submit(self._run, model, contents, rate_key, kwargs)
+
+    def generate(self, contents, model=None, model_name=None, generation_config=None,
+                 rate_key='default', timeout=None, **kwargs):
+        """Run a generation and wait for it (at most `timeout` seconds)."""
+        future = self.submit(contents, model, model_name, generation_config, rate_key, **kwargs)
+        return future.result(timeout=timeout)
+
+    async def generate_async(self, contents, model=None, model_name=None, generation_config=None,
+                             rate_key='default', **kwargs):
+        """Awaitable variant of `generate` for asyncio callers."""
+        future = self.submit(contents, model, model_name, generation_config, rate_key, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def stream(self, contents, model=None, model_name=None, generation_config=None,
+               rate_key='default', **kwargs):
+        """
+        Start a streamed generation on the calling thread. The returned
+        response holds a concurrency slot until `release` is called on it
+        (done automatically once its chunks have been consumed).
+        """
+        model = model or self.get_model(model_name, generation_config)
+        self._acquire(rate_key)
+        try:
+            response = model.generate_content(contents, stream=True, **kwargs)
+        except Exception:
+            self._release(True)
+            raise
+        return StreamHandle(self, response, rate_key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rate_limited': self.rate_limited,
+                'rate_per_minute': self.rate_per_minute,
+                'rate_keys': len(self._buckets),
+                'cached_models': len(self._models),
+                'usage': {
+                    rate_key: dict(totals, average_input_tokens=round(totals['input_tokens'] / totals['calls']))
+                    for rate_key, totals in self._usage.items()
+                },
+            }
+
+
+class StreamHandle:
+    """Iterable wrapper around a streamed response that frees its slot."""
+
+    def __init__(self, gateway, response, rate_key='default'):
+        self._gateway = gateway
+        self.response = response
+        self.rate_key = rate_key
+        self._released = False
+        self._chunks = None
+
+    def __iter__(self):
+        if self._chunks is None:
+            self._chunks = self._consume()
+        return self._chunks
+
+    def _consume(self):
+        failed = True
+        try:
+            for chunk in self.response:
+                yield chunk
+            failed = False
+        finally:
+            self.release(failed)
+        # Streamed responses carry usage once fully consumed
+        self._gateway._record_usage(self.rate_key, self.response)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def close(self):
+        """Stop consuming an unfinished stream and free its slot."""
+        if self._chunks is not None:
+            self._chunks.close()
+        self.release(failed=True)
+
+    def release(self, failed=False):
+        if not self._released:
+            self._released = True
+            self._gateway._release(failed)
+
+
+llm_gateway = LLMGateway()
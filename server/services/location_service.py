@@ -1,90 +1,117 @@
-import os
-import googlemaps
-from datetime import datetime
-import dotenv
-from collections import defaultdict
-
-dotenv.load_dotenv()
-
-gmaps = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_KEY'))
-
-def analyze_timeline_data(timeline_data):
-    """
-    Analyze Google Timeline data to extract patterns and preferences.
-    Returns a structured analysis of the user's movement patterns.
-    """
-    analysis = {
-        'most_visited_areas': [],
-        'common_activities': defaultdict(int),
-        'movement_patterns': {
-            'weekday': defaultdict(list),
-            'weekend': defaultdict(list)
-        },
-        'average_daily_locations': 0,
-        'activity_preferences': {
-            'shopping': 0,
-            'dining': 0,
-            'entertainment': 0,
-            'outdoor': 0,
-            'fitness': 0
-        }
-    }
-
-    try:
-        for segment in timeline_data.get('timelineObjects', []):
-            if 'placeVisit' in segment:
-                place = segment['placeVisit']
-                location = place.get('location', {})
-                
-                # Extract place details
-                place_name = location.get('name', '')
-                place_type = location.get('type', '')
-                
-                # Update visit counts
-                analysis['common_activities'][place_type] += 1
-                
-                # Analyze place type for activity preferences
-                if any(keyword in place_type.lower() for keyword in ['shop', 'store', 'mall']):
-                    analysis['activity_preferences']['shopping'] += 1
-                elif any(keyword in place_type.lower() for keyword in ['restaurant', 'cafe', 'food']):
-                    analysis['activity_preferences']['dining'] += 1
-                elif any(keyword in place_type.lower() for keyword in ['movie', 'theatre', 'entertainment']):
-                    analysis['activity_preferences']['entertainment'] += 1
-                elif any(keyword in place_type.lower() for keyword in ['park', 'garden', 'outdoor']):
-                    analysis['activity_preferences']['outdoor'] += 1
-                elif any(keyword in place_type.lower() for keyword in ['gym', 'fitness', 'sport']):
-                    analysis['activity_preferences']['fitness'] += 1
-
-        # Convert defaultdict to regular dict for JSON serialization
-        analysis['common_activities'] = dict(analysis['common_activities'])
-        analysis['movement_patterns'] = dict(analysis['movement_patterns'])
-        
-        return analysis
-    except Exception as e:
-        print(f"Error analyzing timeline data: {str(e)}")
-        return None
-
-def get_commute_time(origin, destination, mode="transit"):
-    """
-    Calculate the commute time between two locations.
-    Returns duration in minutes.
-    """
-    try:
-        # Get directions using Google Maps API
-        directions_result = gmaps.directions(
-            origin,
-            destination,
-            mode=mode,  # Using specified travel mode
-            departure_time=datetime.now()  # Current time
-        )
-
-        if directions_result:
-            # Get the first route's duration
-            duration = directions_result[0]['legs'][0]['duration']['value']
-            # Convert seconds to minutes
-            return round(duration / 60)
-        
-        return None
-    except Exception as e:
-        print(f"Error calculating commute time: {str(e)}")
-        return None
\ No newline at end of file
+import functools
+import os
+import threading
+import googlemaps
+import dotenv
+from services.commute_matrix import CommuteMatrix
+from services.timeline_analytics import TimelineAnalyzer
+from services.timeline_parser import iter_timeline_segments
+
+dotenv.load_dotenv()
+
+class _LazyMapsClient:
+    """
+    googlemaps.Client created on first use. Creating one raises without
+    GOOGLE_MAPS_KEY, and importing this module must not, since the
+    housing controller imports it even for requests that never hit Maps.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_KEY'))
+        return getattr(self._client, name)
+
+gmaps = _LazyMapsClient()
+
+# Cached, batched commute times backed by the Distance Matrix API
+commute_matrix = CommuteMatrix(gmaps)
+
+def analyze_timeline_data(timeline_data):
+    """
+    Analyze Google Timeline data to extract patterns and preferences.
+    `timeline_data` is either the parsed export (a dict with
+    `timelineObjects`) or an iterable of segments, e.g. from
+    `iter_timeline_segments`.
+    Returns a structured analysis of the user's movement patterns.
+    """
+    try:
+        if isinstance(timeline_data, dict):
+            segments = timeline_data.get('timelineObjects', [])
+        else:
+            segments = timeline_data
+
+        return TimelineAnalyzer().extend(segments).result()
+    except Exception as e:
+        print(f"Error analyzing timeline data: {str(e)}")
+        return None
+
+def analyze_timeline_file(path):
+    """
+    Analyze a Google Timeline export on disk, streaming its segments so
+    the document is never held in memory.
+    """
+    return analyze_timeline_data(iter_timeline_segments(path))
+
+def summarize_timeline_file(path):
+    """
+    Validate and analyze a Google Timeline export in one streaming pass.
+    Returns {'segments': count, 'analysis': ...}; raises TimelineParseError
+    if the file is not valid JSON.
+    """
+    segments = 0
+
+    def counted(source):
+        nonlocal segments
+        for segment in source:
+            segments += 1
+            yield segment
+
+    analysis = TimelineAnalyzer().extend(counted(iter_timeline_segments(path))).result()
+    return {'segments': segments, 'analysis': analysis}
+
+@functools.lru_cache(maxsize=1024)
+def _geocode(address):
+    results = gmaps.geocode(address)
+    if not results:
+        return None
+    location = results[0]['geometry']['location']
+    return location['lat'], location['lng']
+
+def geocode_address(address):
+    """
+    Return the (lat, lng) of an address, or None if it can't be found.
+    Results are cached per process; failed lookups are not.
+    """
+    try:
+        return _geocode(' '.join(str(address).split()))
+    except Exception as e:
+        print(f"Error geocoding address: {str(e)}")
+        return None
+
+def get_commute_time(origin, destination, mode="transit"):
+    """
+    Calculate the commute time between two locations.
+    Returns duration in minutes.
+    """
+    try:
+        return commute_matrix.duration(origin, destination, mode=mode)
+    except Exception as e:
+        print(f"Error calculating commute time: {str(e)}")
+        return None
+
+def get_commute_times(origins, destinations, mode="transit"):
+    """
+    Calculate commute times for every origin/destination pair in batched
+    Distance Matrix requests. Returns {(origin, destination): minutes}.
+    """
+    try:
+        return commute_matrix.durations(origins, destinations, mode=mode)
+    except Exception as e:
+        print(f"Error calculating commute times: {str(e)}")
+        return {}
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+import google.generativeai as genai
+
+# Models to try, in order of preference
+PREFERRED_MODELS = [
+    'gemini-1.5-flash',
+    'gemini-1.5-pro',
+    'gemini-pro',
+    'gemini-pro-vision',
+    'models/gemini-1.0-pro',
+    'models/gemini-pro'
+]
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+# How long a resolved model is trusted before it is refreshed (seconds)
+MODEL_TTL = int(os.getenv('GEMINI_MODEL_TTL', 3600))
+
+# How soon to retry when the very first listing fails (seconds)
+ERROR_RETRY_SECONDS = 60
+
+
+def pick_model(model_names):
+    """Pick the preferred model from a list of model names."""
+    for model_name in PREFERRED_MODELS:
+        matching_models = [name for name in model_names if model_name in name]
+        if matching_models:
+            return matching_models[0]
+
+    # If none of the preferred models are available, use the first available model
+    if model_names:
+        return model_names[0]
+
+    return None
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the resolved Gemini model.
+
+    The model list is fetched once (lazily, or eagerly via `warm()`) and the
+    choice is kept for `ttl` seconds. Once stale, the cached model keeps being
+    served while a background thread refreshes it, so no request pays for
+    `genai.list_models()`. If listing fails the last known good model is kept.
+    Listings are single-flight: on a cold start concurrent requests wait for
+    the one in progress instead of each listing the models.
+    """
+
+    def __init__(self, ttl=MODEL_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Held for the whole listing so only one runs at a time
+        self._resolve_lock = threading.Lock()
+        self._model_name = None
+        self._resolved_at = None
+        self._refreshing = False
+        self._last_error = None
+        self._refresh_count = 0
+
+    def _list_and_pick(self):
+        models = genai.list_models()
+        model_names = [model.name for model in models]
+        print("Available models:", model_names)
+        return pick_model(model_names)
+
+    def refresh(self):
+        """Resolve the model now. Keeps the last good model on errors."""
+        with self._resolve_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        try:
+            model_name = self._list_and_pick()
+            with self._lock:
+                self._refresh_count += 1
+                self._last_error = None
+                if model_name:
+                    self._model_name = model_name
+                    print(f"Using model: {model_name}")
+                elif not self._model_name:
+                    print(f"No models available, using default: {DEFAULT_MODEL}")
+                    self._model_name = DEFAULT_MODEL
+                self._resolved_at = time.time()
+        except Exception as e:
+            print(f"Error listing models: {e}")
+            with self._lock:
+                self._last_error = str(e)
+                if not self._model_name:
+                    # Nothing known yet: serve the default and retry soon
+                    print(f"Using default model: {DEFAULT_MODEL}")
+                    self._model_name = DEFAULT_MODEL
+                    self._resolved_at = time.time() - max(self.ttl - ERROR_RETRY_SECONDS, 0)
+                else:
+                    # Keep the last known good model for another TTL period
+                    self._resolved_at = time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
+        return self._model_name
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def get_model_name(self):
+        """Return the resolved model name, resolving it on first use."""
+        with self._lock:
+            model_name = self._model_name
+            resolved_at = self._resolved_at
+
+        if model_name is None:
+            with self._resolve_lock:
+                # Another request (or warm()) may have resolved it meanwhile
+                with self._lock:
+                    model_name = self._model_name
+                if model_name is None:
+                    model_name = self._refresh()
+            return model_name
+
+        if time.time() - resolved_at > self.ttl:
+            self._refresh_in_background()
+
+        return model_name
+
+    def warm(self):
+        """Resolve the model in the background (e.g. at startup)."""
+        if not os.getenv('GOOGLE_AI_KEY'):
+            return
+        with self._lock:
+            if self._model_name is not None:
+                return
+        genai.configure(api_key=os.getenv('GOOGLE_AI_KEY'))
+        self._refresh_in_background()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self._model_name,
+                'cache_age_seconds': round(time.time() - self._resolved_at, 1) if self._resolved_at else None,
+                'ttl_seconds': self.ttl,
+                'refresh_count': self._refresh_count,
+                'refreshing': self._refreshing,
+                'last_error': self._last_error,
+            }
+
+
+model_registry = ModelRegistry()
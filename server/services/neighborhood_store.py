@@ -0,0 +1,216 @@
+import json
+import math
+import os
+import re
+import threading
+import numpy as np
+from services.preferences import LIFESTYLE_BITS
+
+NEIGHBORHOOD_DATA = os.getenv(
+    'NEIGHBORHOOD_DATA',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'pune_neighborhoods.json'),
+)
+
+# Budget categories, in the order rent bands are stored
+CATEGORIES = ('budget', 'moderate', 'comfort', 'premium', 'luxury')
+
+SCORE_FIELDS = ('safety', 'walkability', 'transit', 'greenery', 'nightlife')
+
+# Points per KD-tree leaf, scanned with one vectorized distance check
+LEAF_SIZE = 8
+
+EARTH_RADIUS_KM = 6371.0
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+class KDTree:
+    """
+    Static 2-D KD-tree over an (n, 2) array, stored implicitly: `index` is
+    a permutation of the points where each slice's median is the splitting
+    node and its halves are the subtrees, alternating axes by depth.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.index = np.arange(len(self.points))
+        self._build(0, len(self.points), 0)
+
+    def _build(self, lo, hi, axis):
+        if hi - lo <= LEAF_SIZE:
+            return
+        mid = (lo + hi) // 2
+        part = self.index[lo:hi]
+        part[:] = part[np.argpartition(self.points[part, axis], mid - lo)]
+        self._build(lo, mid, 1 - axis)
+        self._build(mid + 1, hi, 1 - axis)
+
+    def query_radius(self, point, radius):
+        """Indices of the points within `radius` of `point`."""
+        x = np.asarray(point, dtype=np.float64)
+        found = []
+        stack = [(0, len(self.points), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                leaf = self.index[lo:hi]
+                distances = np.hypot(*(self.points[leaf] - x).T)
+                found.extend(leaf[distances <= radius].tolist())
+                continue
+            mid = (lo + hi) // 2
+            node = self.index[mid]
+            if math.dist(self.points[node], x) <= radius:
+                found.append(int(node))
+            offset = x[axis] - self.points[node, axis]
+            if offset - radius <= 0:
+                stack.append((lo, mid, 1 - axis))
+            if offset + radius >= 0:
+                stack.append((mid + 1, hi, 1 - axis))
+        return found
+
+
+class NeighborhoodStore:
+    """
+    Local neighbourhood knowledge base.
+
+    Records are loaded once into parallel NumPy arrays: centroids
+    (projected to km around the dataset's mean latitude and indexed with
+    a KD-tree), rent bands per budget category, amenity and lifestyle tags
+    as bitsets, and scores. `candidates` preselects neighbourhoods near a
+    point that fit a budget and have the must-have amenities, so the model
+    only has to rank and describe a short list.
+    """
+
+    def __init__(self, path=NEIGHBORHOOD_DATA, records=None):
+        if records is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        self.records = records
+        self.names = [record['name'] for record in records]
+        self.lat = np.array([record['lat'] for record in records], dtype=np.float64)
+        self.lng = np.array([record['lng'] for record in records], dtype=np.float64)
+        self._origin_lat = float(self.lat.mean()) if records else 0.0
+        self.tree = KDTree(self._project(self.lat, self.lng))
+
+        self.rent = np.array(
+            [[record['rent'][category] for category in CATEGORIES] for record in records], dtype=np.int32
+        ).reshape(len(records), len(CATEGORIES), 2)
+        self.scores = np.array(
+            [[record['scores'][field] for field in SCORE_FIELDS] for record in records], dtype=np.float32
+        ).reshape(len(records), len(SCORE_FIELDS))
+
+        self.amenity_bits = self._intern(record['amenities'] for record in records)
+        # Lifestyle bits match the ones in Preferences.lifestyle_mask
+        self.lifestyle_bits = self._intern((record['lifestyle'] for record in records), LIFESTYLE_BITS)
+        self.amenity_mask = np.array(
+            [self.mask(self.amenity_bits, record['amenities']) for record in records], dtype=np.uint64
+        )
+        self.lifestyle_mask = np.array(
+            [self.mask(self.lifestyle_bits, record['lifestyle']) for record in records], dtype=np.uint64
+        )
+        # Normalized names, for spotting a neighbourhood in an address
+        self._lookup = sorted(
+            ((f" {_NON_WORD.sub(' ', name.lower()).strip()} ", i) for i, name in enumerate(self.names)),
+            key=lambda item: -len(item[0]),
+        )
+
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.relaxed = 0
+
+    @staticmethod
+    def _intern(tag_lists, known=()):
+        bits = dict(known)
+        for tags in tag_lists:
+            for tag in tags:
+                bits.setdefault(tag, len(bits))
+        if len(bits) > 64:
+            raise ValueError("At most 64 distinct tags fit in a bitset")
+        return bits
+
+    @staticmethod
+    def mask(bits, tags):
+        """Bitset of `tags`; unknown tags are ignored."""
+        value = 0
+        for tag in tags:
+            if tag in bits:
+                value |= 1 << bits[tag]
+        return value
+
+    def _project(self, lat, lng):
+        """Equirectangular projection to km; accurate to well under 1% across a city."""
+        lat = np.radians(lat)
+        lng = np.radians(lng)
+        return np.column_stack((
+            EARTH_RADIUS_KM * lng * math.cos(math.radians(self._origin_lat)),
+            EARTH_RADIUS_KM * lat,
+        ))
+
+    def distances(self, lat, lng, indices):
+        """Straight-line km from a point to each of `indices`."""
+        point = self._project(np.array([lat]), np.array([lng]))[0]
+        return np.hypot(*(self.tree.points[indices] - point).T)
+
+    def locate(self, text):
+        """Centroid of the neighbourhood named in `text` (e.g. a work address), or None."""
+        normalized = f" {_NON_WORD.sub(' ', str(text).lower()).strip()} "
+        for name, i in self._lookup:
+            if name in normalized:
+                return float(self.lat[i]), float(self.lng[i])
+        return None
+
+    def affordable(self, indices, budget_range):
+        """Which of `indices` have a rent band overlapping (low, high) for their category."""
+        category, low, high = budget_range
+        bands = self.rent[indices, CATEGORIES.index(category)]
+        return (bands[:, 0] <= high) & (bands[:, 1] >= low)
+
+    def candidates(self, lat, lng, radius_km, budget_range=None, must_haves=(), lifestyle_mask=0,
+                   limit=None, min_results=3):
+        """
+        Neighbourhoods within `radius_km` of a point that are affordable for
+        `budget_range` ((category, low, high)) and have every must-have
+        amenity. `must_haves` is in priority order; if fewer than
+        `min_results` match, the lowest priority ones are relaxed. Results
+        are ordered by how many of the `lifestyle_mask` tags they share, then
+        distance.
+        Returns (indices, distances_km, lifestyle_matches, must_haves_applied).
+        """
+        point = self._project(np.array([lat]), np.array([lng]))[0]
+        indices = np.array(self.tree.query_radius(point, radius_km), dtype=np.int64)
+        if budget_range is not None and len(indices):
+            indices = indices[self.affordable(indices, budget_range)]
+
+        must_haves = [tag for tag in must_haves if tag in self.amenity_bits]
+        applied = list(must_haves)
+        while True:
+            required = np.uint64(self.mask(self.amenity_bits, applied))
+            matched = indices[(self.amenity_mask[indices] & required) == required]
+            if len(matched) >= min_results or not applied:
+                break
+            applied.pop()
+        with self._lock:
+            self.queries += 1
+            if len(applied) < len(must_haves):
+                self.relaxed += 1
+
+        distances = self.distances(lat, lng, matched)
+        matches = np.bitwise_count(self.lifestyle_mask[matched] & np.uint64(lifestyle_mask)).astype(np.int64)
+        order = np.lexsort((distances, -matches))[:limit]
+        return matched[order], distances[order], matches[order], applied
+
+    def record(self, i):
+        return self.records[i]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'neighborhoods': len(self.records),
+                'amenity_tags': len(self.amenity_bits),
+                'lifestyle_tags': len(self.lifestyle_bits),
+                'queries': self.queries,
+                'relaxed_must_haves': self.relaxed,
+            }
+
+
+neighborhood_store = NeighborhoodStore()
@@ -0,0 +1,213 @@
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple, Union
+import msgspec
+
+# Monthly rent range (₹) for each user category
+BUDGET_RANGES = MappingProxyType({
+    'budget': (5000, 8000),
+    'moderate': (8000, 12000),
+    'comfort': (12000, 18000),
+    'premium': (18000, 24000),
+    'luxury': (24000, 50000),
+})
+DEFAULT_CATEGORY = 'moderate'
+
+# Maximum travel distance (km) for a travel mode the request gives none for
+DEFAULT_DISTANCES = MappingProxyType({
+    'walking': 5,
+    'bicycling': 10,
+    'transit': 15,
+    'driving': 20,
+})
+DEFAULT_DISTANCE = 10
+
+# Lifestyle options of the preference form, in the order of the numeric
+# codes older clients send
+LIFESTYLE_OPTIONS = (
+    'accessibility', 'activeLifestyle', 'affordability', 'amenities',
+    'artsAndMusic', 'casual', 'casualDining', 'cleanliness',
+    'community', 'convenient', 'cultural', 'entertainment',
+    'familyFriendly', 'fineDining', 'greenSpaces', 'healthy',
+    'internationalCuisine', 'nightlife', 'outdoorActivities',
+    'quiet', 'quietness', 'relaxing', 'safety', 'shopping',
+    'socialGatherings',
+)
+
+# Lifestyle option -> its bit in a lifestyle bitset
+LIFESTYLE_BITS = MappingProxyType({name: bit for bit, name in enumerate(LIFESTYLE_OPTIONS)})
+
+
+class PreferencesError(ValueError):
+    pass
+
+
+class Coordinates(msgspec.Struct):
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+
+class TravelModeSetting(msgspec.Struct):
+    enabled: bool = False
+    distance: Optional[float] = None
+
+
+class CommuteInput(msgspec.Struct):
+    workAddress: Optional[str] = None
+    travelMode: Optional[str] = None
+    coordinates: Optional[Coordinates] = None
+    travelModes: Dict[str, TravelModeSetting] = {}
+
+
+class MustHave(msgspec.Struct):
+    name: str
+    priority: Union[int, float]
+
+
+class PreferencesInput(msgspec.Struct):
+    """Preferences as the client sends them (see PreferenceForm)."""
+    userCategory: str = DEFAULT_CATEGORY
+    userCategoryDescription: str = ''
+    commute: CommuteInput = msgspec.field(default_factory=CommuteInput)
+    lifestylePreferences: Union[List[Union[int, str]], Dict[str, Any], None] = None
+    # Older clients
+    lifestyle: Optional[Dict[str, Any]] = None
+    prioritizedMustHaves: Optional[List[MustHave]] = None
+    mustHaves: Optional[Dict[str, Any]] = None
+
+
+class Preferences(msgspec.Struct, frozen=True):
+    """Housing preferences, normalized once per request by parse_preferences."""
+    user_category: str
+    user_category_description: str
+    budget_category: str
+    budget_low: int
+    budget_high: int
+    work_address: str
+    work_location: Optional[Tuple[float, float]]
+    travel_mode: str
+    max_distance: float
+    # Every enabled travel mode with its maximum distance (km)
+    travel_distances: Dict[str, float]
+    # Lifestyle names in the order given; the known ones also as a bitset
+    lifestyle: Tuple[str, ...]
+    lifestyle_mask: int
+    # Must-haves in priority order, with their priorities if the client ranked them
+    must_haves: Tuple[str, ...]
+    priorities: Tuple[Union[int, float], ...] = ()
+
+    @property
+    def budget(self):
+        return self.budget_category, self.budget_low, self.budget_high
+
+    @property
+    def budget_range(self):
+        return f'₹{self.budget_low} - ₹{self.budget_high}'
+
+    @property
+    def prioritized(self):
+        return bool(self.priorities)
+
+    def canonical(self):
+        """
+        Compact form that is equal for preferences that should share a
+        cached answer: independent of ordering, case, address formatting
+        and fractions of a kilometre.
+        """
+        return [
+            self.budget_category,
+            self.user_category.strip().lower(),
+            ' '.join(self.work_address.lower().replace(',', ' ').split()),
+            self.travel_mode.lower(),
+            round(self.max_distance),
+            sorted((mode, round(distance)) for mode, distance in self.travel_distances.items()),
+            self.lifestyle_mask,
+            sorted(name for name in self.lifestyle if name not in LIFESTYLE_BITS),
+            list(zip(self.must_haves, self.priorities)) if self.priorities else sorted(self.must_haves),
+        ]
+
+
+def _lifestyle_names(data):
+    prefs = data.lifestylePreferences
+    if isinstance(prefs, dict):
+        return [name for name, selected in prefs.items() if selected]
+    if prefs is None:
+        return [name for name, selected in (data.lifestyle or {}).items() if selected]
+    names = []
+    for pref in prefs:
+        if isinstance(pref, int) or pref.isdigit():
+            code = int(pref)
+            names.append(LIFESTYLE_OPTIONS[code] if 0 <= code < len(LIFESTYLE_OPTIONS) else f"preference_{code}")
+        else:
+            names.append(pref)
+    return names
+
+
+def parse_preferences(raw):
+    """
+    Validate client preferences and normalize them in one pass. Raises
+    PreferencesError if they don't have the expected shape.
+    """
+    if isinstance(raw, Preferences):
+        return raw
+    try:
+        data = msgspec.convert(raw, PreferencesInput, strict=False)
+    except msgspec.ValidationError as e:
+        raise PreferencesError(f"Invalid preferences: {e}") from e
+
+    category = data.userCategory if data.userCategory in BUDGET_RANGES else DEFAULT_CATEGORY
+    budget_low, budget_high = BUDGET_RANGES[category]
+
+    commute = data.commute
+    travel_mode = commute.travelMode or 'driving'
+    selected = commute.travelModes.get(travel_mode)
+    if selected is not None:
+        max_distance = selected.distance if selected.distance is not None else DEFAULT_DISTANCE
+    else:
+        max_distance = DEFAULT_DISTANCES.get(travel_mode, DEFAULT_DISTANCE)
+    travel_distances = {
+        mode: setting.distance if setting.distance is not None else DEFAULT_DISTANCES.get(mode, DEFAULT_DISTANCE)
+        for mode, setting in commute.travelModes.items() if setting.enabled
+    } or {travel_mode: max_distance}
+
+    lifestyle = []
+    lifestyle_mask = 0
+    for name in _lifestyle_names(data):
+        bit = LIFESTYLE_BITS.get(name)
+        if bit is None:
+            if name in lifestyle:
+                continue
+        elif lifestyle_mask >> bit & 1:
+            continue
+        else:
+            lifestyle_mask |= 1 << bit
+        lifestyle.append(name)
+
+    priorities = ()
+    if data.prioritizedMustHaves:
+        ranked = sorted(data.prioritizedMustHaves, key=lambda item: item.priority)
+        must_haves = tuple(item.name for item in ranked)
+        priorities = tuple(item.priority for item in ranked)
+    else:
+        must_haves = tuple(name for name, wanted in (data.mustHaves or {}).items() if wanted)
+
+    coordinates = commute.coordinates
+    work_location = None
+    if coordinates is not None and coordinates.lat is not None and coordinates.lng is not None:
+        work_location = (coordinates.lat, coordinates.lng)
+
+    return Preferences(
+        user_category=data.userCategory,
+        user_category_description=data.userCategoryDescription,
+        budget_category=category,
+        budget_low=budget_low,
+        budget_high=budget_high,
+        work_address=commute.workAddress or 'Not specified',
+        work_location=work_location,
+        travel_mode=travel_mode,
+        max_distance=float(max_distance),
+        travel_distances={mode: float(distance) for mode, distance in travel_distances.items()},
+        lifestyle=tuple(lifestyle),
+        lifestyle_mask=lifestyle_mask,
+        must_haves=must_haves,
+        priorities=priorities,
+    )
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from config.firebase import get_firebase_db_ref
+
+# Users whose preferences are kept in memory
+PREFERENCES_CACHE_SIZE = int(os.getenv('PREFERENCES_CACHE_SIZE', 10000))
+
+# How long a cached entry is served before it is read again, so changes made
+# by other workers show up within this time even without listeners (seconds)
+PREFERENCES_CACHE_TTL = int(os.getenv('PREFERENCES_CACHE_TTL', 60))
+
+# Keep a Firebase streaming listener open per cached user to pick up
+# changes made outside this server (one HTTP connection and thread each)
+PREFERENCES_CACHE_LISTEN = os.getenv('PREFERENCES_CACHE_LISTEN', '0') == '1'
+
+# Marks a user known to have no preferences, so misses are cached too
+_MISSING = object()
+
+
+def _apply_event(current, path, data, merge):
+    """Apply a streaming put/patch event at `path` to a cached value."""
+    parts = [part for part in path.split('/') if part]
+    if not parts:
+        if merge and isinstance(current, dict) and isinstance(data, dict):
+            return {**current, **data}
+        return data
+    root = node = dict(current) if isinstance(current, dict) else {}
+    for part in parts[:-1]:
+        child = node.get(part)
+        node[part] = dict(child) if isinstance(child, dict) else {}
+        node = node[part]
+    if merge and isinstance(node.get(parts[-1]), dict) and isinstance(data, dict):
+        data = {**node[parts[-1]], **data}
+    if data is None:
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = data
+    return root
+
+
+class PreferencesCache:
+    """
+    Read-through LRU cache of `users/<uid>/preferences`.
+
+    `get` serves from memory and only reads Firebase on a miss or once the
+    entry is older than `ttl` seconds. A save is cached as soon as it is
+    queued with the write-behind writer, so reads never see the value it
+    replaces, and dropped again with `discard` (its `on_failed` callback)
+    if the write is given up on. With `listen` enabled, each cached user also
+    gets a streaming listener so changes made elsewhere update the entry
+    in place; the listener is closed when the entry is evicted.
+    """
+
+    def __init__(self, max_entries=PREFERENCES_CACHE_SIZE, listen=PREFERENCES_CACHE_LISTEN,
+                 ttl=PREFERENCES_CACHE_TTL):
+        self.max_entries = max_entries
+        self.listen = listen
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.remote_updates = 0
+
+    def _ref(self, uid):
+        return get_firebase_db_ref().child('users').child(uid).child('preferences')
+
+    def get(self, uid):
+        """Return the user's preferences, or None if they have none."""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None:
+                if time.monotonic() - entry[1] < self.ttl:
+                    self._entries.move_to_end(uid)
+                    self.hits += 1
+                    return None if entry[0] is _MISSING else entry[0]
+                del self._entries[uid]
+                self.expirations += 1
+            self.misses += 1
+
+        value = self._ref(uid).get()
+        with self._lock:
+            # A save made while we were reading wins
+            if uid not in self._entries:
+                self._store(uid, value)
+            value = self._entries[uid][0]
+        return None if value is _MISSING else value
+
+    def put(self, uid, preferences):
+        """Record preferences that are being written to Firebase."""
+        with self._lock:
+            self._store(uid, preferences)
+
+    def discard(self, uid, preferences):
+        """Drop `preferences` if still cached, e.g. after their write failed."""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None and entry[0] is preferences:
+                del self._entries[uid]
+                self._close_listener(uid)
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._entries.pop(uid, None)
+            self._close_listener(uid)
+
+    def _store(self, uid, value):
+        """Caller holds the lock."""
+        self._entries[uid] = (_MISSING if value is None else value, time.monotonic())
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._close_listener(evicted)
+            self.evictions += 1
+        if self.listen and uid not in self._listeners:
+            # Placeholder until the listener connects
+            starting = self._listeners[uid] = object()
+            threading.Thread(target=self._start_listener, args=(uid, starting), daemon=True).start()
+
+    def _start_listener(self, uid, starting):
+        first_event = [True]
+
+        def on_event(event):
+            # The first event is the current snapshot, which we already have
+            if first_event[0]:
+                first_event[0] = False
+                return
+            with self._lock:
+                if uid not in self._entries:
+                    return
+                current = self._entries[uid][0]
+                current = None if current is _MISSING else current
+                value = _apply_event(current, event.path, event.data, event.event_type == 'patch')
+                self._entries[uid] = (_MISSING if value is None else value, time.monotonic())
+                self.remote_updates += 1
+
+        try:
+            registration = self._ref(uid).listen(on_event)
+        except Exception as e:
+            print(f"Error listening for preference changes of {uid}: {e}")
+            with self._lock:
+                if self._listeners.get(uid) is starting:
+                    del self._listeners[uid]
+            return
+        with self._lock:
+            if self._listeners.get(uid) is starting:
+                self._listeners[uid] = registration
+                return
+        # Evicted while the listener was starting
+        registration.close()
+
+    def _close_listener(self, uid):
+        """Caller holds the lock."""
+        registration = self._listeners.pop(uid, None)
+        if hasattr(registration, 'close'):
+            threading.Thread(target=registration.close, daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'listeners': len(self._listeners),
+                'remote_updates': self.remote_updates,
+            }
+
+
+preferences_cache = PreferencesCache()
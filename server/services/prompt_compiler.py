@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, NamedTuple
+from services.conversation_store import estimate_tokens
+
+# Default input budget for a compiled prompt (estimated tokens)
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 3000))
+
+_TRAILING_SPACE = re.compile(r'[ \t]+\n')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+class Section(NamedTuple):
+    """An optional prompt section: `label` goes before the value, only if it is kept."""
+    value: Any
+    label: str = ''
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+@lru_cache(maxsize=64)
+def compact_text(text):
+    """
+    Strip trailing spaces from every line and squeeze runs of blank lines.
+    Indentation is kept: it carries structure such as nested lists.
+    """
+    return _BLANK_LINES.sub('\n\n', _TRAILING_SPACE.sub('\n', text)).strip()
+
+
+def render_value(value):
+    """Text for a section value: strings as they are, lists of strings one per line, anything else compact JSON."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+        return '\n'.join(value)
+    return compact_json(value)
+
+
+def _shorten(value):
+    """
+    `value` with one entry less: the last item of a list, the last item of
+    a dict's longest list, else a dict's last key. None if it can't be
+    shortened.
+    """
+    if isinstance(value, (list, tuple)) and len(value) > 1:
+        return value[:-1]
+    if isinstance(value, dict):
+        lists = [key for key, item in value.items() if isinstance(item, list) and len(item) > 1]
+        if lists:
+            longest = max(lists, key=lambda key: len(value[key]))
+            return {**value, longest: value[longest][:-1]}
+        if len(value) > 1:
+            return dict(list(value.items())[:-1])
+    return None
+
+
+class PromptCompiler:
+    """
+    Renders prompt templates to a token budget and keeps size statistics
+    per endpoint.
+
+    Templates use str.format placeholders and are compacted once (see
+    `compact_text`); values are rendered compactly (see `render_value`).
+    Required sections are always kept. Optional sections are given in
+    order of importance; while the prompt is over budget the least
+    important one is shortened entry by entry (lists and dicts) and then
+    dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def compile(self, endpoint, template, required=None, optional=None, budget=PROMPT_TOKEN_BUDGET):
+        template = compact_text(template)
+        # Numbers are left as they are for format specs like {distance:g}
+        values = {
+            name: value if isinstance(value, (int, float)) else render_value(value)
+            for name, value in (required or {}).items()
+        }
+        optional = dict(optional or {})
+        order = list(optional)
+        trimmed = False
+        while True:
+            for name in order:
+                section = optional[name]
+                if not isinstance(section, Section):
+                    section = Section(section)
+                values[name] = section.label + render_value(section.value) if section.value else ''
+            text = _BLANK_LINES.sub('\n\n', template.format_map(values))
+            tokens = estimate_tokens(text)
+            if tokens <= budget or not order:
+                break
+            trimmed = True
+            name = order[-1]
+            section = optional[name]
+            if isinstance(section, Section):
+                shorter = _shorten(section.value)
+                optional[name] = section._replace(value=shorter) if shorter is not None else None
+            else:
+                optional[name] = _shorten(section)
+            if optional[name] is None:
+                order.pop()
+                values[name] = ''
+
+        over_budget = tokens > budget
+        if over_budget:
+            print(f"Prompt for {endpoint} is {tokens} tokens, over its budget of {budget}")
+        elif trimmed:
+            print(f"Prompt for {endpoint} trimmed to {tokens} tokens (budget {budget})")
+        with self._lock:
+            stats = self._endpoints.setdefault(
+                endpoint, {'compiled': 0, 'tokens': 0, 'max_tokens': 0, 'trimmed': 0, 'over_budget': 0}
+            )
+            stats['compiled'] += 1
+            stats['tokens'] += tokens
+            stats['max_tokens'] = max(stats['max_tokens'], tokens)
+            stats['trimmed'] += trimmed
+            stats['over_budget'] += over_budget
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'compiled': stats['compiled'],
+                    'average_tokens': round(stats['tokens'] / stats['compiled']),
+                    'max_tokens': stats['max_tokens'],
+                    'trimmed': stats['trimmed'],
+                    'over_budget': stats['over_budget'],
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+
+prompt_compiler = PromptCompiler()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(payload):
+    """Hash a JSON-serializable payload into a stable cache key."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache with TTL eviction, optionally backed by a directory
+    of JSON files so entries survive restarts and are shared between workers.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'r') as f:
+                entry = json.load(f)
+            if time.time() - entry['stored_at'] > self.ttl:
+                os.remove(self._disk_path(key))
+                return None
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, entry):
+        # Write to a temp file first so readers never see a partial entry
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Error writing cache entry to disk: {e}")
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry['stored_at'] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry['value']
+                del self._entries[key]
+
+        entry = self._read_disk(key) if self.disk_dir else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, entry)
+            return entry['value']
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        entry = {'stored_at': time.time(), 'value': value}
+        with self._lock:
+            self._store(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk_dir': self.disk_dir,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            }
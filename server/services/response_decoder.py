@@ -0,0 +1,312 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+import msgspec
+
+Score = Union[int, float, str, None]
+Text = Union[str, int, float, None]
+Item = Union[str, Dict[str, Any]]
+
+
+class CommuteDetails(msgspec.Struct):
+    distance: Text = None
+    time: Text = None
+    travelMode: Text = None
+
+
+class Neighborhood(msgspec.Struct):
+    """One recommendation, as requested by generate_housing_prompt."""
+    name: str
+    city: str = ''
+    state: str = ''
+    averageRent: Text = None
+    safetyScore: Score = None
+    walkabilityScore: Score = None
+    image: Optional[str] = None
+    description: str = ''
+    amenities: List[Item] = []
+    commuteDetails: Optional[CommuteDetails] = None
+    matchingFactors: List[Item] = []
+    nearbyHighlights: List[Item] = []
+
+
+class RankedNeighborhood(msgspec.Struct):
+    """One shortlisted neighbourhood as ranked and described by the model."""
+    name: str
+    description: str = ''
+    matchingFactors: List[Item] = []
+    nearbyHighlights: List[Item] = []
+
+
+class PersonalityAnalysis(msgspec.Struct):
+    """The personality analysis requested by analyze_timeline_digest."""
+    personality_traits: List[Item] = []
+    area_preferences: List[Item] = []
+    lifestyle_indicators: List[Item] = []
+    activity_patterns: List[Item] = []
+    commute_insights: List[Item] = []
+
+
+class TicketDetails(msgspec.Struct):
+    price: Text = None
+    booking_link: Optional[str] = None
+
+
+class SocialEvent(msgspec.Struct):
+    """One event in the social events feed."""
+    name: str
+    date: Text = None
+    location: Text = None
+    category: Text = None
+    ticket_details: Optional[TicketDetails] = None
+    official_source: Optional[str] = None
+
+
+class SocialEventsFeed(msgspec.Struct):
+    events: List[SocialEvent] = []
+
+
+# Repair tokenizer: strings (or one cut off at the end of the text),
+# comments, structure, and runs of anything else (literals, numbers,
+# stray prose), each with the whitespace before it
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<open>[{\[])
+  | (?P<close>[}\]])
+  | (?P<comma>,)
+  | (?P<colon>:)
+  | (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")
+  | (?P<partial>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<other>[^"{}\[\],:/\s]+|/)
+)''', re.VERBOSE | re.DOTALL)
+
+# From the first opening to the last closing bracket: the document inside
+# fences or prose
+_DOCUMENT = re.compile(r'[\[{].*[\]}]', re.DOTALL)
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# Last-resort field scraping for output that can't be repaired
+_SCRAPE_NAME = re.compile(r'"name":\s*"([^"]+)"')
+_SCRAPE_CITY = re.compile(r'"city":\s*"([^"]+)"')
+_SCRAPE_DESCRIPTION = re.compile(r'"description":\s*"([^"]+)"')
+
+
+class ResponseDecodeError(ValueError):
+    pass
+
+
+def repair_json(text):
+    """
+    Best-effort fix of the usual defects in model JSON in one pass over
+    the text: surrounding markdown fences or prose, // and /* */ comments,
+    trailing commas, and output cut off mid-document (the incomplete last
+    element or member is dropped and open containers are closed). No
+    array, at any depth, is left ending in a half-written element.
+    """
+    out = []
+    stack = []
+    # Per open container: output length after its last complete element
+    marks = []
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        if not stack and kind != 'open':
+            # Skip everything before the document (fences, prose)
+            continue
+        token = match.group(kind)
+        if kind in ('string', 'other'):
+            out.append(token)
+            # A value ends an element; an object key doesn't
+            if stack[-1] == '[' or out[-2] == ':':
+                marks[-1] = len(out)
+        elif kind == 'open':
+            stack.append(token)
+            out.append(token)
+            marks.append(len(out))
+        elif kind == 'close':
+            if out[-1] == ',':
+                out.pop()
+            out.append(_CLOSERS[stack.pop()])
+            marks.pop()
+            if not stack:
+                return ''.join(out)
+            marks[-1] = len(out)
+        elif kind == 'comma':
+            if out[-1] not in (',', '[', '{'):
+                out.append(token)
+        elif kind == 'colon':
+            out.append(token)
+        elif kind == 'partial':
+            break
+
+    if not stack:
+        raise ResponseDecodeError("No JSON object or array found")
+    # Cut off: drop the incomplete element of the outermost open array, so
+    # no list ends in a half-written item (or, outside arrays, the
+    # incomplete member of the innermost object), then close whatever is
+    # still open
+    if '[' in stack:
+        outermost = stack.index('[')
+        del stack[outermost + 1:], marks[outermost + 1:]
+    del out[marks[-1]:]
+    return ''.join(out) + ''.join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+class ResponseDecoder:
+    """
+    Typed decoding of a model's JSON response.
+
+    The response is first decoded straight into `schema` with msgspec,
+    which validates as it parses, then with any surrounding fences or
+    prose cut off. Otherwise it is put through `repair_json` and decoded
+    again. An object answer wrapped in a one-element list is unwrapped.
+    With `item_type`, if some items of a list schema (or of the list in
+    `field` of an object schema) still don't validate, the valid ones are
+    kept. Results are plain Python values, ready for jsonify.
+    """
+
+    def __init__(self, schema, item_type=None, field=None):
+        self.schema = schema
+        self.item_type = item_type
+        self.field = field
+        self._decoder = msgspec.json.Decoder(schema)
+        self._lock = threading.Lock()
+        self.clean = 0
+        self.repaired = 0
+        self.salvaged = 0
+        self.failed = 0
+        self.decode_seconds = 0.0
+
+    def _count(self, outcome, started):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.decode_seconds += time.perf_counter() - started
+
+    def decode(self, text):
+        """Decode `text` to builtins. Raises ResponseDecodeError."""
+        started = time.perf_counter()
+        try:
+            value = msgspec.to_builtins(self._decoder.decode(text))
+            self._count('clean', started)
+            return value
+        except msgspec.ValidationError as e:
+            # Valid JSON, wrong shape: no repair will help
+            return self._salvage_or_fail(text, e, started)
+        except msgspec.DecodeError:
+            pass
+
+        # Most often the JSON is fine but wrapped in fences or prose
+        document = _DOCUMENT.search(text)
+        if document is not None and (document.start() or document.end() < len(text)):
+            try:
+                value = msgspec.to_builtins(self._decoder.decode(document.group()))
+                self._count('repaired', started)
+                return value
+            except msgspec.ValidationError as e:
+                return self._salvage_or_fail(document.group(), e, started)
+            except msgspec.DecodeError:
+                pass
+
+        try:
+            repaired = repair_json(text)
+            value = msgspec.to_builtins(self._decoder.decode(repaired))
+        except msgspec.ValidationError as e:
+            return self._salvage_or_fail(repaired, e, started)
+        except (msgspec.DecodeError, ResponseDecodeError) as e:
+            self._count('failed', started)
+            raise ResponseDecodeError(f"Unrecoverable JSON: {e}") from e
+        # An empty list after repair means nothing survived, not an empty answer
+        if self.item_type is not None and not (value[self.field] if self.field else value):
+            self._count('failed', started)
+            raise ResponseDecodeError("No complete items in the response")
+        self._count('repaired', started)
+        return value
+
+    def _salvage_or_fail(self, document, error, started):
+        value = self._salvage(msgspec.json.decode(document))
+        if value:
+            self._count('salvaged', started)
+            return value
+        self._count('failed', started)
+        raise ResponseDecodeError(f"Response does not match the schema: {error}")
+
+    def _salvage(self, document):
+        """What can be kept of a valid JSON `document` that doesn't match the schema."""
+        if isinstance(document, list) and len(document) == 1 and isinstance(document[0], dict):
+            # An object answer wrapped in a list
+            try:
+                return msgspec.to_builtins(msgspec.convert(document[0], self.schema))
+            except msgspec.ValidationError:
+                if self.field is not None:
+                    document = document[0]
+        if self.item_type is None:
+            return None
+
+        if self.field is not None:
+            if not isinstance(document, dict) or not isinstance(document.get(self.field), list):
+                return None
+            items = self._valid_items(document[self.field])
+            if not items:
+                return None
+            try:
+                return msgspec.to_builtins(msgspec.convert({**document, self.field: items}, self.schema))
+            except msgspec.ValidationError:
+                return None
+
+        # The items of a list response (or a list wrapped in an object)
+        if isinstance(document, dict):
+            document = next((value for value in document.values() if isinstance(value, list)), [document])
+        if not isinstance(document, list):
+            return None
+        return self._valid_items(document)
+
+    def _valid_items(self, items):
+        valid = []
+        for item in items:
+            try:
+                valid.append(msgspec.to_builtins(msgspec.convert(item, self.item_type)))
+            except msgspec.ValidationError:
+                continue
+        return valid
+
+    def stats(self):
+        with self._lock:
+            decoded = self.clean + self.repaired + self.salvaged + self.failed
+            return {
+                'clean': self.clean,
+                'repaired': self.repaired,
+                'salvaged': self.salvaged,
+                'failed': self.failed,
+                'average_decode_ms': round(1000 * self.decode_seconds / decoded, 3) if decoded else None,
+            }
+
+
+def scrape_neighborhoods(text):
+    """Names, cities and descriptions found anywhere in unparseable output."""
+    names = _SCRAPE_NAME.findall(text)
+    cities = _SCRAPE_CITY.findall(text)
+    descriptions = _SCRAPE_DESCRIPTION.findall(text)
+    return [
+        {
+            "name": names[i],
+            "city": cities[i],
+            "description": descriptions[i] if i < len(descriptions) else "No description available"
+        }
+        for i in range(min(len(names), len(cities)))
+    ]
+
+
+neighborhood_decoder = ResponseDecoder(List[Neighborhood], item_type=Neighborhood)
+ranking_decoder = ResponseDecoder(List[RankedNeighborhood], item_type=RankedNeighborhood)
+personality_decoder = ResponseDecoder(PersonalityAnalysis)
+events_decoder = ResponseDecoder(SocialEventsFeed, item_type=SocialEvent, field='events')
+
+
+def decoder_stats():
+    return {
+        'neighborhoods': neighborhood_decoder.stats(),
+        'rankings': ranking_decoder.stats(),
+        'personality': personality_decoder.stats(),
+        'social_events': events_decoder.stats(),
+    }
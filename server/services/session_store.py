@@ -0,0 +1,310 @@
+import os
+import re
+import secrets
+import threading
+import time
+from flask.sessions import SessionInterface, SessionMixin
+import msgspec
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(dict)
+
+# Filesystem sessions sweep expired files every this many saves
+SWEEP_EVERY = 1000
+
+# Shape of ids from new_session_id; anything else in the cookie is ignored
+_SESSION_ID = re.compile(r'[A-Za-z0-9_-]{43}')
+
+
+class MemoryBackend:
+    """Sessions in a dict in this process. Lost on restart, not shared between workers."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid, ttl):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[sid]
+                return None
+            return entry[0]
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            self._entries[sid] = (data, time.time() + ttl)
+            if len(self._entries) % SWEEP_EVERY == 0:
+                now = time.time()
+                for key in [key for key, (_, expires) in self._entries.items() if expires < now]:
+                    del self._entries[key]
+
+    def touch(self, sid, ttl):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (entry[0], time.time() + ttl)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class FilesystemBackend:
+    """
+    One file per session. The file's mtime is the last activity, so
+    sliding expiry only needs a utime rather than a rewrite.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._saves = 0
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def get(self, sid, ttl):
+        path = self._path(sid)
+        try:
+            if os.path.getmtime(path) + ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, sid, data, ttl):
+        # Write to a temp file first so readers never see a partial session
+        path = self._path(sid)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._saves += 1
+        if self._saves % SWEEP_EVERY == 0:
+            self.sweep(ttl)
+
+    def touch(self, sid, ttl):
+        try:
+            os.utime(self._path(sid))
+        except OSError:
+            pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def sweep(self, ttl):
+        cutoff = time.time() - ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+class RedisBackend:
+    """Sessions in Redis (or anything speaking its protocol), expiring via TTL."""
+
+    def __init__(self, url, prefix='session:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, sid, ttl):
+        return self.client.get(self.prefix + sid)
+
+    def set(self, sid, data, ttl):
+        self.client.set(self.prefix + sid, data, ex=int(ttl))
+
+    def touch(self, sid, ttl):
+        self.client.expire(self.prefix + sid, int(ttl))
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSession(SessionMixin):
+    """
+    Session whose data lives in a backend and is only fetched the first
+    time the request reads or writes it.
+    """
+
+    def __init__(self, sid, loader=None, permanent=True):
+        self.sid = sid
+        self._permanent = permanent
+        self._loader = loader
+        self._data = None if loader else {}
+        self.new = loader is None
+        self.modified = False
+        self.accessed = False
+
+    # Kept outside the data (unlike Flask's '_permanent' key) so checking
+    # it doesn't force a load
+    @property
+    def permanent(self):
+        return self._permanent
+
+    @permanent.setter
+    def permanent(self, value):
+        self._permanent = bool(value)
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            self._data = self._loader()
+            if self._data is None:
+                # Unknown or expired id: start over under a new one
+                self._data = {}
+                self.sid = new_session_id()
+                self.new = True
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    def to_dict(self):
+        return dict(self._load())
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Keeps session data server-side so the cookie only carries a random id.
+
+    Data is serialized with msgpack and loaded lazily, so requests that
+    never touch `session` don't use the backend at all. Permanent sessions
+    slide: every request that uses the session pushes expiry out by
+    PERMANENT_SESSION_LIFETIME, with a TTL refresh instead of a rewrite
+    when the data didn't change.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.loads = 0
+        self.saves = 0
+        self.touches = 0
+        self._lock = threading.Lock()
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        permanent = app.config.get('SESSION_PERMANENT', True)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or not _SESSION_ID.fullmatch(sid):
+            return ServerSession(new_session_id(), permanent=permanent)
+        ttl = self._ttl(app)
+
+        def load():
+            with self._lock:
+                self.loads += 1
+            data = self.backend.get(sid, ttl)
+            if data is None:
+                return None
+            try:
+                return _decoder.decode(data)
+            except msgspec.DecodeError:
+                return None
+
+        return ServerSession(sid, load, permanent)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        ttl = self._ttl(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.loaded and not session._data:
+            # Emptied (e.g. logout): drop it server-side and client-side
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.backend.set(session.sid, _encoder.encode(session._data), ttl)
+            with self._lock:
+                self.saves += 1
+        elif session.new or not session.accessed:
+            # Never written to, or not used by this request: leave the
+            # backend and the cookie alone
+            return
+        elif self.should_set_cookie(app, session):
+            # Unchanged: slide the expiry without rewriting the data
+            self.backend.touch(session.sid, ttl)
+            with self._lock:
+                self.touches += 1
+
+        if self.should_set_cookie(app, session) or session.modified:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'loads': self.loads,
+                'saves': self.saves,
+                'touches': self.touches,
+            }
+
+
+def create_session_interface(config):
+    """Build the session interface for SESSION_TYPE: memory, filesystem or redis."""
+    session_type = config.get('SESSION_TYPE', 'filesystem')
+    if session_type == 'memory':
+        backend = MemoryBackend()
+    elif session_type == 'filesystem':
+        backend = FilesystemBackend(config.get('SESSION_FILE_DIR', os.path.join(os.getcwd(), 'flask_session')))
+    elif session_type == 'redis':
+        backend = RedisBackend(config.get('SESSION_REDIS_URL', 'redis://localhost:6379/0'))
+    else:
+        raise ValueError(f"Unsupported SESSION_TYPE: {session_type}")
+    return ServerSessionInterface(backend)
@@ -0,0 +1,351 @@
+import os
+import re
+from array import array
+from datetime import datetime
+import numpy as np
+
+# Activity categories, checked in order; the first matching keyword wins
+ACTIVITY_CATEGORIES = (
+    ('shopping', re.compile('shop|store|mall')),
+    ('dining', re.compile('restaurant|cafe|food')),
+    ('entertainment', re.compile('movie|theatre|entertainment')),
+    ('outdoor', re.compile('park|garden|outdoor')),
+    ('fitness', re.compile('gym|fitness|sport')),
+)
+UNCATEGORIZED = len(ACTIVITY_CATEGORIES)
+
+# Local time offset used for weekday/hour patterns (minutes, default IST)
+TZ_OFFSET_SECONDS = int(os.getenv('TIMELINE_TZ_OFFSET_MINUTES', 330)) * 60
+
+# Grid cell size for most visited areas, in E7 units (100000 = 0.01 deg, ~1.1 km)
+AREA_CELL_E7 = 100000
+
+TOP_AREAS = 5
+
+TOP_PLACES = 10
+
+TOP_CORRIDORS = 5
+
+# 1970-01-01 was a Thursday; shift so Monday is 0
+_EPOCH_WEEKDAY = 3
+
+
+def _timestamp_seconds(duration, key):
+    """Read an ISO 8601 start/end timestamp (newer exports), or NaN."""
+    value = duration.get(f'{key}Timestamp')
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return float('nan')
+
+
+def _duration_seconds(duration, key):
+    value = duration.get(f'{key}TimestampMs')
+    if value is not None:
+        try:
+            return int(value) / 1000.0
+        except (TypeError, ValueError):
+            pass
+    return _timestamp_seconds(duration, key)
+
+
+def _e7(value):
+    """An E7 coordinate as an int; exports sometimes carry floats, strings or nulls (0)."""
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _mapping(value, empty):
+    return value if isinstance(value, dict) else empty
+
+
+def _cell_keys(lat_e7, lng_e7):
+    """Pack the grid cell of each coordinate into one int64 (lat cell high, lng cell low)."""
+    return (np.floor_divide(lat_e7, AREA_CELL_E7) << 32) + (np.floor_divide(lng_e7, AREA_CELL_E7) + (1 << 31))
+
+
+def _cell_center(key):
+    key = int(key)
+    lat_cell, lng_cell = key >> 32, (key & 0xFFFFFFFF) - (1 << 31)
+    return round((lat_cell + 0.5) * AREA_CELL_E7 / 1e7, 3), round((lng_cell + 0.5) * AREA_CELL_E7 / 1e7, 3)
+
+
+class TimelineAnalyzer:
+    """
+    Columnar timeline analytics.
+
+    `add` appends each place visit to typed columns (timestamps, E7
+    coordinates, interned place type and name codes) and each activity
+    segment to trip columns (endpoints, mode, distance, times); `result`
+    loads the columns into NumPy arrays and computes every aggregate in
+    batch. Place types are classified once per distinct type through a
+    lookup table rather than once per visit.
+    """
+
+    def __init__(self):
+        self.start = array('d')
+        self.end = array('d')
+        self.lat_e7 = array('q')
+        self.lng_e7 = array('q')
+        self.type_codes = array('q')
+        self.name_codes = array('q')
+        self.type_ids = {}
+        self.name_ids = {}
+        self.trip_start = array('d')
+        self.trip_end = array('d')
+        self.trip_from_e7 = array('q')  # lat, lng pairs
+        self.trip_to_e7 = array('q')
+        self.trip_distance = array('d')
+        self.trip_mode_codes = array('q')
+        self.mode_ids = {}
+
+    def add(self, segment):
+        self.extend((segment,))
+
+    def extend(self, segments):
+        """Append the place visits and activity segments among `segments` to the columns."""
+        # Hot loop: bind everything it touches to locals
+        type_ids, name_ids = self.type_ids, self.name_ids
+        add_type, add_name = self.type_codes.append, self.name_codes.append
+        add_lat, add_lng = self.lat_e7.append, self.lng_e7.append
+        add_start, add_end = self.start.append, self.end.append
+        empty = {}
+        for segment in segments:
+            # Malformed segments are skipped or read with defaults, never fatal
+            if not isinstance(segment, dict):
+                continue
+            place = segment.get('placeVisit')
+            if not isinstance(place, dict):
+                activity = segment.get('activitySegment')
+                if isinstance(activity, dict):
+                    self._add_trip(activity, empty)
+                continue
+            location = _mapping(place.get('location'), empty)
+            duration = _mapping(place.get('duration'), empty)
+
+            place_type = location.get('type') or ''
+            if type(place_type) is not str:
+                place_type = str(place_type)
+            type_code = type_ids.get(place_type)
+            if type_code is None:
+                type_code = type_ids[place_type] = len(type_ids)
+            place_name = location.get('name') or ''
+            if type(place_name) is not str:
+                place_name = str(place_name)
+            name_code = name_ids.get(place_name)
+            if name_code is None:
+                name_code = name_ids[place_name] = len(name_ids)
+
+            add_type(type_code)
+            add_name(name_code)
+            lat = location.get('latitudeE7', 0)
+            lng = location.get('longitudeE7', 0)
+            add_lat(lat if type(lat) is int else _e7(lat))
+            add_lng(lng if type(lng) is int else _e7(lng))
+            try:
+                add_start(int(duration['startTimestampMs']) / 1000.0)
+            except (KeyError, TypeError, ValueError):
+                add_start(_timestamp_seconds(duration, 'start'))
+            try:
+                add_end(int(duration['endTimestampMs']) / 1000.0)
+            except (KeyError, TypeError, ValueError):
+                add_end(_timestamp_seconds(duration, 'end'))
+        return self
+
+    def _add_trip(self, activity, empty):
+        # Trips are far fewer than visits, so this stays off the hot path
+        origin = _mapping(activity.get('startLocation'), empty)
+        destination = _mapping(activity.get('endLocation'), empty)
+        duration = _mapping(activity.get('duration'), empty)
+        mode = str(activity.get('activityType') or 'UNKNOWN_ACTIVITY_TYPE')
+        mode_code = self.mode_ids.get(mode)
+        if mode_code is None:
+            mode_code = self.mode_ids[mode] = len(self.mode_ids)
+        self.trip_mode_codes.append(mode_code)
+        self.trip_from_e7.extend((_e7(origin.get('latitudeE7')), _e7(origin.get('longitudeE7'))))
+        self.trip_to_e7.extend((_e7(destination.get('latitudeE7')), _e7(destination.get('longitudeE7'))))
+        try:
+            distance = float(activity.get('distance'))
+        except (TypeError, ValueError):
+            distance = float('nan')
+        self.trip_distance.append(distance)
+        self.trip_start.append(_duration_seconds(duration, 'start'))
+        self.trip_end.append(_duration_seconds(duration, 'end'))
+
+    def _category_table(self):
+        """Category code for every interned place type."""
+        table = np.full(len(self.type_ids), UNCATEGORIZED, dtype=np.int8)
+        for place_type, code in self.type_ids.items():
+            lowered = place_type.lower()
+            for index, (_, pattern) in enumerate(ACTIVITY_CATEGORIES):
+                if pattern.search(lowered):
+                    table[code] = index
+                    break
+        return table
+
+    def result(self):
+        type_codes = np.frombuffer(self.type_codes, dtype=np.int64) if self.type_codes else np.empty(0, np.int64)
+        visits = len(type_codes)
+
+        # Activity counts per place type and per category
+        type_counts = np.bincount(type_codes, minlength=len(self.type_ids))
+        type_names = list(self.type_ids)
+        categories = self._category_table()[type_codes] if visits else np.empty(0, np.int8)
+        category_counts = np.bincount(categories, minlength=UNCATEGORIZED + 1)
+
+        analysis = {
+            'most_visited_areas': self._top_areas(),
+            'common_activities': {type_names[code]: int(count) for code, count in enumerate(type_counts) if count},
+            'movement_patterns': {'weekday': {}, 'weekend': {}},
+            'average_daily_locations': 0,
+            'activity_preferences': {
+                name: int(category_counts[index]) for index, (name, _) in enumerate(ACTIVITY_CATEGORIES)
+            },
+            'top_places': self._top_places(),
+            'commute_corridors': self._corridors(),
+        }
+
+        start = np.frombuffer(self.start, dtype=np.float64) if self.start else np.empty(0)
+        timed = ~np.isnan(start)
+        if timed.any():
+            local = start[timed] + TZ_OFFSET_SECONDS
+            days = np.floor_divide(local, 86400).astype(np.int64)
+            hours = ((local - days * 86400) // 3600).astype(np.int64)
+            weekend = (days + _EPOCH_WEEKDAY) % 7 >= 5
+
+            # Visits by local hour of day, split into weekdays and weekends
+            for label, mask in (('weekday', ~weekend), ('weekend', weekend)):
+                counts = np.bincount(hours[mask], minlength=24)
+                analysis['movement_patterns'][label] = {
+                    str(hour): int(count) for hour, count in enumerate(counts) if count
+                }
+
+            analysis['average_daily_locations'] = round(float(timed.sum()) / len(np.unique(days)), 2)
+
+            durations = np.frombuffer(self.end, dtype=np.float64)[timed] - start[timed]
+            durations = durations[~np.isnan(durations)]
+            if len(durations):
+                analysis['average_visit_minutes'] = round(float(durations.mean()) / 60, 1)
+
+        return analysis
+
+    def _top_areas(self):
+        """Most visited ~1 km grid cells, labelled with a place in each."""
+        if not self.lat_e7:
+            return []
+        lat = np.frombuffer(self.lat_e7, dtype=np.int64)
+        lng = np.frombuffer(self.lng_e7, dtype=np.int64)
+        located = (lat != 0) | (lng != 0)
+        if not located.any():
+            return []
+        lat_cells = np.floor_divide(lat[located], AREA_CELL_E7)
+        lng_cells = np.floor_divide(lng[located], AREA_CELL_E7)
+        cell_keys = (lat_cells << 32) + (lng_cells - lng_cells.min())
+        cells, first_index, counts = np.unique(cell_keys, return_index=True, return_counts=True)
+
+        names = list(self.name_ids)
+        name_codes = np.frombuffer(self.name_codes, dtype=np.int64)[located]
+        order = np.argsort(counts)[::-1][:TOP_AREAS]
+        return [
+            {
+                'latitude': (int(lat_cells[first_index[i]]) + 0.5) * AREA_CELL_E7 / 1e7,
+                'longitude': (int(lng_cells[first_index[i]]) + 0.5) * AREA_CELL_E7 / 1e7,
+                'visits': int(counts[i]),
+                'example_place': names[name_codes[first_index[i]]],
+            }
+            for i in order
+        ]
+
+    def _top_places(self):
+        """Most visited named places with their total time spent."""
+        if not self.name_codes:
+            return []
+        name_codes = np.frombuffer(self.name_codes, dtype=np.int64)
+        type_codes = np.frombuffer(self.type_codes, dtype=np.int64)
+        minutes = (np.frombuffer(self.end, dtype=np.float64) - np.frombuffer(self.start, dtype=np.float64)) / 60
+        counts = np.bincount(name_codes, minlength=len(self.name_ids))
+        total_minutes = np.bincount(name_codes, weights=np.nan_to_num(minutes), minlength=len(self.name_ids))
+        # The type a place was first seen with
+        first_type = np.zeros(len(self.name_ids), dtype=np.int64)
+        first_type[name_codes[::-1]] = type_codes[::-1]
+
+        names = list(self.name_ids)
+        type_names = list(self.type_ids)
+        if '' in self.name_ids:
+            counts[self.name_ids['']] = 0  # Unnamed visits aren't a place
+        order = np.argsort(counts, kind='stable')[::-1][:TOP_PLACES]
+        return [
+            {
+                'name': names[code],
+                'type': type_names[first_type[code]],
+                'visits': int(counts[code]),
+                'minutes': int(total_minutes[code]),
+            }
+            for code in order if counts[code]
+        ]
+
+    def _corridors(self):
+        """
+        Most travelled routes between ~1 km cells, regardless of direction,
+        with their usual mode, distance and duration.
+        """
+        if not self.trip_mode_codes:
+            return []
+        origin = np.frombuffer(self.trip_from_e7, dtype=np.int64).reshape(-1, 2)
+        destination = np.frombuffer(self.trip_to_e7, dtype=np.int64).reshape(-1, 2)
+        located = origin.any(axis=1) & destination.any(axis=1)
+        a = _cell_keys(origin[:, 0], origin[:, 1])
+        b = _cell_keys(destination[:, 0], destination[:, 1])
+        # Trips within one cell are errands, not corridors
+        located &= a != b
+        if not located.any():
+            return []
+        pairs = np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1)[located]
+        corridors, inverse, counts = np.unique(pairs, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        modes = np.frombuffer(self.trip_mode_codes, dtype=np.int64)[located]
+        distance = np.frombuffer(self.trip_distance, dtype=np.float64)[located]
+        minutes = (np.frombuffer(self.trip_end, dtype=np.float64)
+                   - np.frombuffer(self.trip_start, dtype=np.float64))[located] / 60
+        mode_names = list(self.mode_ids)
+        labels = self._cell_labels()
+
+        result = []
+        for i in np.argsort(counts, kind='stable')[::-1][:TOP_CORRIDORS]:
+            trips = inverse == i
+            ends = []
+            for key in corridors[i]:
+                latitude, longitude = _cell_center(key)
+                ends.append({'latitude': latitude, 'longitude': longitude, 'place': labels.get(int(key), '')})
+            known_distance = distance[trips][~np.isnan(distance[trips])]
+            known_minutes = minutes[trips][~np.isnan(minutes[trips])]
+            result.append({
+                'from': ends[0],
+                'to': ends[1],
+                'trips': int(counts[i]),
+                'mode': mode_names[int(np.bincount(modes[trips]).argmax())],
+                'median_km': round(float(np.median(known_distance)) / 1000, 1) if len(known_distance) else None,
+                'median_minutes': round(float(np.median(known_minutes))) if len(known_minutes) else None,
+            })
+        return result
+
+    def _cell_labels(self):
+        """The most visited place name in each cell that has visits."""
+        if not self.name_codes:
+            return {}
+        cells = _cell_keys(np.frombuffer(self.lat_e7, dtype=np.int64), np.frombuffer(self.lng_e7, dtype=np.int64))
+        name_codes = np.frombuffer(self.name_codes, dtype=np.int64)
+        pairs, counts = np.unique(np.stack([cells, name_codes], axis=1), axis=0, return_counts=True)
+        names = list(self.name_ids)
+        labels = {}
+        best = {}
+        for (cell, code), count in zip(pairs.tolist(), counts.tolist()):
+            if names[code] and count > best.get(cell, 0):
+                best[cell] = count
+                labels[cell] = names[code]
+        return labels
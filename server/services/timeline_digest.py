@@ -0,0 +1,138 @@
+import io
+import json
+import os
+from services.conversation_store import estimate_tokens
+from services.timeline_analytics import TimelineAnalyzer
+from services.timeline_parser import TimelineParseError, iter_timeline_segments
+
+# Upper bound on the digest's size in the personality prompt (estimated tokens)
+TIMELINE_DIGEST_TOKENS = int(os.getenv('TIMELINE_DIGEST_TOKENS', 600))
+
+# Local hours (start inclusive) that make up each part of the day
+DAY_PARTS = (
+    ('night', 0),
+    ('morning', 6),
+    ('afternoon', 12),
+    ('evening', 17),
+    ('late_evening', 21),
+)
+
+# List sections in the order they are shortened when the digest is over
+# budget: each is cut down to one entry before any is dropped entirely
+TRIM_ORDER = ('place_types', 'top_areas', 'top_places', 'commute_corridors')
+
+# Characters of each excerpt taken from timelines that aren't JSON exports
+EXCERPT_CHARS = 240
+
+
+def _shares(counts):
+    """Percent of the total for each key, dropping zeros."""
+    total = sum(counts.values())
+    if not total:
+        return {}
+    return {key: round(100 * count / total) for key, count in counts.items() if count}
+
+
+def _day_parts(hour_counts):
+    parts = dict.fromkeys(name for name, _ in DAY_PARTS)
+    for hour, count in hour_counts.items():
+        name = next(name for name, start in reversed(DAY_PARTS) if int(hour) >= start)
+        parts[name] = (parts[name] or 0) + count
+    return _shares({name: count or 0 for name, count in parts.items()})
+
+
+def build_timeline_digest(analysis):
+    """
+    Reduce a TimelineAnalyzer result to the compact, fixed-shape facts the
+    personality prompt needs. Size depends only on the TOP_* limits, never
+    on how many segments the upload had.
+    """
+    activities = analysis.get('common_activities', {})
+    categories = dict(analysis.get('activity_preferences', {}))
+    visits = sum(activities.values())
+    categories['other'] = visits - sum(categories.values())
+    patterns = analysis.get('movement_patterns', {})
+    weekday = sum(patterns.get('weekday', {}).values())
+    weekend = sum(patterns.get('weekend', {}).values())
+
+    digest = {
+        'visits': visits,
+        'places_per_day': analysis.get('average_daily_locations', 0),
+        'average_visit_minutes': analysis.get('average_visit_minutes'),
+        'weekend_share': round(100 * weekend / (weekday + weekend)) if weekday + weekend else None,
+        'categories': _shares(categories),
+        'time_of_day': {
+            'weekday': _day_parts(patterns.get('weekday', {})),
+            'weekend': _day_parts(patterns.get('weekend', {})),
+        },
+        'top_areas': [
+            {'place': area['example_place'], 'lat': round(area['latitude'], 2),
+             'lng': round(area['longitude'], 2), 'visits': area['visits']}
+            for area in analysis.get('most_visited_areas', [])
+        ],
+        'top_places': [
+            {'name': place['name'], 'type': place['type'], 'visits': place['visits'],
+             'hours': round(place['minutes'] / 60, 1)}
+            for place in analysis.get('top_places', [])
+        ],
+        'commute_corridors': [
+            {'between': [end['place'] or f"{end['latitude']},{end['longitude']}"
+                         for end in (corridor['from'], corridor['to'])],
+             'trips': corridor['trips'], 'mode': corridor['mode'],
+             'km': corridor['median_km'], 'minutes': corridor['median_minutes']}
+            for corridor in analysis.get('commute_corridors', [])
+        ],
+        'place_types': dict(sorted(activities.items(), key=lambda item: -item[1])[:10]),
+    }
+    return {key: value for key, value in digest.items() if value not in (None, {}, [])}
+
+
+def render_digest(digest, token_budget=TIMELINE_DIGEST_TOKENS):
+    """
+    Compact JSON for a digest, trimmed to fit `token_budget` by dropping
+    the least significant entries of its lists (see TRIM_ORDER).
+    """
+    digest = dict(digest)
+    text = json.dumps(digest, separators=(',', ':'))
+    while estimate_tokens(text) > token_budget:
+        key = next((key for floor in (1, 0) for key in TRIM_ORDER if len(digest.get(key, ())) > floor), None)
+        if key is None:
+            # Nothing left to trim: cut the scalars' text as a last resort
+            return text[:token_budget * 4]
+        value = digest[key]
+        if len(value) == 1:
+            del digest[key]
+        elif isinstance(value, dict):
+            digest[key] = dict(list(value.items())[:-1])
+        else:
+            digest[key] = value[:-1]
+        text = json.dumps(digest, separators=(',', ':'))
+    return text
+
+
+def _excerpts(text, token_budget):
+    """Evenly spaced excerpts covering the whole of a free-form timeline."""
+    text = ' '.join(text.split())
+    budget_chars = token_budget * 4
+    if len(text) <= budget_chars:
+        return text
+    count = max(1, budget_chars // (EXCERPT_CHARS + 5))
+    step = (len(text) - EXCERPT_CHARS) / max(1, count - 1)
+    return ' ... '.join(text[int(i * step):int(i * step) + EXCERPT_CHARS] for i in range(count))
+
+
+def digest_timeline_text(timeline_text, token_budget=TIMELINE_DIGEST_TOKENS):
+    """
+    Digest an uploaded timeline for the personality prompt. Timeline JSON
+    exports are analyzed in one streaming pass over their segments; any
+    other text is represented by excerpts spread across all of it.
+    """
+    if timeline_text.lstrip()[:1] in ('{', '['):
+        analyzer = TimelineAnalyzer()
+        try:
+            analyzer.extend(iter_timeline_segments(io.StringIO(timeline_text)))
+        except TimelineParseError:
+            analyzer = None
+        if analyzer is not None and (analyzer.type_codes or analyzer.trip_mode_codes):
+            return render_digest(build_timeline_digest(analyzer.result()), token_budget)
+    return _excerpts(timeline_text, token_budget)
@@ -0,0 +1,181 @@
+import codecs
+import json
+import re
+
+# Bytes read from the upload per refill
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters a JSON number can continue with
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*\Z')
+
+
+class TimelineParseError(ValueError):
+    pass
+
+
+class _StreamReader:
+    """Sliding text buffer over a file, refilled on demand."""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def fill(self, min_size=0):
+        """Read more input. Returns False at end of file."""
+        if self.eof:
+            return False
+        # Drop what has been consumed so the buffer only holds the current item
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.fp.read(max(self.chunk_size, min_size))
+        if isinstance(data, bytes):
+            self.bytes_read += len(data)
+            text = self.decoder.decode(data, final=not data)
+        else:
+            self.bytes_read += len(data)
+            text = data
+        if not data:
+            self.eof = True
+        self.buf += text
+        return bool(data)
+
+    def peek(self):
+        """Return the next non-whitespace character ('' at end of input)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise TimelineParseError(f"Expected '{char}' but found '{found or 'end of file'}' "
+                                     f"near byte {self.bytes_read}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.peek()
+        decoder = json.JSONDecoder()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # A number cut by the read boundary decodes as its prefix ('12' of
+                # '12.5e3', also when the buffer ends in '12.' or '12e'); other
+                # values are delimited and complete once decoded
+                cut = (not self.eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                       and _NUMBER_TAIL.match(self.buf, end))
+                if not cut:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                # Errors away from the end of the buffer are real syntax errors,
+                # not just a value cut off by the read boundary
+                truncated = e.pos >= len(self.buf) - 16 or e.msg.startswith('Unterminated string')
+                if self.eof or not truncated:
+                    raise TimelineParseError(f"Invalid JSON near byte {self.bytes_read}: {e.msg}") from e
+            # Incomplete value: grow geometrically so large items stay linear
+            self.fill(min_size=len(self.buf) - self.pos)
+
+
+def iter_json_events(fp, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally parse a JSON document from a file object.
+
+    Yields `(key, value)` pairs: for a top-level object, one pair per
+    member, except that array members are yielded one element at a time
+    (`(key, element)` for each element). A top-level array yields
+    `(None, element)` per element. Only one element is held in memory at a
+    time, so arbitrarily large arrays such as `timelineObjects` can be
+    processed in bounded memory. Raises TimelineParseError on malformed
+    input.
+    """
+    reader = _StreamReader(fp, chunk_size)
+    first = reader.peek()
+
+    if first == '[':
+        yield from _iter_array(reader, None)
+    elif first == '{':
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise TimelineParseError("Object keys must be strings")
+                reader.expect(':')
+                if reader.peek() == '[':
+                    yield from _iter_array(reader, key)
+                else:
+                    yield key, reader.value()
+                if reader.peek() == ',':
+                    reader.pos += 1
+                    continue
+                reader.expect('}')
+                break
+    else:
+        raise TimelineParseError("Expected a JSON object or array")
+
+    if reader.peek() != '':
+        raise TimelineParseError("Unexpected data after the end of the JSON document")
+
+
+def _iter_array(reader, key):
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+    while True:
+        yield key, reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+            continue
+        reader.expect(']')
+        return
+
+
+def iter_timeline_segments(source, chunk_size=CHUNK_SIZE):
+    """
+    Yield the segments of a Google Timeline export's `timelineObjects`
+    one at a time. `source` is a path or a file object. The whole file is
+    validated as it is read; other top-level members are skipped.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as fp:
+            yield from iter_timeline_segments(fp, chunk_size)
+        return
+
+    index = 0
+    for key, value in iter_json_events(source, chunk_size):
+        if key != 'timelineObjects':
+            continue
+        if not isinstance(value, dict):
+            raise TimelineParseError(f"timelineObjects[{index}] is not an object")
+        index += 1
+        yield value
+
+
+def validate_json_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Check that a file is valid JSON without loading it whole. Returns the
+    number of timeline segments found (0 for non-timeline documents).
+    """
+    segments = 0
+    with open(path, 'rb') as fp:
+        for key, value in iter_json_events(fp, chunk_size):
+            if key == 'timelineObjects':
+                if not isinstance(value, dict):
+                    raise TimelineParseError(f"timelineObjects[{segments}] is not an object")
+                segments += 1
+    return segments
@@ -0,0 +1,13 @@
+import os
+import sys
+from unittest import mock
+
+import firebase_admin
+from firebase_admin import credentials
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.firebase initializes the app from a service account file that is not
+# part of the repo; tests never talk to Firebase, so skip the initialization
+mock.patch.object(credentials, 'Certificate', return_value=mock.MagicMock()).start()
+mock.patch.object(firebase_admin, 'initialize_app', return_value=None).start()
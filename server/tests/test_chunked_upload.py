@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from services.chunked_upload import MIN_CHUNK_SIZE, ChunkedUploadError, ChunkedUploads
+
+CHUNK = MIN_CHUNK_SIZE
+DATA = os.urandom(2 * CHUNK + 1000)
+
+
+def sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def send(uploads, upload_id, index, data=DATA, body=None):
+    chunk = data[index * CHUNK:(index + 1) * CHUNK]
+    body = chunk if body is None else body
+    return uploads.write_chunk(upload_id, 'u1', index * CHUNK, io.BytesIO(body), len(chunk), sha(chunk))
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return ChunkedUploads(root=str(tmp_path))
+
+
+@pytest.fixture
+def upload_id(uploads):
+    return uploads.create('u1', 'export.json', len(DATA), CHUNK)['upload_id']
+
+
+def test_chunks_in_any_order_assemble_the_file(uploads, upload_id):
+    for index in (2, 0, 1):
+        send(uploads, upload_id, index)
+    assert uploads.status(upload_id, 'u1')['missing_offsets'] == []
+
+    manifest, path, digest = uploads.finalize(upload_id, 'u1', sha(DATA))
+    assert digest == sha(DATA)
+    with open(path, 'rb') as f:
+        assert f.read() == DATA
+    with pytest.raises(ChunkedUploadError) as error:
+        uploads.finalize(upload_id, 'u1')
+    assert error.value.status == 404
+
+
+def test_uploads_are_private(uploads, upload_id):
+    with pytest.raises(ChunkedUploadError) as error:
+        uploads.status(upload_id, 'someone else')
+    assert error.value.status == 404
+
+
+def test_corrupt_chunks_are_not_recorded(uploads, upload_id):
+    with pytest.raises(ChunkedUploadError) as error:
+        send(uploads, upload_id, 0, body=b'x' * CHUNK)
+    assert error.value.status == 422
+    assert uploads.status(upload_id, 'u1')['missing_offsets'] == [0, CHUNK, 2 * CHUNK]
+
+
+def test_a_short_resend_unrecords_the_chunk(uploads, upload_id):
+    for index in range(3):
+        send(uploads, upload_id, index)
+    with pytest.raises(ChunkedUploadError):
+        send(uploads, upload_id, 1, body=b'x' * 100)
+
+    assert uploads.status(upload_id, 'u1')['missing_offsets'] == [CHUNK]
+    with pytest.raises(ChunkedUploadError) as error:
+        uploads.finalize(upload_id, 'u1')
+    assert error.value.status == 409
+
+    send(uploads, upload_id, 1)
+    assert uploads.finalize(upload_id, 'u1')[2] == sha(DATA)
+
+
+def test_finalize_rechecks_each_chunk(uploads, upload_id):
+    for index in range(3):
+        send(uploads, upload_id, index)
+    # Bytes changed behind a recorded chunk, e.g. by a resend racing the first
+    with open(os.path.join(uploads.root, upload_id, 'data'), 'r+b') as f:
+        f.seek(CHUNK + 10)
+        f.write(b'corrupt')
+
+    with pytest.raises(ChunkedUploadError) as error:
+        uploads.finalize(upload_id, 'u1')
+    assert error.value.status == 409
+    assert uploads.status(upload_id, 'u1')['missing_offsets'] == [CHUNK]
+
+    send(uploads, upload_id, 1)
+    assert uploads.finalize(upload_id, 'u1')[2] == sha(DATA)
+
+
+def test_requests_racing_a_finalize_are_rejected(uploads, upload_id, monkeypatch):
+    for index in range(3):
+        send(uploads, upload_id, index)
+    verify = uploads._verify
+    raced = []
+
+    def verify_while_racing(*args):
+        for attempt in (lambda: uploads.finalize(upload_id, 'u1'), lambda: send(uploads, upload_id, 0)):
+            with pytest.raises(ChunkedUploadError) as error:
+                attempt()
+            raced.append(error.value.status)
+        return verify(*args)
+
+    monkeypatch.setattr(uploads, '_verify', verify_while_racing)
+    assert uploads.finalize(upload_id, 'u1')[2] == sha(DATA)
+    assert raced == [409, 409]
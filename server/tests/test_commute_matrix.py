@@ -0,0 +1,94 @@
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+from services.commute_matrix import CommuteMatrix, departure_bucket, normalize_endpoint
+
+
+class StubClient:
+    """Answers every pair with 10 minutes, except 'nowhere' which is unreachable."""
+
+    def __init__(self, fail_on_call=None):
+        self.calls = []
+        self.fail_on_call = fail_on_call
+
+    def distance_matrix(self, origins, destinations, mode, departure_time):
+        self.calls.append((origins, destinations, mode, departure_time))
+        if len(self.calls) == self.fail_on_call:
+            raise RuntimeError('quota exceeded')
+        return {'rows': [
+            {'elements': [{'status': 'ZERO_RESULTS'} if destination == 'nowhere'
+                          else {'status': 'OK', 'duration': {'value': 600}}
+                          for destination in destinations]}
+            for _ in origins
+        ]}
+
+
+MONDAY_9AM = datetime(2026, 10, 12, 9, 0)
+
+
+def test_departure_buckets():
+    assert departure_bucket('walking', MONDAY_9AM) == 'any'
+    assert departure_bucket('transit', MONDAY_9AM) == 'weekday-peak'
+    assert departure_bucket('transit', MONDAY_9AM.replace(hour=13)) == 'weekday-offpeak'
+    assert departure_bucket('driving', datetime(2026, 10, 17, 9, 0)) == 'weekend'
+
+
+def test_endpoints_are_normalized():
+    assert normalize_endpoint('  Koregaon   Park ') == 'koregaon park'
+    assert normalize_endpoint((18.5362, 73.8940)) == normalize_endpoint({'lat': 18.53621, 'lng': 73.89401})
+
+
+def test_second_lookup_is_served_from_cache():
+    client = StubClient()
+    matrix = CommuteMatrix(client, db_path=':memory:')
+    origins, destinations = ['Baner', 'Aundh'], ['Hinjewadi', 'nowhere']
+
+    first = matrix.durations(origins, destinations, when=MONDAY_9AM)
+    second = matrix.durations(origins, destinations, when=MONDAY_9AM)
+
+    assert first == second == {
+        ('Baner', 'Hinjewadi'): 10, ('Baner', 'nowhere'): None,
+        ('Aundh', 'Hinjewadi'): 10, ('Aundh', 'nowhere'): None,
+    }
+    assert len(client.calls) == 1
+    stats = matrix.stats()
+    assert (stats['hits'], stats['misses'], stats['api_elements']) == (4, 4, 4)
+
+
+def test_buckets_are_cached_separately():
+    client = StubClient()
+    matrix = CommuteMatrix(client, db_path=':memory:')
+    matrix.duration('Baner', 'Hinjewadi', when=MONDAY_9AM)
+    matrix.duration('Baner', 'Hinjewadi', when=MONDAY_9AM.replace(hour=10))
+    assert len(client.calls) == 1
+    matrix.duration('Baner', 'Hinjewadi', when=MONDAY_9AM.replace(hour=13))
+    assert len(client.calls) == 2
+    # Modes without time dependence are requested without a departure time
+    matrix.duration('Baner', 'Hinjewadi', mode='walking', when=MONDAY_9AM)
+    assert client.calls[-1][2:] == ('walking', None)
+
+
+def test_failures_expire_before_results():
+    client = StubClient()
+    matrix = CommuteMatrix(client, db_path=':memory:', ttl=3600, failure_ttl=60)
+    with mock.patch('services.commute_matrix.time.time', return_value=1000.0):
+        matrix.durations(['Baner'], ['Hinjewadi', 'nowhere'], when=MONDAY_9AM)
+    with mock.patch('services.commute_matrix.time.time', return_value=1100.0):
+        matrix.durations(['Baner'], ['Hinjewadi', 'nowhere'], when=MONDAY_9AM)
+    # Only the unreachable pair is asked for again
+    assert client.calls[-1][:2] == (['baner'], ['nowhere'])
+
+
+def test_completed_requests_are_kept_when_a_later_one_fails():
+    destinations = [f'site {i}' for i in range(30)]
+    matrix = CommuteMatrix(StubClient(fail_on_call=2), db_path=':memory:')
+    with pytest.raises(RuntimeError):
+        matrix.durations(['Baner'], destinations, when=MONDAY_9AM)
+
+    matrix.client = client = StubClient()
+    result = matrix.durations(['Baner'], destinations, when=MONDAY_9AM)
+    assert set(result.values()) == {10}
+    assert len(client.calls) == 1
+    assert len(client.calls[0][1]) == 5
@@ -0,0 +1,67 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from services import context_cache
+from services.context_cache import ContextCache
+
+
+@pytest.fixture
+def models():
+    with mock.patch.object(context_cache.llm_gateway, 'get_model', return_value='inline-model'), \
+            mock.patch.object(context_cache.genai.GenerativeModel, 'from_cached_content',
+                              side_effect=lambda cached_content, generation_config: f'cached:{cached_content.name}'):
+        yield
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_requests_do_not_wait_for_the_create(models):
+    release = threading.Event()
+    creates = []
+
+    def create(**kwargs):
+        creates.append(kwargs)
+        release.wait(2)
+        return SimpleNamespace(name='cachedContents/1', update=lambda ttl: None)
+
+    cache = ContextCache('gemini-test', ('prefix',), ttl=3600)
+    with mock.patch.object(context_cache.caching.CachedContent, 'create', side_effect=create):
+        started = time.time()
+        for _ in range(5):
+            assert cache.model_for() == ('inline-model', ['prefix'])
+        assert time.time() - started < 0.5
+        release.set()
+        wait_for(lambda: cache.stats()['active'])
+        assert cache.model_for() == ('cached:cachedContents/1', [])
+    assert len(creates) == 1
+
+
+def test_failed_create_backs_off(models):
+    cache = ContextCache('gemini-test', ('prefix',))
+    with mock.patch.object(context_cache.caching.CachedContent, 'create',
+                           side_effect=RuntimeError('unsupported')) as create:
+        assert cache.model_for() == ('inline-model', ['prefix'])
+        wait_for(lambda: cache.stats()['last_error'] == 'unsupported')
+        assert cache.model_for() == ('inline-model', ['prefix'])
+        time.sleep(0.05)
+    assert create.call_count == 1
+
+
+def test_renewal_keeps_serving_the_cache(models):
+    renewed = threading.Event()
+    cached = SimpleNamespace(name='cachedContents/2', update=lambda ttl: renewed.set())
+    cache = ContextCache('gemini-test', ('prefix',), ttl=3600)
+    cache._cached, cache._expires_at = cached, time.time() + 10  # inside RENEW_MARGIN
+    assert cache.model_for() == ('cached:cachedContents/2', [])
+    assert renewed.wait(2)
+    wait_for(lambda: cache.stats()['renewals'] == 1)
+    assert cache.stats()['expires_in_seconds'] > 3000
@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+
+from services.conversation_store import ConversationStore, estimate_tokens
+
+
+def wait_until_compacted(store, session_id, timeout=2):
+    conversation = store.get(session_id)
+    deadline = time.time() + timeout
+    while conversation.compacting:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_turns_are_kept_in_order():
+    store = ConversationStore()
+    store.append('s', 'hi', 'hello')
+    store.append('s', 'rent?', 'about 20k')
+    assert store.snapshot('s') == ('', [('user', 'hi'), ('model', 'hello'),
+                                        ('user', 'rent?'), ('model', 'about 20k')])
+
+
+def test_old_turns_are_folded_into_the_summary():
+    calls = []
+
+    def summarizer(previous, turns):
+        calls.append((previous, list(turns)))
+        return 'summary of %d turns' % len(turns)
+
+    store = ConversationStore(summarizer=summarizer, history_tokens=40)
+    for i in range(4):
+        store.append('s', f'question {i} ' + 'x' * 40, f'answer {i} ' + 'y' * 40)
+        wait_until_compacted(store, 's')
+
+    summary, turns = store.snapshot('s')
+    assert summary.startswith('summary of')
+    assert turns[-2:] == [('user', 'question 3 ' + 'x' * 40), ('model', 'answer 3 ' + 'y' * 40)]
+    assert [role for role, _ in turns] == ['user', 'model'] * (len(turns) // 2)
+    assert sum(estimate_tokens(text) for _, text in turns) <= 40
+    assert calls and all(len(turns) % 2 == 0 for _, turns in calls)
+
+
+def test_failed_summarizer_falls_back():
+    def summarizer(previous, turns):
+        raise RuntimeError('model down')
+
+    store = ConversationStore(summarizer=summarizer, history_tokens=20)
+    store.append('s', 'a' * 60, 'b' * 60)
+    store.append('s', 'c' * 60, 'd' * 60)
+    wait_until_compacted(store, 's')
+    summary, _ = store.snapshot('s')
+    assert 'user: aaaa' in summary
+
+
+def test_byte_cap():
+    store = ConversationStore(history_tokens=10 ** 6, max_bytes=300, summary_tokens=10)
+    for i in range(10):
+        store.append('s', 'q' * 50, 'a' * 50)
+    conversation = store.get('s')
+    assert conversation.size_bytes() <= 300
+    assert conversation.summarized_turns > 0
+
+
+def test_idle_and_excess_conversations_are_evicted():
+    store = ConversationStore(idle_ttl=60, max_conversations=2)
+    with mock.patch('services.conversation_store.time.time', return_value=1000.0):
+        store.append('a', 'hi', 'hello')
+        store.append('b', 'hi', 'hello')
+        store.append('c', 'hi', 'hello')
+        assert store.stats()['conversations'] == 2
+        assert store.snapshot('c') == ('', [('user', 'hi'), ('model', 'hello')])
+        assert store.snapshot('a') == ('', [])  # evicted, so a fresh one
+    with mock.patch('services.conversation_store.time.time', return_value=2000.0):
+        store.get('d')
+    assert store.stats()['conversations'] == 1
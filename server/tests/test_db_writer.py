@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from services import db_writer as db_writer_module
+from services.db_writer import DatabaseWriter, push_id
+
+
+class FakeRef:
+    def __init__(self, failures=0, error=ConnectionError):
+        self.log = []
+        self.failures = failures
+        self.error = error
+
+    def update(self, values):
+        if self.failures:
+            self.failures -= 1
+            raise self.error('unavailable')
+        self.log.append(values)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(db_writer_module, 'RETRY_BACKOFF', 0)
+
+
+def make_writer(ref, **kwargs):
+    # Long interval: batches only go out on flush(), so tests decide where they end
+    return DatabaseWriter(get_ref=lambda: ref, flush_interval=60, **kwargs)
+
+
+def test_writes_to_the_same_path_are_coalesced():
+    ref = FakeRef()
+    writer = make_writer(ref)
+    writer.write('users/u1/preferences', {'budget': 1})
+    writer.write('/users/u1/preferences/', {'budget': 2})
+    writer.write('users/u2/preferences', {'budget': 3})
+    writer.write('users/u3', {'name': 'a'})
+    writer.write('users/u3/preferences/budget', 4)
+    assert writer.flush(timeout=5)
+
+    assert ref.log == [{
+        'users/u1/preferences': {'budget': 2},
+        'users/u2/preferences': {'budget': 3},
+        'users/u3': {'name': 'a', 'preferences': {'budget': 4}},
+    }]
+    assert writer.stats()['coalesced'] == 2
+
+
+def test_batches_and_jobs_run_in_submission_order():
+    ref = FakeRef(failures=2)
+    writer = make_writer(ref)
+    writer.write('counter', 1)
+    writer.submit('job', lambda: ref.log.append('job'))
+    writer.write('counter', 2)
+    assert writer.flush(timeout=5)
+
+    # The first batch is retried before anything queued after it goes out
+    assert ref.log == [{'counter': 1}, 'job', {'counter': 2}]
+    stats = writer.stats()
+    assert (stats['batches'], stats['jobs'], stats['retries'], stats['queue_depth']) == (2, 1, 2, 0)
+
+
+def test_callbacks_report_whether_the_batch_landed():
+    written, failed = [], []
+    ref = FakeRef(failures=1, error=ValueError)
+    writer = make_writer(ref)
+    writer.write('a', 1, on_written=lambda: written.append('a'), on_failed=lambda: failed.append('a'))
+    assert writer.flush(timeout=5)
+    writer.write('b', 2, on_written=lambda: written.append('b'), on_failed=lambda: failed.append('b'))
+    assert writer.flush(timeout=5)
+
+    # Bad data is not retried
+    assert (written, failed) == (['b'], ['a'])
+    assert writer.stats()['failed'] == 1
+
+
+def test_full_queue_rejects_writes():
+    writer = make_writer(FakeRef(), max_queue=2)
+    assert writer.update({'a': 1, 'b': 2})
+    assert not writer.write('c', 3)
+    assert writer.stats()['rejected'] == 1
+
+
+def test_push_ids_sort_in_creation_order():
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.extend(push_id() for _ in range(200))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 800
+    assert all(len(id_) == 20 for id_ in ids)
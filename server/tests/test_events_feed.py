@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from controllers import social_controller
+from services.events_feed import EventsFeed
+
+EVENTS = [{'name': 'Open mic', 'date': '2026-10-20'}]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return os.path.join(str(tmp_path), 'events.json')
+
+
+def make_feed(path, generate=lambda: list(EVENTS), **kwargs):
+    return EventsFeed(generate, path=path, **kwargs)
+
+
+def test_same_events_keep_the_version_and_etag(path):
+    feed = make_feed(path)
+    first = feed.refresh()
+    again = feed.refresh()
+    assert first['version'] == 1
+    assert (again['version'], again['etag']) == (first['version'], first['etag'])
+    assert feed.stats()['unchanged'] == 1
+
+    feed._generate = lambda: EVENTS + [{'name': 'Jazz night'}]
+    changed = feed.refresh()
+    assert changed['version'] == 2
+    assert changed['etag'] != first['etag']
+    assert json.loads(changed['body'])['events'][-1] == {'name': 'Jazz night'}
+
+
+def test_a_new_feed_adopts_the_snapshot_on_disk(path):
+    make_feed(path).refresh()
+
+    def must_not_generate():
+        raise AssertionError('generated again')
+
+    restarted = make_feed(path, generate=must_not_generate)
+    snapshot = restarted.snapshot(timeout=0)
+    assert (snapshot['version'], snapshot['events']) == (1, EVENTS)
+
+
+def test_no_snapshot_when_the_first_generation_fails(path):
+    def fail():
+        raise RuntimeError('model unavailable')
+
+    feed = make_feed(path, generate=fail, retry=3600)
+    assert feed.snapshot(timeout=5) is None
+    stats = feed.stats()
+    assert (stats['failures'], stats['last_error']) == (1, 'model unavailable')
+
+
+def test_clients_revalidate_with_the_etag(path, monkeypatch):
+    feed = make_feed(path)
+    feed.refresh()
+    monkeypatch.setattr(social_controller, 'events_feed', feed)
+    app = Flask(__name__)
+    app.add_url_rule('/events', view_func=social_controller.fetch_social_events)
+    client = app.test_client()
+
+    response = client.get('/events')
+    assert response.status_code == 200
+    assert response.get_json()['events'] == EVENTS
+    etag = response.headers['ETag']
+
+    response = client.get('/events', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    feed._generate = lambda: [{'name': 'Jazz night'}]
+    feed.refresh()
+    response = client.get('/events', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['X-Feed-Version'] == '2'
@@ -0,0 +1,62 @@
+from services.housing_scorer import HousingScorer
+from services.neighborhood_store import NeighborhoodStore
+
+SCORES = {'safety': 7, 'walkability': 7, 'transit': 7, 'greenery': 7, 'nightlife': 7}
+WORK = (18.52, 73.85)
+BUDGET = ('moderate', 15000, 25000)
+
+
+def record(name, lng_offset_km, moderate=(15000, 25000), amenities=()):
+    # Along the work location's parallel, ~1.05 km per 0.01 degrees of longitude
+    rent = {'budget': [0, 1], 'moderate': list(moderate), 'comfort': [0, 1], 'premium': [0, 1], 'luxury': [0, 1]}
+    return {'name': name, 'lat': WORK[0], 'lng': WORK[1] + lng_offset_km / 105.5, 'rent': rent,
+            'scores': SCORES, 'amenities': list(amenities), 'lifestyle': []}
+
+
+def rank(records, travel_distances=None, **kwargs):
+    store = NeighborhoodStore(records=records)
+    indices, scores, road_km, modes = HousingScorer(store).rank(
+        *WORK, BUDGET, travel_distances or {'driving': 20}, **kwargs
+    )
+    return [store.names[i] for i in indices], scores, road_km, modes
+
+
+def test_closer_ranks_higher():
+    names, scores, road_km, _ = rank([record('Far', 8), record('Near', 1)])
+    assert names == ['Near', 'Far']
+    assert scores[0] > scores[1]
+    # Straight-line distance plus the road detour
+    assert 1.2 < road_km[0] < 1.4
+
+
+def test_rent_within_budget_ranks_higher():
+    names, _, _, _ = rank([
+        record('Over budget', 1, moderate=(22000, 35000)),
+        record('Within budget', 1),
+    ])
+    assert names == ['Within budget', 'Over budget']
+
+
+def test_out_of_reach_neighborhoods_are_excluded():
+    names, _, _, _ = rank([record('Near', 1), record('Far', 30)])
+    assert names == ['Near']
+
+
+def test_fastest_mode_within_its_allowance_is_used():
+    names, _, _, modes = rank([record('Near', 1), record('Mid', 4)],
+                              travel_distances={'walking': 6, 'driving': 2})
+    assert dict(zip(names, modes)) == {'Near': 'driving', 'Mid': 'walking'}
+
+
+def test_higher_priority_must_haves_weigh_more():
+    names, _, _, _ = rank([
+        record('Has gym', 2, amenities=['gym']),
+        record('Has parks', 2, amenities=['parks']),
+        record('Has both', 2, amenities=['gym', 'parks']),
+    ], must_haves=['gym', 'parks'])
+    assert names == ['Has both', 'Has gym', 'Has parks']
+
+
+def test_limit():
+    names, _, _, _ = rank([record(f'Place {i}', i) for i in range(1, 10)], limit=3)
+    assert names == ['Place 1', 'Place 2', 'Place 3']
@@ -0,0 +1,119 @@
+import os
+from unittest import mock
+
+import pytest
+
+from services.job_queue import JOB_MAX_ATTEMPTS, JobQueue
+
+
+def at(seconds):
+    return mock.patch('services.job_queue.time.time', return_value=seconds)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return os.path.join(str(tmp_path), 'jobs.sqlite3')
+
+
+def enqueue(queue, digest='abc', created=900.0):
+    # Queued before the (mocked) times the tests claim at
+    with at(created):
+        return queue.enqueue('timeline', {'digest': digest})
+
+
+def lease_of(queue, job_id):
+    row = queue._db.execute('SELECT claimed_by, lease_until FROM jobs WHERE id=?', (job_id,)).fetchone()
+    return row['claimed_by'], row['lease_until']
+
+
+def test_enqueue_deduplicates_and_does_not_start_dispatching(db_path):
+    queue = JobQueue(db_path, lease=60)
+    first = queue.enqueue('timeline', {'digest': 'abc'}, owner='u1', key='abc')
+    again = queue.enqueue('timeline', {'digest': 'abc'}, owner='u1', key='abc')
+    other = queue.enqueue('timeline', {'digest': 'abc'}, owner='u2', key='abc')
+    assert again['id'] == first['id'] != other['id']
+    assert queue._thread is None
+    with pytest.raises(ValueError):
+        queue.enqueue('unknown', {})
+
+
+def test_claims_are_leases_renewed_while_running(db_path):
+    queue = JobQueue(db_path, lease=60)
+    job = enqueue(queue)
+    with at(1000.0):
+        row = queue._claim()
+    assert row['id'] == job['id']
+    assert lease_of(queue, job['id']) == (queue._id, 1060.0)
+    assert queue._claim() is None
+
+    with at(1030.0):
+        queue._renew_leases()
+    assert lease_of(queue, job['id']) == (queue._id, 1090.0)
+
+
+def test_only_expired_leases_are_requeued(db_path):
+    queue = JobQueue(db_path, lease=60)
+    job = enqueue(queue)
+    with at(1000.0):
+        queue._claim()
+    with at(1059.0):
+        queue._requeue_stale()
+    assert queue.get(job['id'])['status'] == 'running'
+    with at(1061.0):
+        queue._requeue_stale()
+    assert queue.get(job['id'])['status'] == 'queued'
+    assert lease_of(queue, job['id'])[0] is None
+
+
+def test_jobs_lost_too_often_fail(db_path):
+    queue = JobQueue(db_path, lease=60)
+    job = enqueue(queue)
+    now = 1000.0
+    for _ in range(JOB_MAX_ATTEMPTS):
+        with at(now):
+            queue._claim()
+        now += 61
+        with at(now):
+            queue._requeue_stale()
+    job = queue.get(job['id'])
+    assert (job['status'], job['error']) == ('failed', 'Lost with its worker')
+
+
+def test_a_dispatcher_cannot_complete_a_job_it_lost(db_path):
+    first, second = JobQueue(db_path, lease=60), JobQueue(db_path, lease=60)
+    job = enqueue(first)
+    with at(1000.0):
+        stale_row = first._claim()
+    with at(1061.0):
+        second._requeue_stale()
+        row = second._claim()
+
+    first._complete(stale_row, result={'from': 'first'})
+    assert first.stats()['inflight'] == 0
+    assert first.get(job['id'])['status'] == 'running'
+
+    second._complete(row, result={'from': 'second'})
+    assert second.get(job['id'])['result'] == {'from': 'second'}
+
+
+def test_failures_are_retried_except_bad_input(db_path):
+    queue = JobQueue(db_path, lease=60)
+    retried = enqueue(queue, 'a')
+    rejected = enqueue(queue, 'b', created=901.0)
+    with at(1000.0):
+        queue._complete(queue._claim(), error=RuntimeError('worker hiccup'))
+        queue._complete(queue._claim(), error=ValueError('not a timeline'))
+    assert queue.get(retried['id'])['status'] == 'queued'
+    assert queue.get(rejected['id'])['status'] == 'failed'
+
+
+def test_a_broken_pool_is_replaced_once(db_path):
+    queue = JobQueue(db_path)
+    broken, fresh = mock.Mock(), mock.Mock()
+    queue._pool = broken
+    with mock.patch.object(queue, '_new_pool', side_effect=[fresh]):
+        # Every job that was on the pool reports it broken
+        queue._replace_pool(broken)
+        queue._replace_pool(broken)
+    assert queue._pool is fresh
+    broken.shutdown.assert_called_once_with(wait=False)
@@ -0,0 +1,99 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from services.llm_gateway import LLMGateway, RateLimitExceeded, StreamHandle, TokenBucket
+
+
+class FakeModel:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def generate_content(self, contents, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return SimpleNamespace(text=contents, usage_metadata=SimpleNamespace(
+                prompt_token_count=10, candidates_token_count=3))
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_token_bucket_refills_over_time():
+    with mock.patch('services.llm_gateway.time.monotonic', return_value=100.0):
+        bucket = TokenBucket(rate_per_minute=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(30.0)  # one token every 30 s
+    with mock.patch('services.llm_gateway.time.monotonic', return_value=160.0):
+        assert bucket.reserve() == 0
+
+
+def test_concurrency_is_capped():
+    gateway = LLMGateway(max_concurrency=2, rate_per_minute=1000)
+    model = FakeModel(delay=0.05)
+    futures = [gateway.submit(f'prompt {i}', model=model) for i in range(6)]
+    assert [future.result().text for future in futures] == [f'prompt {i}' for i in range(6)]
+    assert model.peak == 2
+    stats = gateway.stats()
+    assert (stats['in_flight'], stats['completed'], stats['failed']) == (0, 6, 0)
+
+
+def test_rate_limit_rejects_long_waits():
+    gateway = LLMGateway(rate_per_minute=1)
+    model = FakeModel()
+    gateway.generate('first', model=model, rate_key='a')
+    with pytest.raises(RateLimitExceeded):
+        gateway.generate('second', model=model, rate_key='a')
+    gateway.generate('other key', model=model, rate_key='b')
+    assert gateway.stats()['rate_limited'] == 1
+
+
+def test_failures_release_their_slot():
+    gateway = LLMGateway(max_concurrency=1)
+    with pytest.raises(ValueError):
+        gateway.generate('x', model=FakeModel(error=ValueError('bad')))
+    assert gateway.generate('y', model=FakeModel()).text == 'y'
+    stats = gateway.stats()
+    assert (stats['in_flight'], stats['completed'], stats['failed']) == (0, 1, 1)
+
+
+def test_timeout():
+    gateway = LLMGateway()
+    with pytest.raises(TimeoutError):
+        gateway.generate('slow', model=FakeModel(delay=0.3), timeout=0.05)
+
+
+def test_usage_is_totalled_per_key():
+    gateway = LLMGateway()
+    for _ in range(2):
+        gateway.generate('x', model=FakeModel(), rate_key='housing')
+    assert gateway.stats()['usage'] == {'housing': {
+        'calls': 2, 'input_tokens': 20, 'output_tokens': 6, 'average_input_tokens': 10}}
+
+
+def test_stream_handle_frees_its_slot_when_consumed_or_closed():
+    gateway = LLMGateway(max_concurrency=1)
+    gateway._acquire('chat')
+    handle = StreamHandle(gateway, iter(['a', 'b', 'c']), 'chat')
+    assert list(handle) == ['a', 'b', 'c']
+    assert gateway.stats()['in_flight'] == 0
+
+    gateway._acquire('chat')
+    handle = StreamHandle(gateway, iter(['a', 'b', 'c']), 'chat')
+    assert next(iter(handle)) == 'a'
+    handle.close()
+    stats = gateway.stats()
+    assert (stats['in_flight'], stats['completed'], stats['failed']) == (0, 1, 1)
@@ -0,0 +1,43 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from services.model_registry import DEFAULT_MODEL, ModelRegistry, pick_model
+
+
+def test_pick_model_prefers_the_configured_order():
+    assert pick_model(['models/gemini-pro', 'models/gemini-1.5-pro']) == 'models/gemini-1.5-pro'
+    assert pick_model(['models/other']) == 'models/other'
+    assert pick_model([]) is None
+
+
+def test_cold_start_lists_models_once():
+    calls = []
+
+    def list_models():
+        calls.append(1)
+        time.sleep(0.1)
+        return [SimpleNamespace(name='models/gemini-1.5-flash')]
+
+    registry = ModelRegistry()
+    with mock.patch('services.model_registry.genai.list_models', list_models):
+        threads = [threading.Thread(target=registry.get_model_name) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert registry.get_model_name() == 'models/gemini-1.5-flash'
+    assert len(calls) == 1
+
+
+def test_listing_failure_serves_the_default_then_keeps_the_last_good_model():
+    registry = ModelRegistry(ttl=0)
+    with mock.patch('services.model_registry.genai.list_models', side_effect=RuntimeError('down')):
+        assert registry.get_model_name() == DEFAULT_MODEL
+    with mock.patch('services.model_registry.genai.list_models',
+                    return_value=[SimpleNamespace(name='models/gemini-1.5-pro')]):
+        assert registry.refresh() == 'models/gemini-1.5-pro'
+    with mock.patch('services.model_registry.genai.list_models', side_effect=RuntimeError('down')):
+        assert registry.refresh() == 'models/gemini-1.5-pro'
+    assert registry.stats()['last_error'] == 'down'
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+
+from services.neighborhood_store import KDTree, NeighborhoodStore
+from services.preferences import LIFESTYLE_BITS
+
+RENT = {'budget': [10000, 15000], 'moderate': [15000, 25000], 'comfort': [25000, 40000],
+        'premium': [40000, 60000], 'luxury': [60000, 100000]}
+SCORES = {'safety': 7, 'walkability': 7, 'transit': 7, 'greenery': 7, 'nightlife': 7}
+
+
+def record(name, lat, lng, amenities=(), lifestyle=(), rent=RENT):
+    return {'name': name, 'lat': lat, 'lng': lng, 'rent': rent, 'scores': SCORES,
+            'amenities': list(amenities), 'lifestyle': list(lifestyle)}
+
+
+def test_kdtree_matches_brute_force():
+    rng = np.random.default_rng(7)
+    points = rng.uniform(-20, 20, size=(500, 2))
+    tree = KDTree(points)
+    for _ in range(200):
+        point = rng.uniform(-25, 25, size=2)
+        radius = rng.uniform(0, 15)
+        expected = {i for i, p in enumerate(points) if math.dist(p, point) <= radius}
+        assert sorted(tree.query_radius(point, radius)) == sorted(expected)
+
+
+def test_kdtree_handles_tiny_inputs():
+    assert KDTree(np.empty((0, 2))).query_radius((0, 0), 5) == []
+    assert KDTree([(1.0, 1.0)]).query_radius((0, 0), 2) == [0]
+
+
+def test_locate_finds_the_longest_name_in_an_address():
+    store = NeighborhoodStore(records=[
+        record('Baner', 18.559, 73.786),
+        record('Baner Pashan Link Road', 18.545, 73.795),
+    ])
+    assert store.locate('Office 4, Baner-Pashan Link Road, Pune') == (18.545, 73.795)
+    assert store.locate('Tech Park, BANER, Pune') == (18.559, 73.786)
+    assert store.locate('Somewhere else') is None
+    assert store.locate('Banerjee Colony') is None
+
+
+def test_candidates_filter_and_order():
+    cheap = {**RENT, 'moderate': [8000, 12000]}
+    store = NeighborhoodStore(records=[
+        record('Near', 18.52, 73.85, amenities=['gym', 'parks']),
+        record('Lively', 18.53, 73.86, amenities=['gym', 'parks'], lifestyle=['nightlife', 'cultural']),
+        record('No gym', 18.52, 73.86, amenities=['parks']),
+        record('Too cheap', 18.52, 73.85, amenities=['gym', 'parks'], rent=cheap),
+        record('Far away', 19.50, 74.50, amenities=['gym', 'parks']),
+    ])
+    lifestyle = (1 << LIFESTYLE_BITS['nightlife']) | (1 << LIFESTYLE_BITS['cultural'])
+    indices, distances, matches, applied = store.candidates(
+        18.52, 73.85, 10, budget_range=('moderate', 20000, 30000), must_haves=['gym', 'parks'],
+        lifestyle_mask=lifestyle, min_results=1,
+    )
+    assert [store.names[i] for i in indices] == ['Lively', 'Near']
+    assert matches.tolist() == [2, 0]
+    assert applied == ['gym', 'parks']
+
+    # Too few matches: the lowest-priority must-have is dropped
+    indices, _, _, applied = store.candidates(18.52, 73.85, 10, must_haves=['parks', 'gym'], min_results=4)
+    assert applied == ['parks']
+    assert len(indices) == 4
+    assert store.stats()['relaxed_must_haves'] == 1
@@ -0,0 +1,25 @@
+import pytest
+
+from services.preferences import LIFESTYLE_BITS, PreferencesError, parse_preferences
+
+
+def test_lifestyle_codes_map_to_names():
+    preferences = parse_preferences({'lifestylePreferences': [0, '17', 'quiet', 'rooftops', -1, 99, 'quiet']})
+    assert preferences.lifestyle == ('accessibility', 'nightlife', 'quiet', 'rooftops', 'preference_-1',
+                                     'preference_99')
+    assert preferences.lifestyle_mask == (
+        1 << LIFESTYLE_BITS['accessibility'] | 1 << LIFESTYLE_BITS['nightlife'] | 1 << LIFESTYLE_BITS['quiet']
+    )
+
+
+def test_must_haves_are_ordered_by_priority():
+    preferences = parse_preferences({'prioritizedMustHaves': [
+        {'name': 'parks', 'priority': 2}, {'name': 'gym', 'priority': 1},
+    ]})
+    assert preferences.must_haves == ('gym', 'parks')
+    assert preferences.priorities == (1, 2)
+
+
+def test_invalid_shapes_are_rejected():
+    with pytest.raises(PreferencesError):
+        parse_preferences({'prioritizedMustHaves': [{'priority': 1}]})
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from services.preferences_cache import PreferencesCache
+
+
+class FakeRef:
+    def __init__(self, value):
+        self.value = value
+        self.reads = 0
+
+    def get(self):
+        self.reads += 1
+        return self.value
+
+
+def make_cache(ref, **kwargs):
+    cache = PreferencesCache(listen=False, **kwargs)
+    cache._ref = lambda uid: ref
+    return cache
+
+
+def test_reads_are_served_from_memory_until_the_ttl():
+    ref = FakeRef({'budget': 1})
+    cache = make_cache(ref, ttl=60)
+    with mock.patch('services.preferences_cache.time.monotonic', return_value=100.0):
+        assert cache.get('u1') == {'budget': 1}
+        assert cache.get('u1') == {'budget': 1}
+    assert ref.reads == 1
+    with mock.patch('services.preferences_cache.time.monotonic', return_value=161.0):
+        cache.get('u1')
+    assert ref.reads == 2
+
+
+def test_missing_preferences_are_cached_too():
+    ref = FakeRef(None)
+    cache = make_cache(ref)
+    assert cache.get('u1') is None
+    assert cache.get('u1') is None
+    assert ref.reads == 1
+
+
+def test_a_pending_save_is_read_back_and_dropped_if_it_fails():
+    ref = FakeRef({'budget': 1})
+    cache = make_cache(ref)
+    saved = {'budget': 2}
+    cache.put('u1', saved)
+    assert cache.get('u1') == {'budget': 2}
+    assert ref.reads == 0
+
+    # A later save is not dropped when an earlier one fails
+    newer = {'budget': 3}
+    cache.put('u1', newer)
+    cache.discard('u1', saved)
+    assert cache.get('u1') == {'budget': 3}
+
+    cache.discard('u1', newer)
+    assert cache.get('u1') == {'budget': 1}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = make_cache(FakeRef({}), max_entries=2)
+    for uid in ('u1', 'u2', 'u3'):
+        cache.put(uid, {'uid': uid})
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions']) == (2, 1)
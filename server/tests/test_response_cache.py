@@ -0,0 +1,46 @@
+from unittest import mock
+
+from services.response_cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_ignores_key_order():
+    assert make_cache_key({'a': 1, 'b': [1, 2]}) == make_cache_key({'b': [1, 2], 'a': 1})
+    assert make_cache_key({'a': 1}) != make_cache_key({'a': 2})
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['entries'] == 2
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=10)
+    with mock.patch('services.response_cache.time.time', return_value=1000.0):
+        cache.set('a', {'x': 1})
+    with mock.patch('services.response_cache.time.time', return_value=1010.0):
+        assert cache.get('a') == {'x': 1}
+    with mock.patch('services.response_cache.time.time', return_value=1011.0):
+        assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 0)
+
+
+def test_disk_entries_are_shared_and_expire(tmp_path):
+    writer = ResponseCache(ttl=10, disk_dir=str(tmp_path))
+    reader = ResponseCache(ttl=10, disk_dir=str(tmp_path))
+    with mock.patch('services.response_cache.time.time', return_value=1000.0):
+        writer.set('k', [1, 2])
+        assert reader.get('k') == [1, 2]
+    assert reader.stats()['disk_hits'] == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+    late = ResponseCache(ttl=10, disk_dir=str(tmp_path))
+    with mock.patch('services.response_cache.time.time', return_value=1011.0):
+        assert late.get('k') is None
+    assert not (tmp_path / 'k.json').exists()
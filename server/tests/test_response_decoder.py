@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from services.response_decoder import (
+    ResponseDecodeError, events_decoder, neighborhood_decoder, personality_decoder, ranking_decoder, repair_json
+)
+
+NEIGHBORHOOD_KEYS = {'name', 'city', 'state', 'averageRent', 'safetyScore', 'walkabilityScore', 'image',
+                     'description', 'amenities', 'commuteDetails', 'matchingFactors', 'nearbyHighlights'}
+
+
+def test_empty_values_keep_their_keys():
+    """Clients index every field (e.g. amenities.map), so empty ones must still be returned."""
+    text = json.dumps([{'name': 'A', 'city': 'P', 'amenities': [], 'description': '',
+                        'commuteDetails': {'distance': None}}])
+    [neighborhood] = neighborhood_decoder.decode(text)
+    assert set(neighborhood) == NEIGHBORHOOD_KEYS
+    assert neighborhood['amenities'] == []
+    assert neighborhood['description'] == ''
+    assert neighborhood['matchingFactors'] == []
+    assert set(neighborhood['commuteDetails']) == {'distance', 'time', 'travelMode'}
+
+
+def test_missing_fields_are_filled_with_defaults():
+    [ranked] = ranking_decoder.decode('[{"name": "A"}]')
+    assert ranked == {'name': 'A', 'description': '', 'matchingFactors': [], 'nearbyHighlights': []}
+
+
+def test_event_keys():
+    feed = events_decoder.decode('{"events": [{"name": "Open mic", "ticket_details": {"price": ""}}]}')
+    [event] = feed['events']
+    assert set(event) == {'name', 'date', 'location', 'category', 'ticket_details', 'official_source'}
+    assert event['ticket_details'] == {'price': '', 'booking_link': None}
+
+
+def test_cut_off_elements_are_dropped_at_every_depth():
+    assert json.loads(repair_json('{"events":[{"name":"a"},{"name":')) == {'events': [{'name': 'a'}]}
+    assert json.loads(repair_json('[{"name": "A", "amenities": ["gym", "pa')) == []
+    assert json.loads(repair_json('{"traits": ["calm", "curious"], "areas": ["quiet", "gre')) == \
+        {'traits': ['calm', 'curious'], 'areas': ['quiet']}
+    assert json.loads(repair_json('{"name": "A", "commuteDetails": {"time": "20 min", "dist')) == \
+        {'name': 'A', 'commuteDetails': {'time': '20 min'}}
+    feed = events_decoder.decode('```json\n{"events": [{"name": "Open mic"}, {"name": "Jazz", "ticket_details": {"pr')
+    assert [event['name'] for event in feed['events']] == ['Open mic']
+
+
+def test_invalid_events_are_dropped_from_the_feed():
+    feed = events_decoder.decode('{"events": [{"name": "Open mic"}, {"date": "2026-10-20"}]}')
+    assert [event['name'] for event in feed['events']] == ['Open mic']
+    with pytest.raises(ResponseDecodeError):
+        events_decoder.decode('{"events": [{"date": "2026-10-20"}]}')
+
+
+def test_an_object_wrapped_in_a_list_is_unwrapped():
+    analysis = personality_decoder.decode('[{"personality_traits": ["curious"]}]')
+    assert analysis['personality_traits'] == ['curious']
+    feed = events_decoder.decode('[{"events": [{"name": "Open mic"}, {"date": null}]}]')
+    assert [event['name'] for event in feed['events']] == ['Open mic']
@@ -0,0 +1,89 @@
+import pytest
+from flask import Flask, session
+
+from services.session_store import MemoryBackend, ServerSessionInterface
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get(self, sid, ttl):
+        self.calls.append('get')
+        return super().get(sid, ttl)
+
+    def set(self, sid, data, ttl):
+        self.calls.append('set')
+        super().set(sid, data, ttl)
+
+    def touch(self, sid, ttl):
+        self.calls.append('touch')
+        super().touch(sid, ttl)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.session_interface = ServerSessionInterface(CountingBackend())
+
+    @app.route('/login')
+    def login():
+        session['user'] = {'uid': 'u1'}
+        return 'ok'
+
+    @app.route('/me')
+    def me():
+        return session.get('user', {}).get('uid', 'anonymous')
+
+    @app.route('/health')
+    def health():
+        return 'ok'
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def test_cookie_carries_only_an_id(app):
+    client = app.test_client()
+    response = client.get('/login')
+    sid = client.get_cookie('session').value
+    assert len(sid) == 43
+    assert b'u1' not in response.headers['Set-Cookie'].encode()
+    assert client.get('/me').text == 'u1'
+
+
+def test_requests_that_do_not_use_the_session_skip_the_backend(app):
+    backend = app.session_interface.backend
+    client = app.test_client()
+    client.get('/login')
+    backend.calls.clear()
+
+    response = client.get('/health')
+    assert backend.calls == []
+    assert 'Set-Cookie' not in response.headers
+
+    response = client.get('/me')
+    assert backend.calls == ['get', 'touch']
+    assert 'Set-Cookie' in response.headers
+
+
+def test_anonymous_requests_store_nothing(app):
+    backend = app.session_interface.backend
+    client = app.test_client()
+    assert client.get('/me').text == 'anonymous'
+    assert backend.calls == []
+    assert client.get_cookie('session') is None
+
+
+def test_logout_deletes_the_session(app):
+    client = app.test_client()
+    client.get('/login')
+    sid = client.get_cookie('session').value
+    client.get('/logout')
+    assert client.get_cookie('session') is None
+    assert app.session_interface.backend.get(sid, 60) is None
@@ -0,0 +1,30 @@
+from services.timeline_analytics import TimelineAnalyzer
+
+
+def visit(lat, lng, name='Home', place_type='TYPE_HOME'):
+    return {'placeVisit': {
+        'location': {'latitudeE7': lat, 'longitudeE7': lng, 'name': name, 'type': place_type},
+        'duration': {'startTimestampMs': '1700000000000', 'endTimestampMs': '1700003600000'},
+    }}
+
+
+def test_malformed_segments_are_tolerated():
+    segments = [
+        visit(185204303, 738567437),
+        visit(185204303.6, 738567437.2),
+        visit('185204303', None),
+        {'placeVisit': {'location': None, 'duration': None}},
+        {'placeVisit': {'location': {'name': None, 'type': None}, 'duration': {'startTimestampMs': 'soon'}}},
+        {'placeVisit': None},
+        {'activitySegment': {'startLocation': None, 'endLocation': {'latitudeE7': 1.5}, 'distance': 'far',
+                             'activityType': None}},
+        None,
+        'segment',
+        [1, 2],
+    ]
+    analyzer = TimelineAnalyzer().extend(segments)
+    assert list(analyzer.lat_e7) == [185204303, 185204304, 185204303, 0, 0]
+    assert list(analyzer.lng_e7) == [738567437, 738567437, 0, 0, 0]
+    assert len(analyzer.trip_mode_codes) == 1
+    analysis = analyzer.result()
+    assert analysis['common_activities']['TYPE_HOME'] == 3
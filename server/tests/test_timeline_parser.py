@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+from services.timeline_parser import TimelineParseError, iter_json_events, iter_timeline_segments
+
+DOCUMENT = {
+    'timelineObjects': [
+        {'placeVisit': {'location': {'latitudeE7': 185204303, 'longitudeE7': 738567437, 'name': 'Café Goodluck'},
+                        'visitConfidence': 87.5}},
+        {'activitySegment': {'distance': 1234.0, 'confidence': 1e-3, 'activityType': 'WALKING',
+                             'waypoints': [-0.25, 12.5e3, 7, True, None]}},
+        {'placeVisit': {'location': {'latitudeE7': -3.5e2, 'longitudeE7': 0}}},
+    ],
+    'version': 12.75,
+    'count': 3,
+    'ratio': -1.5E+2,
+}
+
+
+def test_every_chunk_size():
+    """Values cut anywhere by the read boundary, numbers included, parse the same."""
+    raw = json.dumps(DOCUMENT, ensure_ascii=False).encode('utf-8')
+    expected = list(iter_json_events(io.BytesIO(raw), chunk_size=len(raw)))
+    for chunk_size in range(1, len(raw) + 1):
+        assert list(iter_json_events(io.BytesIO(raw), chunk_size=chunk_size)) == expected, chunk_size
+
+
+def test_trailing_number_at_end_of_file():
+    for chunk_size in range(1, 8):
+        assert list(iter_json_events(io.BytesIO(b'[1, 22.5e1]'), chunk_size)) == [(None, 1), (None, 225.0)]
+
+
+def test_segments():
+    raw = json.dumps(DOCUMENT).encode('utf-8')
+    assert list(iter_timeline_segments(io.BytesIO(raw), chunk_size=7)) == DOCUMENT['timelineObjects']
+
+
+@pytest.mark.parametrize('raw', [b'{"a": 1.}', b'{"a": 1e}', b'[1, 2', b'{"a": tru}', b'{"a": 1} x'])
+def test_invalid_json(raw):
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(TimelineParseError):
+            list(iter_json_events(io.BytesIO(raw), chunk_size))